@@ -1,11 +1,17 @@
+import hmac
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from cache import TTLCache
+import invalidation
+from hashing import PasswordHashingBusy, password_hasher
+from database import get_db, get_async_db
 from models import User
 from schemas import TokenData
 
@@ -13,15 +19,35 @@ from schemas import TokenData
 SECRET_KEY = "your-secret-key-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Authenticated users, keyed on the token subject, so authenticated requests
+# don't have to look the user up again on every call
+principal_cache = TTLCache(
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60")),
+)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
+def _hashing_busy():
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-ins in progress, please try again",
+        headers={"Retry-After": "1"},
+    )
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return password_hasher.verify(plain_password, hashed_password)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    try:
+        return password_hasher.hash(password)
+    except PasswordHashingBusy:
+        raise _hashing_busy()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -44,6 +70,33 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     return user
 
+def _principal_key(user_id: Optional[int], email: str):
+    return ("id", user_id) if user_id is not None else ("email", email)
+
+def _snapshot(user: User):
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+def _attach(db: Session, snapshot: dict):
+    # Rebuild the user as if it had just been loaded, then attach it to this
+    # request's session without a SELECT so routes can update it as usual
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+def invalidate_principal(user_id: int, *emails: str):
+    """Drop cached principals for a user whose row has changed."""
+    principal_cache.pop(_principal_key(user_id, None))
+    for email in emails:
+        principal_cache.pop(_principal_key(None, email))
+
+def _on_user_changed(payload):
+    if payload is None:
+        principal_cache.clear()
+    else:
+        invalidate_principal(payload["id"], *payload["emails"])
+
+invalidation.subscribe("users", _on_user_changed)
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -56,10 +109,39 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(email=email, user_id=payload.get("uid"))
     except JWTError:
         raise credentials_exception
-    user = get_user_by_email(db, email=token_data.email)
-    if user is None:
+    
+    key = _principal_key(token_data.user_id, token_data.email)
+    snapshot = principal_cache.get(key)
+    if snapshot is None:
+        if token_data.user_id is not None:
+            user = db.get(User, token_data.user_id)
+        else:
+            user = get_user_by_email(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        snapshot = _snapshot(user)
+        principal_cache.set(key, snapshot)
+    else:
+        user = _attach(db, snapshot)
+    
+    # Tokens are issued for an email; they stop working if it changes
+    if snapshot["email"] != token_data.email:
         raise credentials_exception
     return user
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # The user is attached to the request's AsyncSession, shared with the route
+    return await db.run_sync(lambda session: get_current_user(credentials, session))
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
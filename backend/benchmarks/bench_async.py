@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Compare requests/sec of the sync (threadpool) and async (AsyncSession) modes.
+
+Starts one uvicorn server per mode against the same database and drives read
+traffic at a fixed concurrency with httpx. Point DATABASE_URL at PostgreSQL
+for meaningful numbers; SQLite's async driver runs on a helper thread and
+serializes access, so it mostly measures driver overhead.
+
+Usage (from the backend directory):
+    DATABASE_URL=postgresql://... python benchmarks/bench_async.py --concurrency 64 --duration 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+
+def seed(products):
+    from sqlalchemy import insert
+    from database import Base, SessionLocal, engine
+    from models import Category, Product, User
+    import search  # noqa: F401  registers the full-text index with create_all
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(email="bench@example.com", username="bench", hashed_password="x")
+        category = Category(name="Bench")
+        db.add_all([user, category])
+        db.commit()
+        db.execute(insert(Product), [
+            {"title": f"Item {i}", "description": "Benchmark product", "price": 10.0 + i % 50,
+             "category_id": category.id, "seller_id": user.id, "is_available": True}
+            for i in range(products)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def start_server(mode, port):
+    env = dict(os.environ, DB_MODE=mode)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    return process
+
+
+async def wait_until_up(client, url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get(url)
+            return
+        except Exception:
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not start")
+
+
+async def drive(base_url, concurrency, duration, products):
+    import httpx
+
+    latencies = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        await wait_until_up(client, "/")
+        deadline = time.monotonic() + duration
+
+        async def worker():
+            nonlocal errors
+            rng = random.Random()
+            while time.monotonic() < deadline:
+                if rng.random() < 0.5:
+                    path = "/api/products/?limit=20"
+                else:
+                    path = f"/api/products/{rng.randint(1, products)}"
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="ecofinds-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    print(f"Database: {os.environ['DATABASE_URL']}")
+    seed(args.products)
+
+    print(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for mode in ("sync", "async"):
+        server = start_server(mode, args.port)
+        try:
+            result = asyncio.run(drive(f"http://127.0.0.1:{args.port}", args.concurrency, args.duration, args.products))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:<8}{result['rps']:>10.1f}{result['p50']:>10.1f}{result['p99']:>10.1f}{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
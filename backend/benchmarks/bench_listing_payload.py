@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Bytes and CPU per product listing page: full view vs. card view.
+
+The full view loads ORM objects with their category and seller, validates
+them through schemas.Product and encodes with jsonable_encoder + json. The
+card view selects only the card's columns and encodes plain dicts with
+orjson. Both run the same filters against the same seeded database; the
+response cache is bypassed.
+
+Usage (from the backend directory):
+    python benchmarks/bench_listing_payload.py --products 20000 --limit 100
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def full_page(db, limit):
+    from fastapi.encoders import jsonable_encoder
+    from routers.products import list_products
+    from schemas import Product as ProductSchema
+
+    products = list_products(db, limit=limit)
+    return json.dumps(jsonable_encoder([ProductSchema.model_validate(product) for product in products])).encode()
+
+
+def card_page(db, limit):
+    import orjson
+    from routers.products import list_products, product_card
+
+    return orjson.dumps([product_card(row) for row in list_products(db, limit=limit, view="card")])
+
+
+def measure(render, db, limit, repeat):
+    cpu, wall = [], []
+    for _ in range(repeat):
+        db.expunge_all()
+        started_cpu, started_wall = time.process_time(), time.perf_counter()
+        body = render(db, limit)
+        cpu.append((time.process_time() - started_cpu) * 1000)
+        wall.append((time.perf_counter() - started_wall) * 1000)
+    return len(body), statistics.median(cpu), statistics.median(wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="ecofinds-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    print(f"Database: {os.environ['DATABASE_URL']}")
+
+    from seed_data import seed
+    from database import SessionLocal
+
+    seed(users=200, products=args.products, purchases=0, cart_fraction=0, log=lambda message: None)
+    db = SessionLocal()
+    try:
+        print(f"{args.limit}-item page    {'bytes':>9}{'CPU ms':>9}{'wall ms':>9}")
+        for label, render in (("full view", full_page), ("card view", card_page)):
+            size, cpu, wall = measure(render, db, args.limit, args.repeat)
+            print(f"{label:<16}{size:>9}{cpu:>9.2f}{wall:>9.2f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Latency of non-auth endpoints during a login storm.
+
+Runs the server once with bcrypt inline (PASSWORD_HASH_WORKERS=0) and once
+with the process pool, hammers /api/auth/login from many clients and
+measures GET /api/products/ latency at the same time.
+
+Usage (from the backend directory):
+    python benchmarks/bench_login_storm.py --logins 32 --duration 15
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_async import seed, start_server, wait_until_up
+
+PASSWORD = "storm-password"
+
+
+async def storm(base_url, logins, probes, duration, users):
+    import httpx
+
+    probe_latencies = []
+    outcomes = {"ok": 0, "busy": 0, "other": 0}
+    limits = httpx.Limits(max_connections=logins + probes)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_until_up(client, "/")
+        for i in range(users):
+            await client.post("/api/auth/register", json={
+                "email": f"storm{i}@example.com", "username": f"storm{i}", "password": PASSWORD,
+            })
+        deadline = time.monotonic() + duration
+
+        async def login(i):
+            while time.monotonic() < deadline:
+                response = await client.post("/api/auth/login", data={
+                    "username": f"storm{i % users}@example.com", "password": PASSWORD,
+                })
+                if response.status_code == 200:
+                    outcomes["ok"] += 1
+                elif response.status_code == 503:
+                    outcomes["busy"] += 1
+                    await asyncio.sleep(0.05)
+                else:
+                    outcomes["other"] += 1
+
+        async def probe():
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                await client.get("/api/products/?limit=20")
+                probe_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(login(i) for i in range(logins)), *(probe() for _ in range(probes)))
+
+    probe_latencies.sort()
+    return {
+        "p50": statistics.median(probe_latencies),
+        "p99": probe_latencies[int(len(probe_latencies) * 0.99) - 1],
+        "logins_per_s": outcomes["ok"] / duration,
+        **outcomes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login clients")
+    parser.add_argument("--probes", type=int, default=4, help="concurrent listing clients")
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="ecofinds-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    print(f"{'hashing':<10}{'list p50 ms':>13}{'list p99 ms':>13}{'logins/s':>10}{'503s':>7}")
+    for label, workers in (("inline", "0"), ("pool", os.getenv("PASSWORD_HASH_WORKERS", "4"))):
+        seed(1000)
+        os.environ["PASSWORD_HASH_WORKERS"] = workers
+        server = start_server(os.getenv("DB_MODE", "sync"), args.port)
+        try:
+            result = asyncio.run(storm(f"http://127.0.0.1:{args.port}", args.logins, args.probes, args.duration, args.users))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{label:<10}{result['p50']:>13.1f}{result['p99']:>13.1f}{result['logins_per_s']:>10.1f}{result['busy']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark product search: indexed full-text vs. substring (ILIKE) matching.
+
+Seeds a throwaway database with synthetic products and times the same
+queries get_products runs for each search mode.
+
+Usage (from the backend directory):
+    python benchmarks/bench_search.py --rows 100000 1000000
+    DATABASE_URL=postgresql://... python benchmarks/bench_search.py --rows 100000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = (
+    "vintage wooden chair table lamp laptop phone camera bicycle jacket shoes "
+    "guitar book shelf desk sofa mirror kettle blender speaker headphones "
+    "watch ring necklace toy puzzle drill hammer tent backpack helmet scooter "
+    "monitor keyboard mouse printer tablet charger cable vase rug curtain"
+).split()
+
+SYLLABLES = "ka lo mi ren to sa vu qui dor pel an ex ri mo zu tal bec fin gor hu".split()
+
+QUERIES = ["laptop", "vint", "wooden chair", "kalomi", "blue scooter helmet"]
+
+
+def _vocabulary(rng, size=20000):
+    # Pronounceable filler words so descriptions have a realistic spread of
+    # rare and common terms instead of a few dozen very common ones.
+    return ["".join(rng.choice(SYLLABLES) for _ in range(3)) for _ in range(size)]
+
+
+def _sentence(rng, words, length):
+    return " ".join(rng.choice(words) for _ in range(length))
+
+
+def seed(db, rows, batch_size=10000):
+    from sqlalchemy import insert
+    from models import Category, Product, User
+
+    rng = random.Random(42)
+    user = User(email="bench@example.com", username="bench", hashed_password="x")
+    categories = [Category(name=f"Category {i}") for i in range(12)]
+    db.add(user)
+    db.add_all(categories)
+    db.commit()
+    category_ids = [category.id for category in categories]
+    vocabulary = _vocabulary(rng)
+
+    for start in range(0, rows, batch_size):
+        db.execute(insert(Product), [
+            {
+                "title": _sentence(rng, WORDS, 3),
+                "description": _sentence(rng, vocabulary, 25),
+                "price": round(rng.uniform(1, 500), 2),
+                "category_id": rng.choice(category_ids),
+                "seller_id": user.id,
+                "is_available": True,
+            }
+            for _ in range(start, min(start + batch_size, rows))
+        ])
+        db.commit()
+
+
+def time_query(db, term, mode, repeat):
+    from routers.products import list_products
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list_products(db, limit=20, search=term, search_mode=mode)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def run(rows, repeat):
+    from database import Base, SessionLocal, engine
+    import search  # noqa: F401  registers the full-text index with create_all
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        seed(db, rows)
+        print(f"\n{rows:,} products seeded in {time.perf_counter() - started:.1f}s")
+        print(f"{'query':<22}{'fulltext p50/max ms':>24}{'substring p50/max ms':>26}")
+        for term in QUERIES:
+            fulltext = time_query(db, term, "fulltext", repeat)
+            substring = time_query(db, term, "substring", repeat)
+            print(f"{term:<22}{fulltext[0]:>14.2f} / {fulltext[1]:<8.2f}{substring[0]:>16.2f} / {substring[1]:<8.2f}")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="ecofinds-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    print(f"Database: {os.environ['DATABASE_URL']}")
+
+    for rows in args.rows:
+        run(rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-request with and without startup warmup.
+
+Seeds a dataset, then starts one uvicorn worker with WARMUP_ENABLED=false and
+one with WARMUP_ENABLED=true. For each it reports how long the worker took to
+answer /readyz, then the latency of the first requests a visitor makes: the
+browse page, the category list, a product page and a sign-in. Every run
+starts a fresh process, so nothing is warm except what the lifespan hook did.
+
+Usage (from the backend directory):
+    python benchmarks/bench_startup.py --products 20000
+    DATABASE_URL=postgresql://... python benchmarks/bench_startup.py --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from seed_data import PASSWORD, seed, user_email
+
+FIRST_REQUESTS = ("browse", "categories", "detail", "login")
+
+
+def start_server(port, warm):
+    env = dict(os.environ, WARMUP_ENABLED="true" if warm else "false")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+
+
+def wait_until_ready(client, started, timeout=60):
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get("/readyz").status_code == 200:
+                return time.perf_counter() - started
+        except Exception:
+            pass
+        time.sleep(0.01)
+    raise RuntimeError("server did not become ready")
+
+
+def first_requests(client, product_id):
+    requests = {
+        "browse": lambda: client.get("/api/products/", params={"view": "card"}),
+        "categories": lambda: client.get("/api/products/categories"),
+        "detail": lambda: client.get(f"/api/products/{product_id}"),
+        "login": lambda: client.post("/api/auth/login", data={"username": user_email(0), "password": PASSWORD}),
+    }
+    timings = {}
+    for name in FIRST_REQUESTS:
+        started = time.perf_counter()
+        response = requests[name]()
+        timings[name] = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, (name, response.status_code, response.text)
+    return timings
+
+
+def run(port, warm, product_id):
+    import httpx
+
+    started = time.perf_counter()
+    server = start_server(port, warm)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            ready = wait_until_ready(client, started)
+            return ready, first_requests(client, product_id)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--purchases", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=3, help="server starts per setting; medians are reported")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="ecofinds-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    print(f"Database: {os.environ['DATABASE_URL']}")
+    seed(users=args.users, products=args.products, purchases=args.purchases, log=lambda *a: None)
+
+    from routers.products import hot_product_ids
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        # A product the warmup caches, as a visitor's first click likely is
+        product_id = hot_product_ids(db, 1)[0]
+    finally:
+        db.close()
+
+    header = f"{'warmup':<8}{'ready ms':>10}" + "".join(f"{name + ' ms':>15}" for name in FIRST_REQUESTS) + f"{'first total':>13}"
+    print(header)
+    for warm in (False, True):
+        results = [run(args.port, warm, product_id) for _ in range(args.runs)]
+        ready = statistics.median(result[0] for result in results) * 1000
+        medians = {name: statistics.median(result[1][name] for result in results) for name in FIRST_REQUESTS}
+        print(f"{'on' if warm else 'off':<8}{ready:>10.0f}"
+              + "".join(f"{medians[name]:>15.1f}" for name in FIRST_REQUESTS)
+              + f"{sum(medians.values()):>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
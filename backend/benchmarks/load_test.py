@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Drive a realistic traffic mix at a fixed concurrency and report throughput
+and p50/p95/p99 per endpoint, optionally failing on regressions against a
+stored baseline.
+
+Each virtual user signs in as one of the seeded users, then repeatedly picks
+an operation by weight from the mix: browsing (list, page, search, detail,
+categories), shopping (cart list, add to cart, checkout) and signing in.
+Requests answered with a 4xx (e.g. adding a product someone else just bought)
+are counted as rejected rather than errors.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --seed-users 500 --seed-products 50000 --save-baseline baseline.json
+    python benchmarks/load_test.py --seed-users 500 --seed-products 50000 --baseline baseline.json
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --no-seed --mix list=1,detail=1
+
+With --no-seed the database at DATABASE_URL must already hold a dataset made by
+seed_data.py with the same --seed-users/--seed-products.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_async import start_server, wait_until_up
+from seed_data import PASSWORD, WORDS, seed, user_email
+
+DEFAULT_MIX = {
+    "list": 25, "page": 10, "search": 15, "detail": 25, "categories": 5,
+    "cart_list": 8, "cart_add": 6, "checkout": 3, "login": 3,
+}
+
+# Only compare endpoints that saw enough traffic for stable percentiles
+MIN_SAMPLES = 20
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.rejected = {}
+        self.errors = {}
+        self.recording = False
+
+    def record(self, name, seconds, status):
+        if not self.recording:
+            return
+        self.latencies.setdefault(name, []).append(seconds * 1000)
+        if status >= 500:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        elif status >= 400:
+            self.rejected[name] = self.rejected.get(name, 0) + 1
+
+    def summary(self, elapsed):
+        results = {}
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            results[name] = {
+                "requests": len(values),
+                "rps": len(values) / elapsed,
+                "p50": percentile(values, 0.50),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+                "rejected": self.rejected.get(name, 0),
+                "errors": self.errors.get(name, 0),
+            }
+        return results
+
+
+class VirtualUser:
+    def __init__(self, client, recorder, dataset, rng):
+        self.client = client
+        self.recorder = recorder
+        self.dataset = dataset
+        self.rng = rng
+        self.email = user_email(rng.randrange(dataset["users"]))
+        self.headers = {}
+
+    async def timed(self, name, method, url, **kwargs):
+        started = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.recorder.record(name, time.perf_counter() - started, response.status_code)
+        return response
+
+    def product_id(self):
+        return self.dataset["first_product_id"] + self.rng.randrange(self.dataset["products"])
+
+    async def sign_in(self, name="login"):
+        response = await self.timed(name, "POST", "/api/auth/login", data={"username": self.email, "password": PASSWORD})
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def list(self):
+        await self.timed("list", "GET", "/api/products/", params={"limit": 20})
+
+    async def page(self):
+        response = await self.timed("page", "GET", "/api/products/page", params={"limit": 20})
+        cursor = response.json().get("next_cursor") if response.status_code == 200 else None
+        if cursor:
+            await self.timed("page", "GET", "/api/products/page", params={"limit": 20, "cursor": cursor})
+
+    async def search(self):
+        term = " ".join(self.rng.sample(WORDS, self.rng.randint(1, 2)))
+        await self.timed("search", "GET", "/api/products/", params={"search": term, "limit": 20})
+
+    async def detail(self):
+        await self.timed("detail", "GET", f"/api/products/{self.product_id()}")
+
+    async def categories(self):
+        await self.timed("categories", "GET", "/api/products/categories")
+
+    async def cart_list(self):
+        await self.timed("cart_list", "GET", "/api/cart/", headers=self.headers)
+
+    async def cart_add(self):
+        await self.timed("cart_add", "POST", "/api/cart/", headers=self.headers,
+                         json={"product_id": self.product_id(), "quantity": 1})
+
+    async def checkout(self):
+        # Put something in the cart first so most checkouts have work to do
+        await self.cart_add()
+        await self.timed("checkout", "POST", "/api/purchases/", headers=self.headers)
+
+    async def login(self):
+        await self.sign_in()
+
+
+async def run_load(base_url, mix, concurrency, duration, warmup, dataset, rng_seed):
+    import httpx
+
+    recorder = Recorder()
+    names, weights = zip(*mix.items())
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_until_up(client, "/")
+        users = [VirtualUser(client, recorder, dataset, random.Random(rng_seed + i)) for i in range(concurrency)]
+        await asyncio.gather(*(user.sign_in() for user in users))
+
+        async def loop(user, deadline):
+            while time.monotonic() < deadline:
+                await getattr(user, user.rng.choices(names, weights)[0])()
+
+        if warmup:
+            await asyncio.gather(*(loop(user, time.monotonic() + warmup) for user in users))
+        recorder.recording = True
+        started = time.monotonic()
+        await asyncio.gather(*(loop(user, started + duration) for user in users))
+        elapsed = time.monotonic() - started
+    return recorder.summary(elapsed)
+
+
+def compare(results, baseline, tolerance):
+    """Return a description of every endpoint that got slower or less productive than the baseline."""
+    regressions = []
+    for name, before in baseline["endpoints"].items():
+        after = results.get(name)
+        if after is None or before["requests"] < MIN_SAMPLES or after["requests"] < MIN_SAMPLES:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            if after[metric] > before[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {before[metric]:.1f} ms -> {after[metric]:.1f} ms")
+        if after["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['rps']:.1f}/s -> {after['rps']:.1f}/s")
+        if after["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {after['errors']}")
+    return regressions
+
+
+def print_results(results):
+    print(f"{'endpoint':<12}{'requests':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'4xx':>6}{'5xx':>6}")
+    for name, row in results.items():
+        print(f"{name:<12}{row['requests']:>10}{row['rps']:>9.1f}{row['p50']:>9.1f}{row['p95']:>9.1f}"
+              f"{row['p99']:>9.1f}{row['rejected']:>6}{row['errors']:>6}")
+    total = sum(row["rps"] for row in results.values())
+    print(f"{'total':<12}{sum(row['requests'] for row in results.values()):>10}{total:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. list=30,detail=20,login=1")
+    parser.add_argument("--seed-users", type=int, default=1000)
+    parser.add_argument("--seed-products", type=int, default=100000)
+    parser.add_argument("--seed-purchases", type=int, default=5000)
+    parser.add_argument("--no-seed", action="store_true", help="reuse the dataset already in DATABASE_URL")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="load an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--save-baseline", help="write the results as the new baseline")
+    parser.add_argument("--baseline", help="fail if results regress against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="ecofinds-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    print(f"Database: {os.environ['DATABASE_URL']}")
+
+    if args.no_seed:
+        dataset = {"users": args.seed_users, "products": args.seed_products, "first_product_id": 1}
+    else:
+        dataset = seed(args.seed_users, args.seed_products, purchases=args.seed_purchases, rng_seed=args.seed)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_server(os.getenv("DB_MODE", "sync"), args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        results = asyncio.run(run_load(base_url, args.mix, args.concurrency, args.duration, args.warmup, dataset, args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_results(results)
+    report = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "mix": args.mix,
+        "dataset": {"users": args.seed_users, "products": args.seed_products},
+        "endpoints": results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressions against {args.baseline} (tolerance {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
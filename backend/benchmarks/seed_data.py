@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Seed a synthetic EcoFinds dataset for benchmarks and load tests.
+
+Creates users who all share one password, products spread over the standard
+categories, open carts and a purchase history. It is deterministic for a
+given --seed, and rows are bulk inserted in batches, so millions of products
+load in minutes. The target is whatever DATABASE_URL points at (SQLite or
+PostgreSQL). Existing tables are dropped first.
+
+Usage (from the backend directory):
+    python benchmarks/seed_data.py --users 2000 --products 200000
+    DATABASE_URL=postgresql://... python benchmarks/seed_data.py --products 5000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Every seeded user signs in with this password
+PASSWORD = "benchmark-password"
+
+WORDS = (
+    "vintage wooden chair table lamp laptop phone camera bicycle jacket shoes "
+    "guitar book shelf desk sofa mirror kettle blender speaker headphones "
+    "watch ring necklace toy puzzle drill hammer tent backpack helmet scooter "
+    "monitor keyboard mouse printer tablet charger cable vase rug curtain"
+).split()
+
+ADJECTIVES = "used refurbished handmade classic compact sturdy blue green red oak leather".split()
+
+
+def user_email(index):
+    return f"user{index}@bench.example.com"
+
+
+def _batches(total, batch_size):
+    for start in range(0, total, batch_size):
+        yield start, min(start + batch_size, total)
+
+
+def seed(users=1000, products=100000, cart_fraction=0.3, purchases=5000, batch_size=10000, rng_seed=42, log=print):
+    """Drop and recreate the schema, then load the synthetic dataset. Returns row counts."""
+    from sqlalchemy import func, insert, select, update
+    from database import SessionLocal, engine
+    from hashing import pwd_context
+    from init_db import init_database
+    from migrate import drop_all
+    from models import CartItem, Category, Product, Purchase, PurchaseItem, User
+
+    rng = random.Random(rng_seed)
+    drop_all(engine)
+    init_database()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        hashed_password = pwd_context.hash(PASSWORD)
+        for start, end in _batches(users, batch_size):
+            db.execute(insert(User), [
+                {"email": user_email(i), "username": f"user{i}", "hashed_password": hashed_password}
+                for i in range(start, end)
+            ])
+            db.commit()
+        first_user = db.scalar(select(func.min(User.id)))
+        user_ids = range(first_user, first_user + users)
+        category_ids = db.scalars(select(Category.id)).all()
+        log(f"{users:,} users in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        for start, end in _batches(products, batch_size):
+            db.execute(insert(Product), [
+                {
+                    "title": f"{rng.choice(ADJECTIVES)} {rng.choice(WORDS)} {rng.choice(WORDS)}",
+                    "description": " ".join(rng.choice(WORDS) for _ in range(20)),
+                    "price": round(rng.uniform(1, 500), 2),
+                    "category_id": rng.choice(category_ids),
+                    "seller_id": rng.choice(user_ids),
+                    "is_available": True,
+                    # Spread over the last year so listings page realistically
+                    "created_at": now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+                }
+                for _ in range(start, end)
+            ])
+            db.commit()
+        first_product = db.scalar(select(func.min(Product.id)))
+        log(f"{products:,} products in {time.perf_counter() - started:.1f}s")
+
+        # Sold products come out of the catalogue; carts only hold available ones
+        started = time.perf_counter()
+        sold = rng.sample(range(first_product, first_product + products), min(products // 2, purchases * 2))
+        sold_set = set(sold)
+        purchase_rows, item_rows = [], []
+        remaining = list(sold)
+        for _ in range(purchases):
+            if not remaining:
+                break
+            lines = [remaining.pop() for _ in range(min(len(remaining), rng.randint(1, 3)))]
+            prices = [round(rng.uniform(1, 500), 2) for _ in lines]
+            purchase_rows.append({
+                "buyer_id": rng.choice(user_ids),
+                "total_amount": round(sum(prices), 2),
+                "created_at": now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+            })
+            item_rows.append(list(zip(lines, prices)))
+        for start, end in _batches(len(purchase_rows), batch_size):
+            purchase_ids = db.scalars(
+                insert(Purchase).returning(Purchase.id, sort_by_parameter_order=True), purchase_rows[start:end]
+            ).all()
+            db.execute(insert(PurchaseItem), [
+                {"purchase_id": purchase_id, "product_id": product_id, "quantity": 1, "price_at_purchase": price}
+                for purchase_id, lines in zip(purchase_ids, item_rows[start:end])
+                for product_id, price in lines
+            ])
+            db.commit()
+        for start, end in _batches(len(sold), batch_size):
+            db.execute(update(Product).where(Product.id.in_(sold[start:end])).values(is_available=False))
+            db.commit()
+        log(f"{len(purchase_rows):,} purchases in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        cart_rows = []
+        for user_id in rng.sample(user_ids, int(users * cart_fraction)):
+            picks = set()
+            wanted = min(rng.randint(1, 5), products - len(sold))
+            while len(picks) < wanted:
+                product_id = rng.randrange(first_product, first_product + products)
+                if product_id not in sold_set:
+                    picks.add(product_id)
+            cart_rows.extend({"user_id": user_id, "product_id": product_id, "quantity": 1} for product_id in picks)
+        for start, end in _batches(len(cart_rows), batch_size):
+            db.execute(insert(CartItem), cart_rows[start:end])
+            db.commit()
+        log(f"{len(cart_rows):,} cart items in {time.perf_counter() - started:.1f}s")
+
+        return {
+            "users": users,
+            "first_user_id": first_user,
+            "products": products,
+            "first_product_id": first_product,
+            "sold": len(sold),
+            "purchases": len(purchase_rows),
+            "cart_items": len(cart_rows),
+        }
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--cart-fraction", type=float, default=0.3, help="share of users with an open cart")
+    parser.add_argument("--purchases", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        path = os.path.join(tempfile.mkdtemp(prefix="ecofinds-bench-"), "bench.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    print(f"Database: {os.environ['DATABASE_URL']}")
+    seed(args.users, args.products, args.cart_fraction, args.purchases, args.batch_size, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Streaming parser and batched writer for bulk product imports.
+
+The request body is read chunk by chunk and split into rows as it arrives,
+so memory stays bounded by the batch size however large the upload is. Rows
+are validated against ``ProductCreate`` one batch at a time. Valid rows go in
+with one multi-row INSERT per batch (COPY on PostgreSQL); invalid rows are
+reported back by row number.
+"""
+
+import csv
+import io
+import json
+import os
+from pydantic import ValidationError
+from sqlalchemy import insert
+from models import Product, utcnow
+from schemas import ProductCreate
+
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "1000"))
+BULK_IMPORT_MAX_ROW_BYTES = int(os.getenv("BULK_IMPORT_MAX_ROW_BYTES", str(64 * 1024)))
+# Per-row errors beyond this are counted but not listed
+BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "1000"))
+
+FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/ndjson": "ndjson",
+    "text/csv": "csv",
+}
+
+COLUMNS = ("title", "description", "price", "image_url", "category_id", "seller_id", "is_available", "created_at")
+
+
+class RowError(Exception):
+    pass
+
+
+async def _lines(chunks, max_line_bytes):
+    """
+    Yield each line of the stream as bytes, without its newline. A line longer
+    than ``max_line_bytes`` is dropped as it streams in and yielded as None.
+    """
+    buffer = bytearray()
+    skipping = False
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            yield None if skipping or end - start > max_line_bytes else bytes(buffer[start:end])
+            skipping = False
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            buffer.clear()
+            skipping = True
+    if skipping:
+        yield None
+    elif buffer:
+        yield None if len(buffer) > max_line_bytes else bytes(buffer)
+
+
+def _decode(line):
+    try:
+        return line.decode("utf-8").rstrip("\r")
+    except UnicodeDecodeError:
+        raise RowError("Row is not valid UTF-8")
+
+
+async def ndjson_rows(chunks, max_line_bytes=None):
+    """Yield ``(row_number, dict or RowError)`` for each non-blank line."""
+    max_line_bytes = max_line_bytes or BULK_IMPORT_MAX_ROW_BYTES
+    number = 0
+    async for line in _lines(chunks, max_line_bytes):
+        if line is not None and not line.strip():
+            continue
+        number += 1
+        try:
+            if line is None:
+                raise RowError(f"Row is longer than {max_line_bytes} bytes")
+            row = json.loads(_decode(line))
+            if not isinstance(row, dict):
+                raise RowError("Row must be a JSON object")
+        except ValueError:
+            row = RowError("Row is not valid JSON")
+        except RowError as error:
+            row = error
+        yield number, row
+
+
+async def csv_rows(chunks, max_line_bytes=None):
+    """
+    Yield ``(row_number, dict or RowError)`` for each record after the header.
+    Quoted fields may span lines: a record is complete once its quotes balance.
+    """
+    max_line_bytes = max_line_bytes or BULK_IMPORT_MAX_ROW_BYTES
+    header = None
+    number = 0
+    pending = []
+    async for line in _lines(chunks, max_line_bytes):
+        try:
+            if line is None:
+                pending = []
+                raise RowError(f"Row is longer than {max_line_bytes} bytes")
+            pending.append(_decode(line))
+            record = "\n".join(pending)
+            if record.count('"') % 2:
+                if len(record) > max_line_bytes:
+                    pending = []
+                    raise RowError(f"Row is longer than {max_line_bytes} bytes")
+                continue
+            pending = []
+            if not record.strip():
+                continue
+            values = next(csv.reader([record]))
+        except RowError as error:
+            if header is None:
+                raise
+            number += 1
+            yield number, error
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, RowError(f"Expected {len(header)} fields, got {len(values)}")
+            continue
+        # CSV has no null; an empty cell means the field wasn't given
+        yield number, {name: value for name, value in zip(header, values) if value != ""}
+    if pending:
+        number += 1
+        yield number, RowError("Row ends inside a quoted field")
+
+
+def validate(row, category_ids, category_names):
+    """Return a ``ProductCreate`` for the row, or a list of error messages."""
+    if isinstance(row, RowError):
+        return [str(row)]
+    if "category_id" not in row and "category" in row:
+        category_id = category_names.get(str(row["category"]).strip().lower())
+        if category_id is None:
+            return [f"category: Unknown category {row['category']!r}"]
+        row = dict(row, category_id=category_id)
+    try:
+        product = ProductCreate.model_validate(row)
+    except ValidationError as error:
+        return [
+            f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+            for detail in error.errors()
+        ]
+    if product.category_id not in category_ids:
+        return ["category_id: Category not found"]
+    return product
+
+
+def insert_products(db, products, seller_id):
+    """Insert validated products in one round trip and commit."""
+    now = utcnow()
+    rows = [
+        {
+            "title": product.title,
+            "description": product.description,
+            "price": product.price,
+            "image_url": product.image_url,
+            "category_id": product.category_id,
+            "seller_id": seller_id,
+            "is_available": True,
+            "created_at": now,
+        }
+        for product in products
+    ]
+    connection = db.connection()
+    if connection.dialect.driver == "psycopg2":
+        _copy(connection, rows)
+    else:
+        db.execute(insert(Product), rows)
+    db.commit()
+
+
+def _copy(connection, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["\\N" if row[column] is None else row[column] for column in COLUMNS])
+    buffer.seek(0)
+    with connection.connection.driver_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY products ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+            buffer,
+        )
@@ -0,0 +1,150 @@
+"""
+In-process caches shared by the routers.
+"""
+
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire ``ttl`` seconds after they are
+    set. A ``maxsize`` of 0 disables the cache; a ``ttl`` of None never expires.
+
+    With ``max_bytes`` the cache also evicts least recently used entries until
+    the summed ``sizeof(value)`` of what it holds fits. Entries can carry tags
+    so related entries are dropped together with ``invalidate_tags``.
+
+    ``generation`` advances on every invalidation. A caller that reads the
+    generation before loading a value and passes it to ``set`` won't store
+    data that was invalidated while it was being loaded. ``set`` can also
+    give an entry a shorter ``ttl`` than the cache's.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, max_bytes=None, sizeof=len, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._clock = clock
+        self._data = OrderedDict()
+        self._tags = defaultdict(set)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+        self._invalidated_at = float("-inf")
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry[0], entry[1]
+                if expires_at is None or expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value, generation=None, tags=(), ttl=None):
+        if self.maxsize <= 0:
+            return
+        if ttl is None or (self.ttl is not None and self.ttl < ttl):
+            ttl = self.ttl
+        expires_at = None if ttl is None else self._clock() + ttl
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires_at, value, size, tuple(tags))
+            self.bytes += size
+            for tag in tags:
+                self._tags[tag].add(key)
+            while len(self._data) > self.maxsize or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def replace(self, key, update):
+        """
+        Swap the live value under ``key`` for ``update(value)``, keeping its
+        expiry and tags; an ``update`` returning None drops the entry.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or (entry[0] is not None and entry[0] <= self._clock()):
+                return
+            expires_at, value, size, tags = entry
+            value = update(value)
+            if value is None:
+                self.generation += 1
+                self._invalidated_at = self._clock()
+                self._remove(key)
+                return
+            new_size = self._sizeof(value) if self.max_bytes is not None else 0
+            self._data[key] = (expires_at, value, new_size, tags)
+            self.bytes += new_size - size
+
+    def _remove(self, key):
+        _, _, size, tags = self._data.pop(key)
+        self.bytes -= size
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def pop(self, key):
+        with self._lock:
+            self.generation += 1
+            self._invalidated_at = self._clock()
+            if key not in self._data:
+                return None
+            value = self._data[key][1]
+            self._remove(key)
+            return value
+
+    def invalidate_tags(self, *tags):
+        """Drop every entry carrying any of ``tags``."""
+        with self._lock:
+            self.generation += 1
+            self._invalidated_at = self._clock()
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._invalidated_at = self._clock()
+            self._data.clear()
+            self._tags.clear()
+            self.bytes = 0
+
+    def since_invalidation(self):
+        """Seconds since anything was last invalidated."""
+        return self._clock() - self._invalidated_at
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
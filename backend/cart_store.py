@@ -0,0 +1,561 @@
+"""
+Where shopping carts live.
+
+CART_STORE=sql (the default) keeps carts in ``cart_items``, as they always
+were. Any other setting keeps them in a key-value store speaking the Redis
+protocol: a ``redis://`` URL, or ``memory`` for an in-process stand-in that
+suits tests and single-worker development.
+
+The key-value store holds each cart as one hash. ``q:<product_id>`` is the
+quantity and ``t:<product_id>`` the time the product was added. A cart line
+is identified by its product id, since a cart holds each product once.
+Adding to the cart is then two round trips: an HEXISTS checking that the
+cart is loaded, and one MULTI/EXEC of HSETNX, HINCRBY, SADD and HGET. There
+is no cart lookup, commit or refresh against the database. Carts missing
+from the store are loaded from ``cart_items`` on first use. Every write
+marks the cart dirty, and a background thread copies dirty carts back to
+``cart_items`` every CART_FLUSH_INTERVAL_SECONDS, so the table can be used
+to rebuild the store after a restart.
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from database import SessionLocal
+from loaders import cart_item_options, product_options
+from models import CartItem, Product, utcnow
+from pagination import decode_cursor, encode_cursor, newest_first, page_of
+from counts import cached_count
+
+logger = logging.getLogger(__name__)
+
+CART_STORE = os.getenv("CART_STORE", "sql")
+CART_FLUSH_INTERVAL_SECONDS = float(os.getenv("CART_FLUSH_INTERVAL_SECONDS", "2"))
+# Carts written back per transaction
+CART_FLUSH_BATCH = int(os.getenv("CART_FLUSH_BATCH", "500"))
+
+
+class CartLine(NamedTuple):
+    """A cart item held in the key-value store, shaped like a ``CartItem`` row."""
+    id: int
+    user_id: int
+    product_id: int
+    quantity: int
+    created_at: datetime
+    product: Product
+
+
+def _removes(operation):
+    return operation.op == "remove" or (operation.op == "set" and operation.quantity <= 0)
+
+
+def _delete_rows(db, user_id, product_ids):
+    db.query(CartItem).filter(
+        CartItem.user_id == user_id, CartItem.product_id.in_(product_ids)
+    ).delete(synchronize_session=False)
+
+
+def _upsert_lines(db, rows, quantity):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(CartItem).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[CartItem.user_id, CartItem.product_id],
+        set_={"quantity": quantity(statement.excluded.quantity)},
+    )
+
+
+def _add_lines(db, rows):
+    """
+    INSERT ... ON CONFLICT (user_id, product_id) DO UPDATE adding to the
+    quantity, so concurrent adds of one product land on one line and none
+    is lost.
+    """
+    return _upsert_lines(db, rows, lambda excluded: CartItem.quantity + excluded)
+
+
+def _set_lines(db, rows):
+    """The same upsert replacing the quantity, for ``set``."""
+    return _upsert_lines(db, rows, lambda excluded: excluded)
+
+
+class SQLCartStore:
+    """Carts as rows of ``cart_items``."""
+
+    def _load_cart_item(self, db, item_id):
+        return db.query(CartItem).options(*cart_item_options()).filter(CartItem.id == item_id).first()
+
+    def _owned(self, db, user_id, item_id):
+        return db.query(CartItem).filter(CartItem.id == item_id, CartItem.user_id == user_id).first()
+
+    def lines(self, db, user_id):
+        return db.query(CartItem).options(*cart_item_options()).filter(CartItem.user_id == user_id).all()
+
+    def page(self, db, user_id, cursor, limit, include_total):
+        query = db.query(CartItem).filter(CartItem.user_id == user_id)
+        items = newest_first(query.options(*cart_item_options()), CartItem.created_at, CartItem.id, cursor).limit(limit + 1).all()
+        page = page_of(items, limit, lambda item: encode_cursor(item.created_at, item.id))
+        if include_total:
+            page["total"] = cached_count("cart", user_id, query)
+        return page
+
+    def add(self, db, user_id, product, quantity):
+        """Add ``quantity`` of an available product; returns the line and whether it is new."""
+        now = utcnow()
+        row = db.execute(_add_lines(db, [
+            {"user_id": user_id, "product_id": product.id, "quantity": quantity, "created_at": now}
+        ]).returning(CartItem.id, CartItem.created_at)).one()
+        db.commit()
+        # An existing line keeps its original created_at
+        return self._load_cart_item(db, row.id), _aware(row.created_at) == now
+
+    def set_quantity(self, db, user_id, item_id, quantity):
+        cart_item = self._owned(db, user_id, item_id)
+        if not cart_item:
+            return None
+        cart_item.quantity = quantity
+        db.commit()
+        return self._load_cart_item(db, cart_item.id)
+
+    def remove(self, db, user_id, item_id):
+        cart_item = self._owned(db, user_id, item_id)
+        if not cart_item:
+            return False
+        db.delete(cart_item)
+        db.commit()
+        return True
+
+    def clear(self, db, user_id):
+        db.query(CartItem).filter(CartItem.user_id == user_id).delete()
+        db.commit()
+
+    def apply(self, db, user_id, operations):
+        """Apply ``CartOperation``s in order with a single commit; returns the cart."""
+        # Per product, what the batch ends with: ("add", n) to add to whatever
+        # the line holds when the statement runs, ("set", n) for an absolute
+        # quantity, or ("remove", 0). Nothing is read first, so a concurrent
+        # add_to_cart is never overwritten by a quantity computed from a stale read.
+        outcomes = {}
+        for operation in operations:
+            if _removes(operation):
+                outcomes[operation.product_id] = ("remove", 0)
+            elif operation.op == "add":
+                kind, quantity = outcomes.get(operation.product_id, ("add", 0))
+                kind = "set" if kind == "remove" else kind
+                outcomes[operation.product_id] = (kind, quantity + operation.quantity)
+            else:
+                outcomes[operation.product_id] = ("set", operation.quantity)
+
+        # At most one statement of each kind, however long the batch
+        now = utcnow()
+        lines = {"remove": [], "set": [], "add": []}
+        for product_id, (kind, quantity) in outcomes.items():
+            if kind == "add" and quantity == 0:
+                continue
+            lines[kind].append({"user_id": user_id, "product_id": product_id, "quantity": quantity, "created_at": now})
+        if lines["remove"]:
+            _delete_rows(db, user_id, [line["product_id"] for line in lines["remove"]])
+        if lines["set"]:
+            db.execute(_set_lines(db, lines["set"]))
+        if lines["add"]:
+            db.execute(_add_lines(db, lines["add"]))
+        db.commit()
+        return self.lines(db, user_id)
+
+    def summary(self, db, user_id):
+        # One aggregate over the cart joined to current prices
+        available = Product.is_available == True
+        items, quantity, total, unavailable = db.query(
+            func.count(CartItem.id),
+            func.coalesce(func.sum(CartItem.quantity), 0),
+            func.coalesce(func.sum(case((available, Product.price * CartItem.quantity), else_=0)), 0),
+            func.count(case((~available, 1))),
+        ).join(Product, Product.id == CartItem.product_id).filter(CartItem.user_id == user_id).one()
+        return {"items": items, "quantity": quantity, "total": total, "unavailable": unavailable}
+
+    def quantities(self, db, user_id):
+        """``(product_id, quantity)`` rows for checkout."""
+        return db.query(CartItem.product_id, CartItem.quantity).filter(CartItem.user_id == user_id).all()
+
+    def remove_products(self, db, user_id, product_ids):
+        """Drop bought products from the cart inside the checkout transaction."""
+        _delete_rows(db, user_id, product_ids)
+
+    def products_removed(self, user_id, product_ids):
+        """Called once the checkout has committed."""
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class MemoryKV:
+    """In-process stand-in for the Redis commands ``KVCartStore`` uses."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.RLock()
+
+    def pipeline(self):
+        return _MemoryPipeline(self)
+
+    def hgetall(self, name):
+        with self._lock:
+            return dict(self._data.get(name, {}))
+
+    def hget(self, name, key):
+        with self._lock:
+            return self._data.get(name, {}).get(key)
+
+    def hexists(self, name, key):
+        with self._lock:
+            return key in self._data.get(name, {})
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        with self._lock:
+            fields = self._data.setdefault(name, {})
+            added = len(items.keys() - fields.keys())
+            fields.update((field, str(item)) for field, item in items.items())
+            return added
+
+    def hsetnx(self, name, key, value):
+        with self._lock:
+            fields = self._data.setdefault(name, {})
+            if key in fields:
+                return 0
+            fields[key] = str(value)
+            return 1
+
+    def hincrby(self, name, key, amount=1):
+        with self._lock:
+            fields = self._data.setdefault(name, {})
+            value = int(fields.get(key, 0)) + amount
+            fields[key] = str(value)
+            return value
+
+    def hdel(self, name, *keys):
+        with self._lock:
+            fields = self._data.get(name, {})
+            removed = sum(fields.pop(key, None) is not None for key in keys)
+            if not fields:
+                self._data.pop(name, None)
+            return removed
+
+    def sadd(self, name, *values):
+        with self._lock:
+            members = self._data.setdefault(name, set())
+            added = len({str(value) for value in values} - members)
+            members.update(str(value) for value in values)
+            return added
+
+    def spop(self, name, count=None):
+        with self._lock:
+            members = self._data.get(name, set())
+            popped = [members.pop() for _ in range(min(len(members), 1 if count is None else count))]
+            if not members:
+                self._data.pop(name, None)
+        if count is None:
+            return popped[0] if popped else None
+        return popped
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+
+class _MemoryPipeline:
+    """Queues commands and runs them under the store's lock, like MULTI/EXEC."""
+
+    def __init__(self, kv):
+        self._kv = kv
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._kv, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        with self._kv._lock:
+            return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+# Present in every cart hash the store has loaded, even an empty one
+LOADED = "loaded"
+DIRTY = "carts:dirty"
+
+
+def _aware(value):
+    # SQLite hands back naive datetimes; everything here is UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+class KVCartStore:
+    """Carts as hashes in a Redis-compatible store, written behind to ``cart_items``."""
+
+    def __init__(self, kv, flush_interval=CART_FLUSH_INTERVAL_SECONDS):
+        self.kv = kv
+        self.flush_interval = flush_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _key(self, user_id):
+        return f"cart:{user_id}"
+
+    def _parse(self, fields):
+        entries = {}
+        for field, value in fields.items():
+            if field.startswith("q:"):
+                product_id = int(field[2:])
+                added = fields.get(f"t:{product_id}")
+                entries[product_id] = (int(value), datetime.fromisoformat(added) if added else utcnow())
+        return entries
+
+    def _load(self, db, user_id):
+        key = self._key(user_id)
+        entries = {}
+        for product_id, quantity, created_at in db.query(
+            CartItem.product_id, CartItem.quantity, CartItem.created_at
+        ).filter(CartItem.user_id == user_id):
+            previous = entries.get(product_id)
+            if previous:
+                quantity, created_at = quantity + previous[0], min(_aware(created_at), previous[1])
+            entries[product_id] = (quantity, _aware(created_at))
+        # HSETNX so a write racing this load isn't overwritten
+        for product_id, (quantity, created_at) in entries.items():
+            self.kv.hsetnx(key, f"t:{product_id}", created_at.isoformat())
+            self.kv.hsetnx(key, f"q:{product_id}", quantity)
+        self.kv.hset(key, LOADED, 1)
+
+    def _entries(self, db, user_id):
+        """``{product_id: (quantity, added_at)}`` for the cart, loading it on first use."""
+        fields = self.kv.hgetall(self._key(user_id))
+        if LOADED not in fields:
+            self._load(db, user_id)
+            fields = self.kv.hgetall(self._key(user_id))
+        return self._parse(fields)
+
+    def _ensure(self, db, user_id):
+        if not self.kv.hexists(self._key(user_id), LOADED):
+            self._load(db, user_id)
+
+    def _changed(self, user_id):
+        self.kv.sadd(DIRTY, user_id)
+
+    def _lines(self, db, user_id, entries, product_ids):
+        products = {
+            product.id: product
+            for product in db.query(Product).options(*product_options()).filter(Product.id.in_(product_ids))
+        } if product_ids else {}
+        # A deleted product drops out of the cart
+        return [
+            CartLine(product_id, user_id, product_id, entries[product_id][0], entries[product_id][1], products[product_id])
+            for product_id in product_ids if product_id in products
+        ]
+
+    def _live(self, db, user_id, entries):
+        """``entries`` minus products deleted since; their lines are removed from the cart."""
+        existing = {
+            product_id for (product_id,) in db.query(Product.id).filter(Product.id.in_(entries))
+        } if entries else set()
+        deleted = [product_id for product_id in entries if product_id not in existing]
+        if deleted:
+            self.products_removed(user_id, deleted)
+        return {product_id: entry for product_id, entry in entries.items() if product_id in existing}
+
+    def lines(self, db, user_id):
+        entries = self._entries(db, user_id)
+        return self._lines(db, user_id, entries, sorted(entries, key=lambda product_id: entries[product_id][1]))
+
+    def page(self, db, user_id, cursor, limit, include_total):
+        # Deleted products are dropped first so they neither fill a slot nor count
+        entries = self._live(db, user_id, self._entries(db, user_id))
+        keys = sorted(((added, product_id) for product_id, (_, added) in entries.items()), reverse=True)
+        if cursor:
+            created_at, item_id = decode_cursor(cursor, datetime, int)
+            after = (_aware(created_at), item_id)
+            keys = [key for key in keys if key < after]
+        lines = self._lines(db, user_id, entries, [product_id for _, product_id in keys[:limit + 1]])
+        page = page_of(lines, limit, lambda line: encode_cursor(line.created_at, line.id))
+        if include_total:
+            page["total"] = len(entries)
+        return page
+
+    def add(self, db, user_id, product, quantity):
+        key = self._key(user_id)
+        self._ensure(db, user_id)
+        # MULTI/EXEC: one round trip, and no other write lands between the steps
+        pipe = self.kv.pipeline()
+        pipe.hsetnx(key, f"t:{product.id}", utcnow().isoformat())
+        pipe.hincrby(key, f"q:{product.id}", quantity)
+        pipe.sadd(DIRTY, user_id)
+        pipe.hget(key, f"t:{product.id}")
+        is_new, total, _, added_at = pipe.execute()
+        return CartLine(product.id, user_id, product.id, total, datetime.fromisoformat(added_at), product), bool(is_new)
+
+    def set_quantity(self, db, user_id, item_id, quantity):
+        key = self._key(user_id)
+        entry = self._entries(db, user_id).get(item_id)
+        if entry is None:
+            return None
+        self.kv.hset(key, f"q:{item_id}", quantity)
+        self._changed(user_id)
+        lines = self._lines(db, user_id, {item_id: (quantity, entry[1])}, [item_id])
+        return lines[0] if lines else None
+
+    def remove(self, db, user_id, item_id):
+        self._ensure(db, user_id)
+        removed = self.kv.hdel(self._key(user_id), f"q:{item_id}", f"t:{item_id}")
+        if removed:
+            self._changed(user_id)
+        return bool(removed)
+
+    def clear(self, db, user_id):
+        key = self._key(user_id)
+        self._ensure(db, user_id)
+        # Delete the lines rather than the hash so the cart stays loaded
+        fields = [field for field in self.kv.hgetall(key) if field != LOADED]
+        if fields:
+            self.kv.hdel(key, *fields)
+        self._changed(user_id)
+
+    def apply(self, db, user_id, operations):
+        key = self._key(user_id)
+        self._ensure(db, user_id)
+        added_at = utcnow().isoformat()
+        # MULTI/EXEC, so the batch lands all at once
+        pipe = self.kv.pipeline()
+        for operation in operations:
+            quantity, added = f"q:{operation.product_id}", f"t:{operation.product_id}"
+            if _removes(operation):
+                pipe.hdel(key, quantity, added)
+                continue
+            pipe.hsetnx(key, added, added_at)
+            if operation.op == "add":
+                pipe.hincrby(key, quantity, operation.quantity)
+            else:
+                pipe.hset(key, quantity, operation.quantity)
+        pipe.sadd(DIRTY, user_id)
+        pipe.execute()
+        return self.lines(db, user_id)
+
+    def summary(self, db, user_id):
+        entries = self._entries(db, user_id)
+        prices = db.query(Product.id, Product.price, Product.is_available).filter(
+            Product.id.in_(entries)
+        ).all() if entries else []
+        total, unavailable = 0.0, 0
+        for product_id, price, is_available in prices:
+            if is_available:
+                total += price * entries[product_id][0]
+            else:
+                unavailable += 1
+        return {
+            "items": len(prices),
+            "quantity": sum(entries[product_id][0] for product_id, _, _ in prices),
+            "total": total,
+            "unavailable": unavailable,
+        }
+
+    def quantities(self, db, user_id):
+        return [(product_id, quantity) for product_id, (quantity, _) in self._entries(db, user_id).items()]
+
+    def remove_products(self, db, user_id, product_ids):
+        # Keep the table copy in step within the checkout transaction
+        _delete_rows(db, user_id, product_ids)
+
+    def products_removed(self, user_id, product_ids):
+        fields = [f"{prefix}:{product_id}" for product_id in product_ids for prefix in ("q", "t")]
+        if fields:
+            self.kv.hdel(self._key(user_id), *fields)
+        self._changed(user_id)
+
+    def flush(self):
+        """Copy every dirty cart to ``cart_items``; returns how many carts were written."""
+        written = 0
+        while True:
+            user_ids = self.kv.spop(DIRTY, CART_FLUSH_BATCH)
+            if not user_ids:
+                return written
+            db = SessionLocal()
+            try:
+                self._write(db, [int(user_id) for user_id in user_ids])
+                db.commit()
+            except Exception:
+                db.rollback()
+                # Retried on the next flush
+                self.kv.sadd(DIRTY, *user_ids)
+                raise
+            finally:
+                db.close()
+            written += len(user_ids)
+
+    def _write(self, db, user_ids):
+        carts = {}
+        for user_id in user_ids:
+            fields = self.kv.hgetall(self._key(user_id))
+            # A cart the store lost must not wipe the table copy
+            if LOADED in fields:
+                carts[user_id] = self._parse(fields)
+        if not carts:
+            return
+        product_ids = {product_id for entries in carts.values() for product_id in entries}
+        existing = set(db.scalars(select(Product.id).where(Product.id.in_(product_ids)))) if product_ids else set()
+        db.execute(delete(CartItem).where(CartItem.user_id.in_(carts)))
+        rows = [
+            {"user_id": user_id, "product_id": product_id, "quantity": quantity, "created_at": created_at}
+            for user_id, entries in carts.items()
+            for product_id, (quantity, created_at) in entries.items()
+            if product_id in existing
+        ]
+        if rows:
+            db.execute(insert(CartItem), rows)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cart-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 2)
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final cart flush failed")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Cart flush failed; retrying")
+
+
+def create_store(setting=CART_STORE):
+    if setting == "sql":
+        return SQLCartStore()
+    if setting == "memory":
+        return KVCartStore(MemoryKV())
+    if setting.startswith(("redis://", "rediss://", "unix://")):
+        import redis
+
+        return KVCartStore(redis.Redis.from_url(setting, decode_responses=True))
+    raise ValueError(f"Unknown CART_STORE {setting!r}; use sql, memory or a redis:// URL")
+
+
+store = create_store()
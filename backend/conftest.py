@@ -0,0 +1,132 @@
+import os
+import tempfile
+
+# Tests run against a throwaway SQLite database; this must be set before the
+# application modules create their engine.
+_test_dir = tempfile.mkdtemp(prefix="ecofinds-test-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_test_dir, 'test.db')}")
+# Cheap, inline bcrypt keeps the suite fast
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+# Tests expect cold caches; test_startup builds warmed apps itself
+os.environ.setdefault("WARMUP_ENABLED", "false")
+# Uploaded images go to the throwaway directory; thumbnails render inline
+os.environ.setdefault("IMAGE_STORAGE_DIR", os.path.join(_test_dir, "media"))
+os.environ.setdefault("IMAGE_THUMBNAIL_WORKERS", "0")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from auth import principal_cache
+import cart_store
+from database import Base, engine, SessionLocal
+import invalidation
+from main import app
+from models import Category, Product, User
+from request_metrics import request_metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    principal_cache.clear()
+    cart_store.store = cart_store.create_store()
+    invalidation.flush_all()
+    request_metrics.clear()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def category(db):
+    category = Category(name="Electronics", description="Electronic devices and gadgets")
+    db.add(category)
+    db.commit()
+    db.refresh(category)
+    return category
+
+
+@pytest.fixture
+def seller(db):
+    user = User(email="owner@example.com", username="owner", hashed_password="not-a-real-hash")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+@pytest.fixture
+def make_products(db, seller, category):
+    """
+    Adds ``count`` available products at each of ``prices`` (10.0 if none) and
+    returns their ids. ``title`` may use ``{i}``; ``fields`` set any other
+    column, including ``seller_id`` and ``category_id``.
+    """
+    def make_products(*prices, count=1, title="Item {i}", description="Pre-loved", **fields):
+        fields.setdefault("seller_id", seller.id)
+        fields.setdefault("category_id", category.id)
+        products = [
+            Product(title=title.format(i=i), description=description, price=price, **fields)
+            for i, price in enumerate(price for price in prices or (10.0,) for _ in range(count))
+        ]
+        db.add_all(products)
+        db.commit()
+        return [product.id for product in products]
+
+    return make_products
+
+
+class QueryCounter:
+    """Counts SQL statements the application sends to the test engine."""
+
+    def __init__(self):
+        self.count = 0
+
+    def _before_cursor_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+
+
+@pytest.fixture
+def count_queries():
+    return QueryCounter()
+
+
+def register_and_login(client, email="seller@example.com", username="seller", password="password123"):
+    response = client.post("/api/auth/register", json={
+        "email": email,
+        "username": username,
+        "password": password,
+    })
+    assert response.status_code == 200, response.text
+    response = client.post("/api/auth/login", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def auth_headers(client):
+    return register_and_login(client)
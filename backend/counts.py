@@ -0,0 +1,44 @@
+"""
+Cached per-user row counts for paginated endpoints.
+
+COUNT(*) over a heavy user's history costs as much as reading it, so totals
+are only computed when a client asks for them and then kept for a while.
+Writes drop the affected counts in every worker through the invalidation
+bus; the TTL bounds how stale a count can get if a message is missed.
+"""
+
+import os
+from cache import TTLCache
+import invalidation
+
+count_cache = TTLCache(
+    maxsize=int(os.getenv("COUNT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("COUNT_CACHE_TTL_SECONDS", "60")),
+)
+
+
+def cached_count(kind, user_id, query):
+    """``query.count()``, cached per ``(kind, user_id)``."""
+    key = (kind, user_id)
+    total = count_cache.get(key)
+    if total is None:
+        generation = count_cache.generation
+        total = query.order_by(None).count()
+        count_cache.set(key, total, generation=generation)
+    return total
+
+
+def counts_changed(user_id, *kinds):
+    """Publish that ``user_id``'s rows of ``kinds`` changed; call after commit."""
+    invalidation.publish("counts", {"user_id": user_id, "kinds": list(kinds)})
+
+
+def _on_counts_changed(payload):
+    if payload is None:
+        count_cache.clear()
+        return
+    for kind in payload["kinds"]:
+        count_cache.pop((kind, payload["user_id"]))
+
+
+invalidation.subscribe("counts", _on_counts_changed)
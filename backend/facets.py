@@ -0,0 +1,145 @@
+"""
+Facet counts for the product listing: available products per category and
+per price band.
+
+One aggregated query counts matching products grouped by (category, price
+band); category counts and the histogram are sums over that grid. The
+category filter is applied when rendering rather than in SQL, so one cached
+grid serves every category selection and category counts always show what
+picking another category would give.
+
+Grids are cached per search and price range. Product writes publish
+``(category, band, ±n)`` deltas with their "products" message; the unfiltered
+grid, which backs the default browse page, is adjusted in place instead of
+being recomputed, while filtered grids are dropped since we can't tell
+whether the written product matches them. A grid loaded in the moment between a
+write's commit and its message arriving counts that write twice; the TTL
+bounds how long such drift can last.
+"""
+
+import bisect
+import os
+from sqlalchemy import case, func
+from cache import TTLCache
+import invalidation
+from models import Category, Product
+from replicas import replica_cache_ttl, skips_cache
+
+# Upper bounds of the price bands; the last band is open-ended
+PRICE_BANDS = tuple(float(bound) for bound in os.getenv("FACET_PRICE_BANDS", "10,25,50,100,250,500").split(","))
+
+facet_cache = TTLCache(
+    maxsize=int(os.getenv("FACET_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("FACET_CACHE_TTL_SECONDS", "120")),
+)
+
+# Cache key of the grid with no search term or price range
+UNSEARCHED = ("facets", None, None)
+
+
+def price_band(price):
+    return bisect.bisect_right(PRICE_BANDS, price)
+
+
+def band_expression(column):
+    return case(
+        *((column < bound, index) for index, bound in enumerate(PRICE_BANDS)),
+        else_=len(PRICE_BANDS),
+    )
+
+
+class FacetGrid:
+    """Counts keyed on (category_id, band), plus the category names seen."""
+
+    def __init__(self, rows):
+        self.counts = {}
+        self.names = {}
+        for category_id, name, band, count in rows:
+            self.counts[(category_id, band)] = count
+            self.names[category_id] = name
+
+    def with_deltas(self, deltas):
+        """
+        A copy with ``(category_id, band, delta)`` changes applied, or None if
+        a category is new to the grid (its name isn't known here).
+        """
+        grid = FacetGrid(())
+        grid.counts = dict(self.counts)
+        grid.names = self.names
+        for category_id, band, delta in deltas:
+            if category_id not in self.names:
+                return None
+            key = (category_id, band)
+            grid.counts[key] = max(0, grid.counts.get(key, 0) + delta)
+        return grid
+
+    def render(self, category_id=None):
+        per_category = {}
+        bands = [0] * (len(PRICE_BANDS) + 1)
+        for (row_category, band), count in self.counts.items():
+            per_category[row_category] = per_category.get(row_category, 0) + count
+            if category_id is None or row_category == category_id:
+                bands[band] += count
+        categories = sorted(
+            ({"id": key, "name": self.names[key], "count": count} for key, count in per_category.items() if count),
+            key=lambda facet: (-facet["count"], facet["name"]),
+        )
+        bounds = (0.0,) + PRICE_BANDS
+        return {
+            "total": sum(bands),
+            "categories": categories,
+            "price_histogram": [
+                {"min": bounds[index], "max": PRICE_BANDS[index] if index < len(PRICE_BANDS) else None, "count": count}
+                for index, count in enumerate(bands)
+            ],
+        }
+
+
+def facet_key(search, search_mode, min_price=None, max_price=None):
+    if search or min_price is not None or max_price is not None:
+        return ("facets", search, search_mode, min_price, max_price)
+    return UNSEARCHED
+
+
+def facet_grid(db, key, filtered):
+    """
+    The cached grid for ``key``, or one computed from ``filtered``: a
+    function that applies the listing's search filters to a query.
+    """
+    grid = None if skips_cache(db) else facet_cache.get(key)
+    if grid is None:
+        generation = facet_cache.generation
+        ttl = replica_cache_ttl(facet_cache, db)
+        band = band_expression(Product.price)
+        query = db.query(Product.category_id, Category.name, band, func.count()).join(
+            Category, Category.id == Product.category_id
+        ).filter(Product.is_available == True)
+        rows = filtered(query).group_by(Product.category_id, Category.name, band).all()
+        grid = FacetGrid(rows)
+        facet_cache.set(key, grid, generation=generation, tags=() if key == UNSEARCHED else ("search",), ttl=ttl)
+    return grid
+
+
+def deltas(removed=(), added=()):
+    """Deltas for products leaving and joining the available set, given as (category_id, price) pairs."""
+    changes = {}
+    for sign, products in ((-1, removed), (1, added)):
+        for category_id, price in products:
+            key = (category_id, price_band(price))
+            changes[key] = changes.get(key, 0) + sign
+    return [[category_id, band, delta] for (category_id, band), delta in changes.items() if delta]
+
+
+def _on_products_changed(payload):
+    if payload is None or "facet_deltas" not in payload:
+        facet_cache.clear()
+        return
+    # Also stops any grid computed before this write from being stored
+    facet_cache.invalidate_tags("search")
+    if not payload["facet_deltas"]:
+        return
+    # In place, so a grid cached briefly (loaded from a replica) keeps its short expiry
+    facet_cache.replace(UNSEARCHED, lambda grid: grid.with_deltas(payload["facet_deltas"]))
+
+
+invalidation.subscribe("products", _on_products_changed)
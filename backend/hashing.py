@@ -0,0 +1,124 @@
+"""
+Password hashing off the request path.
+
+bcrypt burns 100-300ms of CPU per call. Running it inline holds the GIL and a
+worker thread (or the event loop in async mode), so a burst of logins stalls
+every other endpoint. Hashes are computed in a small dedicated process pool
+instead; callers wait without holding the GIL, and once ``max_pending``
+operations are queued new ones are refused so the caller can answer 503.
+
+This module is imported by the pool's worker processes, so it must stay free
+of database and web-framework imports.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(1, PASSWORD_HASH_WORKERS) * 8)))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when too many hashing operations are already queued."""
+
+
+def _hash(password):
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _warm():
+    # Loads the bcrypt backend, which passlib otherwise does on the first hash
+    pwd_context.handler().get_backend()
+
+
+def _wait(future):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # Worker thread (sync mode): block this thread only; the GIL is free
+        return future.result()
+    # Inside AsyncSession.run_sync (async mode): yield to the event loop
+    # instead of blocking it, the same way SQLAlchemy awaits the driver
+    from sqlalchemy.util import await_only
+    return await_only(asyncio.wrap_future(future))
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a pool of ``workers`` processes, or inline when
+    ``workers`` is 0 (handy for tests and one-off scripts).
+    """
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._pool
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHashingBusy()
+            self.pending += 1
+        try:
+            return _wait(self._executor().submit(fn, *args))
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    def hash(self, password):
+        return self._run(_hash, password)
+
+    def verify(self, plain_password, hashed_password):
+        return self._run(_verify, plain_password, hashed_password)
+
+    def start(self):
+        """Spawn the worker processes and load bcrypt now rather than on the first login."""
+        if self.workers <= 0:
+            _warm()
+            return
+        executor = self._executor()
+        for future in [executor.submit(_warm) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+        }
+
+
+password_hasher = PasswordHasher()
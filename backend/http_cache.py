@@ -0,0 +1,30 @@
+"""
+Helpers for ETags and conditional GET.
+"""
+
+import hashlib
+from fastapi import Request, Response
+
+
+def etag_for(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names ``etag``."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def json_response(body: bytes, headers: dict) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
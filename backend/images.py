@@ -0,0 +1,317 @@
+"""
+Product images: content-addressed storage and background thumbnails.
+
+An upload is stored once, under the SHA-256 of its bytes:
+IMAGE_STORAGE_DIR/originals/ab/<digest>.<ext>. Uploading the same photo
+again (a relisted item, a seller re-saving a form) costs no disk and returns
+the same URLs, and since a URL can never point at different bytes, images
+are served with year-long immutable caching.
+
+Listing cards and product pages get thumbnails instead of the original, in
+WebP and JPEG (THUMBNAIL_SIZES). Decoding and resizing a phone photo takes
+hundreds of milliseconds of CPU, so thumbnails are rendered in a small
+process pool after the upload has been answered; a request for one that
+isn't rendered yet waits for it.
+
+This module is imported by the pool's worker processes, so it must stay free
+of database and web-framework imports.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STORAGE_DIR = os.getenv("IMAGE_STORAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "media"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+# Decoded size limit; guards against small files that decompress to huge bitmaps
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+IMAGE_THUMBNAIL_WORKERS = int(os.getenv("IMAGE_THUMBNAIL_WORKERS", str(min(2, os.cpu_count() or 1))))
+
+# Longest side, in pixels, of each thumbnail
+THUMBNAIL_SIZES = {"listing": 400, "detail": 1200}
+# Upload formats accepted, by Pillow format name, and the extension stored
+UPLOAD_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+# Thumbnail formats, by extension: Pillow format name and encoder options
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+CONTENT_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+CHUNK_SIZE = 256 * 1024
+
+
+class ImageTooLarge(Exception):
+    """Raised when an upload exceeds IMAGE_MAX_BYTES or IMAGE_MAX_PIXELS."""
+
+
+class InvalidImage(Exception):
+    """Raised when an upload isn't an image in one of UPLOAD_FORMATS."""
+
+
+class StoredImage(NamedTuple):
+    digest: str
+    ext: str
+    width: int
+    height: int
+    deduplicated: bool
+
+
+def original_url(digest, ext):
+    return f"/api/images/{digest}.{ext}"
+
+
+def thumbnail_url(digest, size, ext):
+    return f"/api/images/{digest}/{size}.{ext}"
+
+
+def urls(digest, ext):
+    """The original's URL and every thumbnail URL of an image."""
+    return {
+        "url": original_url(digest, ext),
+        "thumbnails": {
+            size: {thumb_ext: thumbnail_url(digest, size, thumb_ext) for thumb_ext in THUMBNAIL_FORMATS}
+            for size in THUMBNAIL_SIZES
+        },
+    }
+
+
+def _write(image, path, ext):
+    # Write beside the target and rename, so readers never see half a file
+    fmt, options = THUMBNAIL_FORMATS[ext]
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            image.save(file, fmt, **options)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _render(source, targets):
+    """Write each (path, longest side, ext) thumbnail of the image at ``source``."""
+    from PIL import Image, ImageOps
+
+    largest = max(side for _, side, _ in targets)
+    with Image.open(source) as image:
+        # JPEGs decode straight at a reduced scale when that is still big enough
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        transparent = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if transparent else "RGB")
+        resized = {}
+        for path, side, ext in targets:
+            if side not in resized:
+                thumbnail = image.copy()
+                thumbnail.thumbnail((side, side), Image.Resampling.LANCZOS)
+                resized[side] = thumbnail
+            thumbnail = resized[side]
+            if ext == "jpg" and transparent:
+                # No alpha in JPEG: flatten onto white
+                background = Image.new("RGB", thumbnail.size, (255, 255, 255))
+                background.paste(thumbnail, mask=thumbnail.getchannel("A"))
+                thumbnail = background
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _write(thumbnail, path, ext)
+
+
+def _identify(path):
+    # Header only: Pillow reads the format and size without decoding pixels
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            fmt, (width, height) = image.format, image.size
+            if fmt in UPLOAD_FORMATS and width * height <= IMAGE_MAX_PIXELS:
+                image.verify()
+    except Image.DecompressionBombError:
+        raise ImageTooLarge()
+    except Exception:
+        raise InvalidImage()
+    if fmt not in UPLOAD_FORMATS:
+        raise InvalidImage()
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ImageTooLarge()
+    return UPLOAD_FORMATS[fmt], width, height
+
+
+class IncomingImage:
+    """
+    An upload being received: each chunk is hashed and written to a file in
+    ``<root>/incoming`` as it arrives, and one past ``max_bytes`` raises
+    ImageTooLarge, so an upload never takes more disk than the limit.
+    """
+
+    def __init__(self, store):
+        incoming = os.path.join(store.root, "incoming")
+        os.makedirs(incoming, exist_ok=True)
+        descriptor, self.path = tempfile.mkstemp(dir=incoming)
+        self.file = os.fdopen(descriptor, "wb")
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.max_bytes = store.max_bytes
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise ImageTooLarge()
+        self.hash.update(chunk)
+        self.file.write(chunk)
+
+    def discard(self):
+        """Drop the temporary file, unless ``ImageStore.finish`` moved it into place."""
+        self.file.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class ImageStore:
+    """
+    Images under ``root``, with thumbnails rendered by a pool of ``workers``
+    processes, or inline when ``workers`` is 0 (handy for tests).
+    """
+
+    def __init__(self, root=IMAGE_STORAGE_DIR, workers=IMAGE_THUMBNAIL_WORKERS, max_bytes=IMAGE_MAX_BYTES):
+        self.root = root
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.stored = 0
+        self.deduplicated = 0
+        self.rendered = 0
+        self.failed = 0
+        self._pool = None
+        self._rendering = {}
+        self._lock = threading.Lock()
+
+    def original_path(self, digest, ext):
+        return os.path.join(self.root, "originals", digest[:2], f"{digest}.{ext}")
+
+    def thumbnail_path(self, digest, size, ext):
+        return os.path.join(self.root, "thumbnails", digest[:2], f"{digest}-{size}.{ext}")
+
+    def find_original(self, digest):
+        """The stored original's (path, ext), or None."""
+        for ext in UPLOAD_FORMATS.values():
+            path = self.original_path(digest, ext)
+            if os.path.exists(path):
+                return path, ext
+        return None
+
+    def _thumbnail_targets(self, digest):
+        return [
+            (self.thumbnail_path(digest, size, ext), side, ext)
+            for size, side in THUMBNAIL_SIZES.items()
+            for ext in THUMBNAIL_FORMATS
+        ]
+
+    def receive(self):
+        """An ``IncomingImage`` to write an upload into as it arrives."""
+        return IncomingImage(self)
+
+    def put(self, file):
+        """``receive`` and ``finish`` the image read from ``file``."""
+        incoming = self.receive()
+        try:
+            while chunk := file.read(CHUNK_SIZE):
+                incoming.write(chunk)
+            return self.finish(incoming)
+        finally:
+            incoming.discard()
+
+    def finish(self, incoming):
+        """
+        Store a fully received image unless the same bytes are already stored,
+        and start rendering its thumbnails. Raises InvalidImage or ImageTooLarge.
+        """
+        incoming.file.close()
+        ext, width, height = _identify(incoming.path)
+        digest = incoming.hash.hexdigest()
+        path = self.original_path(digest, ext)
+        deduplicated = os.path.exists(path)
+        if not deduplicated:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(incoming.path, path)
+        with self._lock:
+            if deduplicated:
+                self.deduplicated += 1
+            else:
+                self.stored += 1
+        self.render(digest, ext)
+        return StoredImage(digest, ext, width, height, deduplicated)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            return self._pool
+
+    def render(self, digest, ext):
+        """
+        Render ``digest``'s thumbnails unless they exist or are already under
+        way; returns a Future that is done once they exist.
+        """
+        targets = self._thumbnail_targets(digest)
+        if all(os.path.exists(path) for path, _, _ in targets):
+            future = Future()
+            future.set_result(None)
+            return future
+        executor = self._executor() if self.workers > 0 else None
+        with self._lock:
+            future = self._rendering.get(digest)
+            if future is not None:
+                return future
+            if executor is None:
+                future = Future()
+            else:
+                future = executor.submit(_render, self.original_path(digest, ext), targets)
+            self._rendering[digest] = future
+        if executor is None:
+            try:
+                _render(self.original_path(digest, ext), targets)
+                future.set_result(None)
+            except Exception as exc:
+                future.set_exception(exc)
+        future.add_done_callback(lambda done: self._finished(digest, done))
+        return future
+
+    def _finished(self, digest, future):
+        with self._lock:
+            self._rendering.pop(digest, None)
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.rendered += 1
+        if not future.cancelled() and future.exception() is not None:
+            logger.error("Rendering thumbnails of %s failed", digest, exc_info=future.exception())
+
+    def shutdown(self):
+        # Renders still queued are dropped; they run again on first request
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "stored": self.stored,
+            "deduplicated": self.deduplicated,
+            "rendering": len(self._rendering),
+            "rendered": self.rendered,
+            "failed": self.failed,
+        }
+
+
+image_store = ImageStore()
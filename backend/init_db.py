@@ -12,16 +12,17 @@ from sqlalchemy.orm import sessionmaker
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import Base, engine
+from database import engine
 from models import Category
+import migrate
 
 def init_database():
     """Initialize the database with tables and initial data"""
     
-    # Create all tables
-    print("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    print("✅ Database tables created successfully!")
+    # Create or upgrade the tables
+    print("Migrating database tables...")
+    migrate.upgrade()
+    print("✅ Database tables are up to date!")
     
     # Create session
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
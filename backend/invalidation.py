@@ -0,0 +1,220 @@
+"""
+Cache invalidation messages shared between worker processes.
+
+Write paths ``publish`` a topic (optionally with a payload such as an id)
+after they commit; every in-process cache ``subscribe``s to the topics it
+depends on. A payload of None means "drop everything for this topic".
+
+Subscribers in the publishing process run immediately. With
+CACHE_INVALIDATION=postgres the message is also sent with NOTIFY, and a
+listener thread in every other worker delivers it there, so multi-process
+deployments don't keep serving stale data. CACHE_INVALIDATION=socket does the
+same for workers on one host without PostgreSQL (SQLite, development, tests)
+over Unix datagram sockets. A message too large for the transport is sent
+with a None payload instead, so other workers drop the whole topic.
+"""
+
+import json
+import logging
+import os
+import select
+import socket
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+CACHE_INVALIDATION = os.getenv("CACHE_INVALIDATION", "local")
+CHANNEL = "ecofinds_invalidation"
+# Where socket transport workers bind their sockets; one directory per deployment
+CACHE_INVALIDATION_SOCKET_DIR = os.getenv(
+    "CACHE_INVALIDATION_SOCKET_DIR", os.path.join(tempfile.gettempdir(), "ecofinds-invalidation")
+)
+
+# Identifies this process so it can ignore its own broadcasts
+ORIGIN = uuid.uuid4().hex
+
+_subscribers = defaultdict(list)
+_transport = None
+
+
+def subscribe(topic, callback):
+    """Call ``callback(payload)`` whenever ``topic`` is published by any worker."""
+    _subscribers[topic].append(callback)
+
+
+def _deliver(topic, payload):
+    for callback in list(_subscribers.get(topic, ())):
+        try:
+            callback(payload)
+        except Exception:
+            logger.exception("Invalidation callback for %r failed", topic)
+
+
+def publish(topic, payload=None):
+    _deliver(topic, payload)
+    if _transport is not None:
+        try:
+            message = json.dumps({"origin": ORIGIN, "topic": topic, "payload": payload})
+            if len(message.encode()) > _transport.max_message:
+                message = json.dumps({"origin": ORIGIN, "topic": topic, "payload": None})
+            _transport.send(message)
+        except Exception:
+            # Other workers fall back to their cache TTLs
+            logger.exception("Could not broadcast invalidation for %r", topic)
+
+
+def flush_all():
+    """Tell every subscriber to drop everything, e.g. after missing messages."""
+    for topic in list(_subscribers):
+        _deliver(topic, None)
+
+
+def receive(message):
+    """Deliver a message broadcast by another worker."""
+    data = json.loads(message)
+    if data.get("origin") != ORIGIN:
+        _deliver(data["topic"], data.get("payload"))
+
+
+class PostgresTransport:
+    """Broadcasts with NOTIFY and listens with LISTEN on a dedicated connection."""
+
+    # NOTIFY payloads must be shorter than 8000 bytes
+    max_message = 7999
+
+    def __init__(self, engine, channel=CHANNEL, poll_interval=1.0):
+        self.engine = engine
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def send(self, message):
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :message)"), {"channel": self.channel, "message": message})
+            connection.commit()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, name="invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                self._listen_once()
+            except Exception:
+                logger.exception("Invalidation listener lost its connection; reconnecting")
+                self._stop.wait(self.poll_interval)
+
+    def _listen_once(self):
+        connection = self.engine.raw_connection()
+        try:
+            dbapi_connection = connection.driver_connection
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            # Anything published while we weren't listening was missed
+            flush_all()
+            while not self._stop.is_set():
+                if select.select([dbapi_connection], [], [], self.poll_interval) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    receive(dbapi_connection.notifies.pop(0).payload)
+        finally:
+            connection.invalidate()
+
+
+class SocketTransport:
+    """
+    Broadcasts between workers on one host with no broker: every worker binds
+    a Unix datagram socket in ``directory`` and sends each message to all the
+    other sockets there. Sockets left behind by workers that died are removed
+    when a send finds nobody listening.
+    """
+
+    max_message = 65000
+
+    def __init__(self, directory=CACHE_INVALIDATION_SOCKET_DIR, name=ORIGIN, deliver=receive, poll_interval=1.0):
+        self.directory = directory
+        self.path = os.path.join(directory, f"{name}.sock")
+        self.deliver = deliver
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._receiver = None
+        # Never block a request on a worker that isn't reading
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+
+    def send(self, message):
+        data = message.encode()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if path == self.path or not name.endswith(".sock"):
+                continue
+            try:
+                self._sender.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Its worker is gone
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                logger.warning("Invalidation queue of %s is full; it falls back to cache TTLs", name)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receiver.bind(self.path)
+        self._thread = threading.Thread(target=self._listen, name="invalidation-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval * 2)
+        if self._receiver is not None:
+            self._receiver.close()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        self._sender.close()
+
+    def _listen(self):
+        while not self._stop.is_set():
+            if select.select([self._receiver], [], [], self.poll_interval) == ([], [], []):
+                continue
+            try:
+                self.deliver(self._receiver.recv(self.max_message + 1024).decode())
+            except Exception:
+                logger.exception("Could not deliver an invalidation message")
+
+
+def start(engine):
+    """Start cross-worker delivery for the configured CACHE_INVALIDATION backend."""
+    global _transport
+    if CACHE_INVALIDATION == "postgres" and engine.dialect.name == "postgresql":
+        _transport = PostgresTransport(engine)
+        _transport.start()
+    elif CACHE_INVALIDATION == "socket":
+        _transport = SocketTransport()
+        _transport.start()
+
+
+def stop():
+    global _transport
+    transport, _transport = _transport, None
+    if transport is not None:
+        transport.stop()
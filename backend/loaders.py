@@ -0,0 +1,35 @@
+"""
+Loader options for models serialized with nested response schemas.
+
+Every relationship in models.py is a default lazy load, so serializing a list
+of products, cart items or purchases would issue extra SELECTs per row. These
+options load everything the response schemas touch up front: many-to-one
+chains are joined into the main query, collections come in with one extra
+SELECT ... IN query.
+"""
+
+from sqlalchemy.orm import joinedload, selectinload
+from models import CartItem, Product, Purchase, PurchaseItem
+
+
+def product_options():
+    return (
+        joinedload(Product.category),
+        joinedload(Product.seller),
+    )
+
+
+def cart_item_options():
+    product = joinedload(CartItem.product)
+    return (
+        product.joinedload(Product.category),
+        product.joinedload(Product.seller),
+    )
+
+
+def purchase_options():
+    product = selectinload(Purchase.items).joinedload(PurchaseItem.product)
+    return (
+        product.joinedload(Product.category),
+        product.joinedload(Product.seller),
+    )
@@ -1,37 +1,103 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 
-from database import get_db, engine
+from database import get_db, engine, DB_MODE
+from hashing import password_hasher
+from images import image_store
+import invalidation
+import cart_store
+import warmup
+from request_metrics import MetricsMiddleware
+from replicas import ReadYourWritesMiddleware
 from models import Base
-from routers import auth, products, users, cart, purchases
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="EcoFinds API", version="1.0.0")
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # React dev server
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(auth.router, prefix="/api/auth", tags=["authentication"])
-app.include_router(users.router, prefix="/api/users", tags=["users"])
-app.include_router(products.router, prefix="/api/products", tags=["products"])
-app.include_router(cart.router, prefix="/api/cart", tags=["cart"])
-app.include_router(purchases.router, prefix="/api/purchases", tags=["purchases"])
-
-@app.get("/")
-async def root():
-    return {"message": "EcoFinds API is running!"}
+import search  # registers the product full-text index with create_all
+from routers import auth, products, users, cart, purchases, admin, metrics, health, images
+from routers.aio import async_router
+
+# What startup does to the schema: "none" leaves it to the deploy step
+# (python migrate.py), "migrate" runs the migrations, "create" creates
+# missing tables without migrations (local development)
+DB_SCHEMA_ON_STARTUP = os.getenv("DB_SCHEMA_ON_STARTUP", "none")
+
+# Per-route latency and SQL cost, scraped from /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+
+def prepare_schema(schema):
+    if schema == "migrate":
+        import migrate
+        migrate.upgrade()
+    elif schema == "create":
+        Base.metadata.create_all(bind=engine)
+    elif schema != "none":
+        raise ValueError(f"Unknown DB_SCHEMA_ON_STARTUP {schema!r}")
+
+def api_router(module):
+    # In async mode the routes run on the event loop against an AsyncSession
+    return async_router(module.router) if DB_MODE == "async" else module.router
+
+def create_app(schema=DB_SCHEMA_ON_STARTUP, warm=warmup.WARMUP_ENABLED):
+    """Build the application; ``uvicorn --factory main:create_app`` works as well as ``main:app``."""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.ready = False
+        await run_in_threadpool(prepare_schema, schema)
+        invalidation.start(engine)
+        cart_store.store.start()
+        if warm:
+            app.state.warmup = await warmup.warm()
+        app.state.ready = True
+        yield
+        # Fail readiness first so the load balancer stops sending traffic
+        app.state.ready = False
+        cart_store.store.stop()
+        invalidation.stop()
+        password_hasher.shutdown()
+        image_store.shutdown()
+
+    app = FastAPI(title="EcoFinds API", version="1.0.0", lifespan=lifespan)
+    app.state.ready = False
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000"],  # React dev server
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Pins a client's reads to the primary just after its writes, when replicas are in use
+    app.add_middleware(ReadYourWritesMiddleware)
+    if METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
+    # Include routers
+    app.include_router(api_router(auth), prefix="/api/auth", tags=["authentication"])
+    app.include_router(api_router(users), prefix="/api/users", tags=["users"])
+    app.include_router(api_router(products), prefix="/api/products", tags=["products"])
+    app.include_router(api_router(cart), prefix="/api/cart", tags=["cart"])
+    app.include_router(api_router(purchases), prefix="/api/purchases", tags=["purchases"])
+    # Uploads and immutable image files; no SQL, so the same routes in both modes
+    app.include_router(images.router, prefix="/api/images", tags=["images"])
+    app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+    app.include_router(health.router)
+    if METRICS_ENABLED:
+        app.include_router(metrics.router)
+
+    @app.get("/")
+    async def root():
+        return {"message": "EcoFinds API is running!"}
+
+    return app
+
+app = create_app()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,93 @@
+"""
+Lightweight, thread-safe metric types for in-process telemetry.
+"""
+
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (seconds by default)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self):
+        """(upper bound, observations <= bound) pairs, ending with +Inf."""
+        with self._lock:
+            counts = list(self._counts)
+        pairs, running = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {("+Inf" if bound == float("inf") else str(bound)): count for bound, count in self.cumulative()},
+        }
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Exposition:
+    """Collects samples and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._families = {}
+
+    def _family(self, name, kind, help):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (kind, help, [])
+        return family[2]
+
+    def add(self, name, kind, help, value, **labels):
+        self._family(name, kind, help).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def add_histogram(self, name, help, histogram, **labels):
+        lines = self._family(name, "histogram", help)
+        for bound, count in histogram.cumulative():
+            bucket_labels = dict(labels, le=_format_value(float(bound)))
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+
+    def render(self):
+        out = []
+        for name, (kind, help, lines) in self._families.items():
+            out.append(f"# HELP {name} {help}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Schema migrations, run with Alembic from ``migrations/``.
+
+``python migrate.py`` upgrades the database at DATABASE_URL to the latest
+revision; ``alembic`` run from this directory works too, for generating
+revisions or moving to a specific one. Databases created with ``create_all``
+before migrations existed are stamped at the initial revision first, so the
+later revisions add what they are missing.
+"""
+
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect, text
+from database import Base, engine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INITIAL_REVISION = "0001"
+
+
+def alembic_config(connection=None):
+    config = Config(os.path.join(HERE, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(HERE, "migrations"))
+    if connection is not None:
+        config.attributes["connection"] = connection
+    return config
+
+
+def upgrade(bind=engine, revision="head"):
+    with bind.begin() as connection:
+        config = alembic_config(connection)
+        tables = set(inspect(connection).get_table_names())
+        if "users" in tables and "alembic_version" not in tables:
+            command.stamp(config, INITIAL_REVISION)
+        command.upgrade(config, revision)
+
+
+def downgrade(revision, bind=engine):
+    with bind.begin() as connection:
+        command.downgrade(alembic_config(connection), revision)
+
+
+def drop_all(bind=engine):
+    """Drop every table, including Alembic's version table."""
+    import search  # noqa: F401  drops the full-text index with the tables
+    Base.metadata.drop_all(bind=bind)
+    with bind.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+
+if __name__ == "__main__":
+    upgrade()
+    print("✅ Database schema is up to date")
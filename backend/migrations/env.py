@@ -0,0 +1,42 @@
+"""
+Alembic environment. Migrates the database at DATABASE_URL, or the
+connection ``migrate.upgrade`` passes in through ``config.attributes``.
+"""
+
+from logging.config import fileConfig
+from alembic import context
+from database import Base, DATABASE_URL, engine
+import models  # noqa: F401  (registers the tables on Base.metadata)
+
+config = context.config
+connection = config.attributes.get("connection")
+
+# Only configure logging when run from the alembic command line
+if config.config_file_name is not None and connection is None:
+    fileConfig(config.config_file_name)
+
+
+def _configure(**options):
+    # Batch mode lets ALTERs run on SQLite by rebuilding the table
+    context.configure(target_metadata=Base.metadata, render_as_batch=True, **options)
+
+
+def run_migrations_offline():
+    _configure(url=DATABASE_URL, literal_binds=True, dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online(connection):
+    _configure(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif connection is not None:
+    run_migrations_online(connection)
+else:
+    with engine.connect() as connection:
+        run_migrations_online(connection)
@@ -0,0 +1,114 @@
+"""Search index and listing/account indexes
+
+The product full-text index and the composite indexes behind keyset
+pagination, price sorting and the per-user account pages.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2025-09-06 10:05:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The search index as of this revision, spelled out so later changes to
+# search.py don't change what this revision does
+POSTGRES_SEARCH_DDL = [
+    """
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        title, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO products_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+INDEXES = [
+    ("ix_products_available_category_created", "products", ["is_available", "category_id", "created_at", "id"]),
+    ("ix_products_available_created", "products", ["is_available", "created_at", "id"]),
+    ("ix_products_available_category_price", "products", ["is_available", "category_id", "price", "id"]),
+    ("ix_products_available_price", "products", ["is_available", "price", "id"]),
+    ("ix_products_seller_created", "products", ["seller_id", "created_at", "id"]),
+    ("ix_cart_items_user_created", "cart_items", ["user_id", "created_at", "id"]),
+    ("ix_purchases_buyer_created", "purchases", ["buyer_id", "created_at", "id"]),
+]
+
+
+def _existing(table):
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def _create_search_index():
+    # Idempotent; also backfills the index for existing products
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            op.execute(statement)
+    elif dialect == "sqlite":
+        existed = op.get_bind().execute(
+            sa.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+        ).first()
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        if not existed:
+            op.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+def upgrade() -> None:
+    _create_search_index()
+    for name, table, columns in INDEXES:
+        # Databases built by create_all before migrations existed may have it
+        if name not in _existing(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_products_search_vector")
+        op.execute("ALTER TABLE products DROP COLUMN IF EXISTS search_vector")
+    else:
+        for trigger in ("products_fts_ai", "products_fts_ad", "products_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS products_fts")
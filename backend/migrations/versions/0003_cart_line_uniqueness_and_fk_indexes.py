@@ -0,0 +1,58 @@
+"""Unique cart lines and foreign key indexes
+
+Merges duplicate cart lines, then makes (user_id, product_id) unique so
+adding to the cart can be a single upsert. Indexes the foreign keys that no
+composite index leads with: cart_items.product_id, products.category_id and
+both purchase_items keys. cart_items.user_id, products.seller_id and
+purchases.buyer_id already lead ix_cart_items_user_created,
+ix_products_seller_created and ix_purchases_buyer_created.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-09-06 10:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("uq_cart_items_user_product", "cart_items", ["user_id", "product_id"], True),
+    ("ix_cart_items_product_id", "cart_items", ["product_id"], False),
+    ("ix_products_category_id", "products", ["category_id"], False),
+    ("ix_purchase_items_purchase_id", "purchase_items", ["purchase_id"], False),
+    ("ix_purchase_items_product_id", "purchase_items", ["product_id"], False),
+]
+
+
+def _existing(table):
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    # Fold duplicate lines into the oldest one, summing their quantities
+    op.execute("""
+        UPDATE cart_items SET quantity = (
+            SELECT SUM(duplicate.quantity) FROM cart_items AS duplicate
+            WHERE duplicate.user_id = cart_items.user_id AND duplicate.product_id = cart_items.product_id
+        )
+        WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id HAVING COUNT(*) > 1)
+    """)
+    op.execute("DELETE FROM cart_items WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id)")
+    for name, table, columns, unique in INDEXES:
+        # Databases built by create_all before migrations existed may have it
+        if name not in _existing(table):
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, Boolean
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
 
+def utcnow():
+    return datetime.now(timezone.utc)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -32,16 +36,29 @@ class Category(Base):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        # Keyset pagination over (created_at, id), with and without a category filter
+        Index("ix_products_available_category_created", "is_available", "category_id", "created_at", "id"),
+        Index("ix_products_available_created", "is_available", "created_at", "id"),
+        # Price sorts and price-range filters, walked in either direction
+        Index("ix_products_available_category_price", "is_available", "category_id", "price", "id"),
+        Index("ix_products_available_price", "is_available", "price", "id"),
+        # A seller's own listings, newest first
+        Index("ix_products_seller_created", "seller_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True, nullable=False)
     description = Column(Text, nullable=False)
     price = Column(Float, nullable=False)
-    image_url = Column(String)  # Placeholder for image
-    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
+    image_url = Column(String)  # An uploaded image (/api/images/...) or an external URL
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=False, index=True)
+    # Indexed by ix_products_seller_created
     seller_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     is_available = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set client-side too so ties on created_at are rare and cursors compare
+    # exactly on every backend (SQLite's CURRENT_TIMESTAMP has no fraction)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), default=utcnow)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
@@ -52,12 +69,18 @@ class Product(Base):
 
 class CartItem(Base):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        Index("ix_cart_items_user_created", "user_id", "created_at", "id"),
+        # One line per product; the conflict target of the add-to-cart upsert
+        Index("uq_cart_items_user_product", "user_id", "product_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    # Indexed by uq_cart_items_user_product and ix_cart_items_user_created
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     quantity = Column(Integer, default=1)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), default=utcnow)
     
     # Relationships
     user = relationship("User", back_populates="cart_items")
@@ -65,12 +88,16 @@ class CartItem(Base):
 
 class Purchase(Base):
     __tablename__ = "purchases"
+    __table_args__ = (
+        Index("ix_purchases_buyer_created", "buyer_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    # Indexed by ix_purchases_buyer_created
     buyer_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     total_amount = Column(Float, nullable=False)
     status = Column(String, default="completed")  # completed, cancelled, etc.
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), default=utcnow)
     
     # Relationships
     buyer = relationship("User", back_populates="purchases")
@@ -80,8 +107,8 @@ class PurchaseItem(Base):
     __tablename__ = "purchase_items"
     
     id = Column(Integer, primary_key=True, index=True)
-    purchase_id = Column(Integer, ForeignKey("purchases.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    purchase_id = Column(Integer, ForeignKey("purchases.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     quantity = Column(Integer, default=1)
     price_at_purchase = Column(Float, nullable=False)
     
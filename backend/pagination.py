@@ -0,0 +1,63 @@
+"""
+Opaque cursors for keyset pagination.
+
+A cursor carries the sort key of the last row on a page; the next page is
+everything strictly after that key in the listing order, which the database
+answers with an index range scan no matter how deep the client has paged.
+"""
+
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+
+def encode_cursor(*values) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types):
+    """Decode a cursor into values of the given types, or fail with 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(value) if type_ is datetime else type_(value)
+            for type_, value in zip(types, payload)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid cursor"
+        )
+
+
+def keyset(query, columns, types, descending, cursor: str = None):
+    """
+    Order ``query`` by ``columns`` (all ascending or all descending) and,
+    given a cursor holding the last row's values of those columns, skip to
+    the next page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, *types)
+        bound = tuple_(*columns) < tuple_(*values) if descending else tuple_(*columns) > tuple_(*values)
+        query = query.filter(bound)
+    return query.order_by(*(column.desc() if descending else column.asc() for column in columns))
+
+
+def newest_first(query, created_at_column, id_column, cursor: str = None):
+    """Order ``query`` newest first and, given a cursor, skip to the next page."""
+    return keyset(query, (created_at_column, id_column), (datetime, int), True, cursor)
+
+
+def page_of(rows, limit, cursor_for):
+    """Split one over-fetched row off ``rows`` and build the next cursor from it."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = cursor_for(rows[-1]) if has_more else None
+    return {"items": rows, "next_cursor": next_cursor}
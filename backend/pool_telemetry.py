@@ -0,0 +1,81 @@
+"""
+Connection pool telemetry: how long requests wait for a connection, how
+often they give up, and how full the pool is, so pools can be sized against
+worker counts.
+"""
+
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from metrics import Histogram
+
+
+class PoolTelemetry:
+    def __init__(self, name):
+        self.name = name
+        self.wait_seconds = Histogram()
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+        self.pool = None
+
+    def _count(self, attribute):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+    def pool_class(self, base):
+        """A subclass of the pool class ``base`` that reports into this telemetry."""
+        telemetry = self
+
+        class InstrumentedPool(base):
+            def _do_get(self):
+                started = time.perf_counter()
+                try:
+                    return super()._do_get()
+                except PoolTimeoutError:
+                    telemetry._count("timeouts")
+                    raise
+                finally:
+                    telemetry.wait_seconds.observe(time.perf_counter() - started)
+
+        InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+        return InstrumentedPool
+
+    def instrument(self, engine):
+        self.pool = engine.pool
+        event.listen(engine, "connect", lambda *args: self._count("connects"))
+        event.listen(engine, "invalidate", lambda *args: self._count("invalidations"))
+        # dispose() swaps in a fresh pool; keep reporting on the live one
+        event.listen(engine, "engine_disposed", lambda *args: setattr(self, "pool", engine.pool))
+
+    def stats(self):
+        pool = self.pool
+        stats = {
+            "name": self.name,
+            "pool_class": type(pool).__name__ if pool is not None else None,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+        if pool is not None and hasattr(pool, "checkedout"):
+            stats.update({
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            })
+        return stats
+
+    def collect(self, exposition):
+        stats = self.stats()
+        labels = {"pool": self.name}
+        for key in ("size", "checked_in", "checked_out", "overflow"):
+            if key in stats:
+                exposition.add(f"db_pool_{key}", "gauge", f"Connection pool {key.replace('_', ' ')}", stats[key], **labels)
+        exposition.add("db_pool_connects_total", "counter", "Connections opened", self.connects, **labels)
+        exposition.add("db_pool_invalidations_total", "counter", "Connections invalidated", self.invalidations, **labels)
+        exposition.add("db_pool_timeouts_total", "counter", "Checkouts that gave up waiting for a connection", self.timeouts, **labels)
+        exposition.add_histogram("db_pool_wait_seconds", "Time spent waiting to check out a connection", self.wait_seconds, **labels)
@@ -0,0 +1,109 @@
+"""
+Server-side cache of serialized product responses.
+
+Product detail and listing responses are cached as ready-to-send JSON with
+their ETag, so repeat visitors cost neither a query nor serialization, and an
+If-None-Match that matches is answered with 304 straight from memory. There
+is no Last-Modified: a response changes when its seller or category does, or
+when a product leaves a listing, none of which moves a product timestamp.
+
+Entries are tagged so writes only drop what they can affect: a product's own
+detail entry, listings filtered to its old or new category, and listings that
+aren't filtered by category at all.
+"""
+
+import json
+import os
+from typing import NamedTuple
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from cache import TTLCache
+from http_cache import etag_for, etag_matches, json_response, not_modified
+import invalidation
+from replicas import replica_cache_ttl, skips_cache
+
+UNFILTERED_LISTINGS = "listings:unfiltered"
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+
+product_cache = TTLCache(
+    maxsize=int(os.getenv("PRODUCT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("PRODUCT_CACHE_TTL_SECONDS", "300")),
+    max_bytes=int(os.getenv("PRODUCT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    sizeof=lambda cached: len(cached.body),
+)
+
+
+def detail_tags(product_id):
+    return (f"product:{product_id}",)
+
+
+def listing_tags(category_id):
+    return (f"category:{category_id}",) if category_id else (UNFILTERED_LISTINGS,)
+
+
+def normalize_search(search):
+    return " ".join(search.lower().split()) if search else None
+
+
+def cached_response(key, tags, load, db=None):
+    """
+    The cached response for ``key``, filled with ``load()`` on a miss. ``load``
+    returns the response payload (or its already serialized JSON bytes); it
+    may raise
+    HTTPException, which is not cached. ``db`` is the session ``load`` reads
+    through, if it may be a replica; a client reading its own writes skips
+    the lookup and refreshes the entry from the primary.
+    """
+    cached = None if skips_cache(db) else product_cache.get(key)
+    if cached is None:
+        generation = product_cache.generation
+        ttl = replica_cache_ttl(product_cache, db) if db is not None else None
+        payload = load()
+        body = payload if isinstance(payload, bytes) else json.dumps(jsonable_encoder(payload)).encode()
+        cached = CachedResponse(body, etag_for(body))
+        product_cache.set(key, cached, generation=generation, tags=tags, ttl=ttl)
+    return cached
+
+
+def serve(request: Request, key, tags, load, db=None):
+    """Answer from the cache, filling it on a miss; see ``cached_response``."""
+    cached = cached_response(key, tags, load, db)
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, cached.etag):
+        return not_modified(headers)
+    return json_response(cached.body, headers)
+
+
+def products_changed(product_ids, category_ids, facet_deltas=None):
+    """
+    Publish that products were written; call after the transaction commits.
+    ``facet_deltas`` (see ``facets.deltas``) lets the facet cache update its
+    counts instead of starting over.
+    """
+    payload = {
+        "ids": sorted(set(product_ids)),
+        "categories": sorted(set(category_ids)),
+    }
+    if facet_deltas is not None:
+        payload["facet_deltas"] = facet_deltas
+    invalidation.publish("products", payload)
+
+
+def _on_products_changed(payload):
+    if payload is None:
+        product_cache.clear()
+        return
+    tags = [UNFILTERED_LISTINGS]
+    tags.extend(f"product:{product_id}" for product_id in payload["ids"])
+    tags.extend(f"category:{category_id}" for category_id in payload["categories"])
+    product_cache.invalidate_tags(*tags)
+
+
+invalidation.subscribe("products", _on_products_changed)
+# Responses embed the seller's profile
+invalidation.subscribe("users", lambda payload: product_cache.clear())
@@ -0,0 +1,176 @@
+"""
+Read replicas for the read-heavy catalog endpoints.
+
+Set DATABASE_REPLICA_URLS to a comma-separated list of replica URLs and the
+routes that take ``get_read_db`` (product listings, details, facets and
+categories) run on a replica, round-robin, while everything else stays on
+the primary in DATABASE_URL. With no replicas configured ``get_read_db`` is
+the primary too.
+
+Replicas lag the primary by up to REPLICA_MAX_LAG_SECONDS, which covers two
+hazards:
+
+- Read-your-writes: a successful write (any non-GET request) sets a cookie
+  that sends the client's reads to the primary until the window has passed,
+  so sellers see the listing they just edited. Those reads also skip the
+  cache lookups (``skips_cache``), since another client may have just filled
+  an entry from a replica; what they load from the primary is stored.
+- Caches: a write invalidates the in-process caches at once, and the next
+  miss may refill them from a replica that hasn't applied the write yet.
+  Entries loaded from a replica within the window after an invalidation only
+  live until the window ends (``replica_cache_ttl``), not for the full TTL.
+"""
+
+import itertools
+import os
+import time
+from fastapi import Request
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import SessionLocal, _async_url, _engine_options, get_async_db
+from pool_telemetry import PoolTelemetry
+from request_metrics import instrument_engine
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+PRIMARY_COOKIE = "ecofinds_primary_until"
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class Replica:
+    """One replica: a sync engine, and an async one created on first use."""
+
+    def __init__(self, index, url):
+        self.url = url
+        self.telemetry = PoolTelemetry(f"replica-{index}")
+        self.engine = create_engine(url, **_engine_options(url, self.telemetry))
+        self.telemetry.instrument(self.engine)
+        instrument_engine(self.engine)
+        self.sessions = sessionmaker(autocommit=False, autoflush=False, bind=self.engine, info={"replica": True})
+        self.async_telemetry = PoolTelemetry(f"replica-{index}-async")
+        self._async_engine = None
+        self.async_sessions = None
+
+    def async_engine(self):
+        if self._async_engine is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+            url = _async_url(self.url)
+            self._async_engine = create_async_engine(url, **_engine_options(url, self.async_telemetry, async_driver=True))
+            self.async_telemetry.instrument(self._async_engine.sync_engine)
+            instrument_engine(self._async_engine.sync_engine)
+            self.async_sessions = async_sessionmaker(self._async_engine, autoflush=False, info={"replica": True})
+        return self._async_engine
+
+    def dispose(self):
+        self.engine.dispose()
+        if self._async_engine is not None:
+            self._async_engine.sync_engine.dispose()
+
+
+replicas = []
+_next = itertools.count()
+
+
+def configure(urls):
+    """Route reads to ``urls`` from now on (an empty list routes them to the primary)."""
+    global replicas
+    previous, replicas = replicas, [Replica(index, url) for index, url in enumerate(urls)]
+    for replica in previous:
+        replica.dispose()
+
+
+def telemetry():
+    """Pool telemetry of every replica engine in use."""
+    pools = [replica.telemetry for replica in replicas]
+    pools += [replica.async_telemetry for replica in replicas if replica.async_telemetry.pool is not None]
+    return pools
+
+
+def wants_primary(request: Request):
+    """Whether the client wrote recently enough that a replica may not show it yet."""
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _pick(request):
+    # (replica or None for the primary, whether the client must read its own writes)
+    if not replicas:
+        return None, False
+    if wants_primary(request):
+        return None, True
+    return replicas[next(_next) % len(replicas)], False
+
+
+def get_read_db(request: Request):
+    """A session for read-only routes: a replica unless there are none or the client just wrote."""
+    replica, pinned = _pick(request)
+    db = SessionLocal() if replica is None else replica.sessions()
+    if pinned:
+        db.info["read_your_writes"] = True
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    replica, pinned = _pick(request)
+    if replica is None:
+        async for db in get_async_db():
+            if pinned:
+                db.info["read_your_writes"] = True
+            yield db
+        return
+    replica.async_engine()
+    async with replica.async_sessions() as db:
+        yield db
+
+
+def skips_cache(db):
+    """
+    Whether reads through ``db`` must not be answered from a shared cache: its
+    client wrote within the lag window, and a cached entry may have been loaded
+    from a replica that doesn't have the write yet.
+    """
+    return db is not None and db.info.get("read_your_writes", False)
+
+
+def replica_cache_ttl(cache, db):
+    """
+    The TTL for an entry ``cache`` is about to load through ``db``: short if
+    ``db`` is a replica and the cache was invalidated within the lag window,
+    otherwise None (the cache's own TTL). Take it before loading.
+    """
+    if not db.info.get("replica"):
+        return None
+    remaining = REPLICA_MAX_LAG_SECONDS - cache.since_invalidation()
+    return remaining if remaining > 0 else None
+
+
+class ReadYourWritesMiddleware:
+    """Sends a client's reads to the primary for a while after each successful write."""
+
+    def __init__(self, app, window=REPLICA_MAX_LAG_SECONDS):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not replicas:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{PRIMARY_COOKIE}={time.time() + self.window:.3f}; Max-Age={int(self.window) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+configure(DATABASE_REPLICA_URLS)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends
+from auth import principal_cache, require_admin
+from database import async_pool_telemetry, pool_telemetry
+from hashing import password_hasher
+from images import image_store
+from product_cache import product_cache
+import replicas
+from routers.products import category_cache
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/cache")
+def get_cache_stats():
+    return {
+        "principals": principal_cache.stats(),
+        "categories": category_cache.stats(),
+        "products": product_cache.stats(),
+    }
+
+@router.get("/password-hashing")
+def get_password_hashing_stats():
+    return password_hasher.stats()
+
+@router.get("/images")
+def get_image_stats():
+    return image_store.stats()
+
+@router.get("/pool")
+def get_pool_stats():
+    pools = [pool_telemetry.stats()]
+    if async_pool_telemetry.pool is not None:
+        pools.append(async_pool_telemetry.stats())
+    pools += [telemetry.stats() for telemetry in replicas.telemetry()]
+    return {"pools": pools}
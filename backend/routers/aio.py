@@ -0,0 +1,84 @@
+"""
+Async versions of the routers, used when DB_MODE=async.
+
+Each route runs on the event loop against an AsyncSession instead of on
+FastAPI's threadpool. The route bodies are the sync handlers themselves, run
+through ``AsyncSession.run_sync``: SQLAlchemy executes them in a greenlet and
+awaits every database round trip on the async driver (asyncpg, aiosqlite), so
+a request waiting on the database no longer ties up a thread. Keeping a single
+implementation means the two modes cannot drift apart.
+"""
+
+import inspect
+from fastapi import APIRouter, Depends, Response
+from fastapi.params import Depends as DependsParam
+from fastapi.routing import APIRoute
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from auth import get_current_user, get_current_user_async
+from database import get_db, get_async_db
+from replicas import get_read_db, get_async_read_db
+
+# Sync dependency -> async replacement sharing the same request session
+ASYNC_DEPENDENCIES = {
+    get_db: get_async_db,
+    get_read_db: get_async_read_db,
+    get_current_user: get_current_user_async,
+}
+
+_ROUTE_OPTIONS = (
+    "response_model", "status_code", "tags", "dependencies", "summary",
+    "description", "response_description", "responses", "deprecated",
+    "methods", "operation_id", "include_in_schema", "response_class",
+    "name", "openapi_extra",
+)
+
+
+def async_router(sync_router: APIRouter) -> APIRouter:
+    """Build a router with an async counterpart of every route in ``sync_router``."""
+    router = APIRouter()
+    for route in sync_router.routes:
+        if not isinstance(route, APIRoute) or inspect.iscoroutinefunction(route.endpoint):
+            # Already async (e.g. streaming uploads that hand their own work
+            # to the threadpool); keep as is
+            router.routes.append(route)
+            continue
+        options = {option: getattr(route, option) for option in _ROUTE_OPTIONS}
+        router.add_api_route(route.path, _async_endpoint(route.endpoint, route.response_model), **options)
+    return router
+
+
+def _async_endpoint(endpoint, response_model):
+    signature = inspect.signature(endpoint)
+    session_params = []
+    parameters = []
+    for parameter in signature.parameters.values():
+        default = parameter.default
+        if isinstance(default, DependsParam) and default.dependency in ASYNC_DEPENDENCIES:
+            if default.dependency in (get_db, get_read_db):
+                session_params.append(parameter.name)
+                parameter = parameter.replace(annotation=AsyncSession)
+            parameter = parameter.replace(default=Depends(ASYNC_DEPENDENCIES[default.dependency]))
+        parameters.append(parameter)
+
+    adapter = TypeAdapter(response_model) if response_model is not None else None
+
+    def run(session, kwargs):
+        for name in session_params:
+            kwargs[name] = session
+        result = endpoint(**kwargs)
+        if adapter is None or isinstance(result, Response):
+            return result
+        # Serialize while still inside the greenlet, where lazy loads can run
+        return adapter.validate_python(result, from_attributes=True)
+
+    async def async_endpoint(**kwargs):
+        if not session_params:
+            return endpoint(**kwargs)
+        db = kwargs[session_params[0]]
+        return await db.run_sync(run, kwargs)
+
+    async_endpoint.__signature__ = signature.replace(parameters=parameters)
+    async_endpoint.__name__ = endpoint.__name__
+    async_endpoint.__doc__ = endpoint.__doc__
+    return async_endpoint
@@ -1,10 +1,14 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from database import get_db
-from models import CartItem, Product, User
-from schemas import CartItem as CartItemSchema, CartItemCreate
+from models import Product, User
+from schemas import CartItem as CartItemSchema, CartItemCreate, CartItemPage, CartSummary, CartBatch
 from auth import get_current_user
+from loaders import product_options
+from counts import counts_changed
+import cart_store
 
 router = APIRouter()
 
@@ -13,7 +17,25 @@ def get_cart_items(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    return db.query(CartItem).filter(CartItem.user_id == current_user.id).all()
+    return cart_store.store.lines(db, current_user.id)
+
+@router.get("/page", response_model=CartItemPage)
+def get_cart_page(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    include_total: bool = Query(False),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    return cart_store.store.page(db, current_user.id, cursor, limit, include_total)
+
+@router.get("/summary", response_model=CartSummary)
+def get_cart_summary(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Line count, item count and total at current prices, without the nested products."""
+    return cart_store.store.summary(db, current_user.id)
 
 @router.post("/", response_model=CartItemSchema)
 def add_to_cart(
@@ -22,7 +44,7 @@ def add_to_cart(
     db: Session = Depends(get_db)
 ):
     # Check if product exists and is available
-    product = db.query(Product).filter(
+    product = db.query(Product).options(*product_options()).filter(
         Product.id == cart_item.product_id,
         Product.is_available == True
     ).first()
@@ -32,27 +54,43 @@ def add_to_cart(
             detail="Product not found or not available"
         )
     
-    # Check if item already exists in cart
-    existing_item = db.query(CartItem).filter(
-        CartItem.user_id == current_user.id,
-        CartItem.product_id == cart_item.product_id
-    ).first()
+    line, is_new = cart_store.store.add(db, current_user.id, product, cart_item.quantity)
+    if is_new:
+        counts_changed(current_user.id, "cart")
+    return line
+
+@router.patch("/", response_model=List[CartItemSchema])
+def update_cart(
+    batch: CartBatch,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Apply add/set/remove operations, keyed by product id, in order and in
+    one transaction, and return the resulting cart. Either every operation
+    applies or none does.
+    """
+    for index, operation in enumerate(batch.operations):
+        if operation.op == "add" and operation.quantity < 1:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Operation {index}: add needs a quantity of at least 1"
+            )
     
-    if existing_item:
-        existing_item.quantity += cart_item.quantity
-        db.commit()
-        db.refresh(existing_item)
-        return existing_item
-    else:
-        new_item = CartItem(
-            user_id=current_user.id,
-            product_id=cart_item.product_id,
-            quantity=cart_item.quantity
-        )
-        db.add(new_item)
-        db.commit()
-        db.refresh(new_item)
-        return new_item
+    # Every product being added or kept in the cart, checked in one query
+    wanted = {operation.product_id for operation in batch.operations if operation.op != "remove" and operation.quantity > 0}
+    if wanted:
+        available = set(db.scalars(select(Product.id).where(Product.id.in_(wanted), Product.is_available == True)))
+        missing = sorted(wanted - available)
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Product {missing[0]} not found or not available"
+            )
+    
+    lines = cart_store.store.apply(db, current_user.id, batch.operations)
+    counts_changed(current_user.id, "cart")
+    return lines
 
 @router.put("/{item_id}", response_model=CartItemSchema)
 def update_cart_item(
@@ -61,26 +99,16 @@ def update_cart_item(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == item_id,
-        CartItem.user_id == current_user.id
-    ).first()
+    if quantity <= 0:
+        return remove_from_cart(item_id, current_user, db)
     
-    if not cart_item:
+    line = cart_store.store.set_quantity(db, current_user.id, item_id, quantity)
+    if line is None:
         raise HTTPException(
             status_code=404,
             detail="Cart item not found"
         )
-    
-    if quantity <= 0:
-        db.delete(cart_item)
-        db.commit()
-        return {"message": "Item removed from cart"}
-    
-    cart_item.quantity = quantity
-    db.commit()
-    db.refresh(cart_item)
-    return cart_item
+    return line
 
 @router.delete("/{item_id}")
 def remove_from_cart(
@@ -88,19 +116,13 @@ def remove_from_cart(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    cart_item = db.query(CartItem).filter(
-        CartItem.id == item_id,
-        CartItem.user_id == current_user.id
-    ).first()
-    
-    if not cart_item:
+    if not cart_store.store.remove(db, current_user.id, item_id):
         raise HTTPException(
             status_code=404,
             detail="Cart item not found"
         )
     
-    db.delete(cart_item)
-    db.commit()
+    counts_changed(current_user.id, "cart")
     return {"message": "Item removed from cart"}
 
 @router.delete("/")
@@ -108,6 +130,6 @@ def clear_cart(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db.query(CartItem).filter(CartItem.user_id == current_user.id).delete()
-    db.commit()
+    cart_store.store.clear(db, current_user.id)
+    counts_changed(current_user.id, "cart")
     return {"message": "Cart cleared"}
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from database import engine
+
+router = APIRouter()
+
+def _ping():
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+@router.get("/healthz", include_in_schema=False)
+async def healthz():
+    # Liveness: the process is up and answering; deliberately no database call
+    return {"status": "ok"}
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz(request: Request):
+    # Readiness: startup and warmup finished, not shutting down, database reachable
+    if not getattr(request.app.state, "ready", False):
+        return JSONResponse({"status": "starting"}, status_code=503)
+    try:
+        await run_in_threadpool(_ping)
+    except Exception:
+        return JSONResponse({"status": "database unavailable"}, status_code=503)
+    return {"status": "ready"}
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import multipart
+from multipart.multipart import parse_options_header
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from auth import get_current_user, get_current_user_async
+from database import DB_MODE
+import images
+from images import CONTENT_TYPES, DIGEST_PATTERN, THUMBNAIL_FORMATS, THUMBNAIL_SIZES, ImageTooLarge, InvalidImage
+from models import User
+from static_files import immutable_file_response
+
+# Internal nginx location aliasing IMAGE_STORAGE_DIR (e.g. /_media/); when
+# set, responses carry X-Accel-Redirect and nginx sends the file itself
+IMAGE_ACCEL_REDIRECT = os.getenv("IMAGE_ACCEL_REDIRECT", "")
+# Multipart framing and other fields allowed on top of IMAGE_MAX_BYTES
+FORM_OVERHEAD = 16 * 1024
+
+router = APIRouter()
+
+# The body is read by the endpoint, after this, so anonymous uploads are refused unread
+current_user_dependency = get_current_user_async if DB_MODE == "async" else get_current_user
+
+def _not_found():
+    return HTTPException(
+        status_code=404,
+        detail="Image not found"
+    )
+
+class MalformedUpload(Exception):
+    pass
+
+class UploadParser:
+    """
+    Feeds the multipart ``file`` field of a request body into an
+    ``IncomingImage`` chunk by chunk, as the body arrives; other fields are
+    skipped. Raises MalformedUpload.
+    """
+
+    def __init__(self, content_type, incoming):
+        media_type, options = parse_options_header(content_type)
+        boundary = options.get(b"boundary")
+        if media_type != b"multipart/form-data" or not boundary:
+            raise MalformedUpload()
+        self.incoming = incoming
+        self.found = False
+        self._in_file = False
+        self._headers = {}
+        self._field = b""
+        self._value = b""
+        self._parser = multipart.MultipartParser(boundary, {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field,
+            "on_header_value": self._header_value,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+        })
+
+    def _part_begin(self):
+        self._headers = {}
+        self._in_file = False
+
+    def _header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def _headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if options.get(b"name") == b"file":
+            if self.found:
+                raise MalformedUpload()
+            self.found = self._in_file = True
+
+    def _part_data(self, data, start, end):
+        if self._in_file:
+            self.incoming.write(data[start:end])
+
+    def write(self, chunk):
+        try:
+            self._parser.write(chunk)
+        except multipart.exceptions.FormParserError:
+            raise MalformedUpload()
+
+    def finish(self):
+        try:
+            self._parser.finalize()
+        except multipart.exceptions.FormParserError:
+            raise MalformedUpload()
+        if not self.found:
+            raise MalformedUpload()
+
+def _serve(request, path, ext, etag):
+    store = images.image_store
+    accel_redirect = None
+    if IMAGE_ACCEL_REDIRECT:
+        accel_redirect = IMAGE_ACCEL_REDIRECT.rstrip("/") + "/" + os.path.relpath(path, store.root).replace(os.sep, "/")
+    try:
+        return immutable_file_response(request, path, CONTENT_TYPES[ext], etag, accel_redirect)
+    except FileNotFoundError:
+        raise _not_found()
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def upload_image(
+    request: Request,
+    response: Response,
+    current_user: User = Depends(current_user_dependency)
+):
+    store = images.image_store
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > store.max_bytes + FORM_OVERHEAD:
+        raise HTTPException(
+            status_code=413,
+            detail="Image is too large"
+        )
+
+    # Parsed as it arrives, straight into the store's incoming file, so a body
+    # with no Content-Length (chunked) is cut off at the limit too
+    incoming = await run_in_threadpool(store.receive)
+    try:
+        parser = UploadParser(request.headers.get("content-type", ""), incoming)
+        received = 0
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > store.max_bytes + FORM_OVERHEAD:
+                raise ImageTooLarge()
+            await run_in_threadpool(parser.write, chunk)
+        parser.finish()
+        stored = await run_in_threadpool(store.finish, incoming)
+    except MalformedUpload:
+        raise HTTPException(
+            status_code=400,
+            detail="Send the image as the multipart 'file' field"
+        )
+    except ImageTooLarge:
+        raise HTTPException(
+            status_code=413,
+            detail="Image is too large"
+        )
+    except InvalidImage:
+        raise HTTPException(
+            status_code=415,
+            detail="Unsupported image; upload a JPEG, PNG, WebP or GIF"
+        )
+    finally:
+        await run_in_threadpool(incoming.discard)
+
+    if stored.deduplicated:
+        response.status_code = status.HTTP_200_OK
+    return {
+        "id": stored.digest,
+        "width": stored.width,
+        "height": stored.height,
+        "deduplicated": stored.deduplicated,
+        **images.urls(stored.digest, stored.ext),
+    }
+
+@router.api_route("/{digest}.{ext}", methods=["GET", "HEAD"])
+async def get_image(digest: str, ext: str, request: Request):
+    if not DIGEST_PATTERN.match(digest) or ext not in CONTENT_TYPES:
+        raise _not_found()
+    path = images.image_store.original_path(digest, ext)
+    return await run_in_threadpool(_serve, request, path, ext, f'"{digest}"')
+
+@router.api_route("/{digest}/{size}.{ext}", methods=["GET", "HEAD"])
+async def get_thumbnail(digest: str, size: str, ext: str, request: Request):
+    if not DIGEST_PATTERN.match(digest) or size not in THUMBNAIL_SIZES or ext not in THUMBNAIL_FORMATS:
+        raise _not_found()
+    store = images.image_store
+    path = store.thumbnail_path(digest, size, ext)
+    if not await run_in_threadpool(os.path.exists, path):
+        # Not rendered yet (or rendering was interrupted): wait for it
+        original = await run_in_threadpool(store.find_original, digest)
+        if original is None:
+            raise _not_found()
+        rendering = await run_in_threadpool(store.render, digest, original[1])
+        try:
+            await asyncio.wrap_future(rendering)
+        except Exception:
+            # The original can't be decoded (logged by the store); there is no thumbnail to serve
+            raise HTTPException(
+                status_code=404,
+                detail="Thumbnail unavailable"
+            )
+    return await run_in_threadpool(_serve, request, path, ext, f'"{digest}-{size}-{ext}"')
@@ -0,0 +1,45 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from auth import principal_cache
+from database import async_pool_telemetry, pool_telemetry
+from hashing import password_hasher
+from metrics import Exposition
+from product_cache import product_cache
+import replicas
+from request_metrics import request_metrics
+from routers.products import category_cache
+
+router = APIRouter()
+
+CACHES = {
+    "principals": principal_cache,
+    "categories": category_cache,
+    "products": product_cache,
+}
+
+class PrometheusResponse(PlainTextResponse):
+    media_type = "text/plain; version=0.0.4"
+
+@router.get("/metrics", response_class=PrometheusResponse, include_in_schema=False)
+def get_metrics():
+    exposition = Exposition()
+    request_metrics.collect(exposition)
+    
+    pool_telemetry.collect(exposition)
+    if async_pool_telemetry.pool is not None:
+        async_pool_telemetry.collect(exposition)
+    for telemetry in replicas.telemetry():
+        telemetry.collect(exposition)
+    
+    for name, cache in CACHES.items():
+        stats = cache.stats()
+        exposition.add("cache_entries", "gauge", "Entries held by an in-process cache", stats["size"], cache=name)
+        exposition.add("cache_bytes", "gauge", "Bytes held by an in-process cache", stats["bytes"], cache=name)
+        exposition.add("cache_hits_total", "counter", "Cache lookups that found an entry", stats["hits"], cache=name)
+        exposition.add("cache_misses_total", "counter", "Cache lookups that found nothing", stats["misses"], cache=name)
+        exposition.add("cache_evictions_total", "counter", "Entries evicted to make room", stats["evictions"], cache=name)
+    
+    hashing = password_hasher.stats()
+    exposition.add("password_hash_pending", "gauge", "Password hashes queued or running", hashing["pending"])
+    exposition.add("password_hash_rejected_total", "counter", "Password hashes refused because the queue was full", hashing["rejected"])
+    return exposition.render()
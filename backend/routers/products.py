@@ -1,17 +1,58 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Union
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, or_
+from sqlalchemy.exc import SQLAlchemyError
 from database import get_db
-from models import Product, Category, User
-from schemas import Product as ProductSchema, ProductCreate, ProductUpdate, Category as CategorySchema
+from replicas import get_read_db, replica_cache_ttl, skips_cache
+from models import Product, Category, User, CartItem
+from schemas import Product as ProductSchema, ProductCreate, ProductUpdate, ProductPage as ProductPageSchema, Category as CategorySchema, BulkImportResult, ListingPage, ProductCard, ProductCardPage, ProductFacets
 from auth import get_current_user
+import search as product_search
+from pagination import encode_cursor, keyset, newest_first, page_of
+from loaders import product_options
+from cache import TTLCache
+from product_cache import cached_response, detail_tags, listing_tags, normalize_search, products_changed, serve
+from http_cache import etag_for, etag_matches, json_response, not_modified
+import invalidation
+import bulk_import
+from exports import EXPORT_BATCH_ROWS, stream_export
+from counts import cached_count, counts_changed
+import facets
 
 router = APIRouter()
 
+# Serialized category list and its ETag. Categories only change through
+# create_category, which invalidates it in every worker; the TTL is a backstop.
+category_cache = TTLCache(maxsize=1, ttl=float(os.getenv("CATEGORY_CACHE_TTL_SECONDS", "3600")))
+# Category ids and lowercased names -> id, for resolving bulk-imported rows
+category_map_cache = TTLCache(maxsize=1, ttl=float(os.getenv("CATEGORY_CACHE_TTL_SECONDS", "3600")))
+invalidation.subscribe("categories", lambda payload: category_cache.clear())
+invalidation.subscribe("categories", lambda payload: category_map_cache.clear())
+
+def _load_categories(db):
+    generation = category_cache.generation
+    ttl = replica_cache_ttl(category_cache, db)
+    categories = [CategorySchema.model_validate(category) for category in db.query(Category).order_by(Category.id).all()]
+    body = json.dumps(jsonable_encoder(categories)).encode()
+    cached = (etag_for(body), body)
+    category_cache.set("all", cached, generation=generation, ttl=ttl)
+    return cached
+
 @router.get("/categories", response_model=List[CategorySchema])
-def get_categories(db: Session = Depends(get_db)):
-    return db.query(Category).all()
+def get_categories(request: Request, db: Session = Depends(get_read_db)):
+    cached = None if skips_cache(db) else category_cache.get("all")
+    etag, body = cached or _load_categories(db)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return not_modified(headers)
+    return json_response(body, headers)
 
 @router.post("/categories", response_model=CategorySchema)
 def create_category(name: str, description: Optional[str] = None, db: Session = Depends(get_db)):
@@ -27,22 +68,172 @@ def create_category(name: str, description: Optional[str] = None, db: Session =
     db.add(category)
     db.commit()
     db.refresh(category)
+    invalidation.publish("categories")
     return category
 
-@router.get("/", response_model=List[ProductSchema])
-def get_products(
-    skip: int = 0,
-    limit: int = 100,
-    category_id: Optional[int] = Query(None),
-    search: Optional[str] = Query(None),
+def _category_map(db):
+    cached = category_map_cache.get("all")
+    if cached is None:
+        generation = category_map_cache.generation
+        names = {name.lower(): category_id for category_id, name in db.query(Category.id, Category.name)}
+        cached = (set(names.values()), names)
+        category_map_cache.set("all", cached, generation=generation)
+    return cached
+
+def _import_batch(db, batch, seller_id, category_ids, category_names, result, added):
+    products, numbers = [], []
+    for number, row in batch:
+        product = bulk_import.validate(row, category_ids, category_names)
+        if isinstance(product, list):
+            _import_failed(result, number, product)
+        else:
+            products.append(product)
+            numbers.append(number)
+    if not products:
+        return
+    try:
+        bulk_import.insert_products(db, products, seller_id)
+    except SQLAlchemyError:
+        db.rollback()
+        for number in numbers:
+            _import_failed(result, number, ["Could not be saved"])
+        return
+    result["created"] += len(products)
+    for product in products:
+        key = (product.category_id, facets.price_band(product.price))
+        added[key] = added.get(key, 0) + 1
+
+def _import_failed(result, number, errors):
+    result["failed"] += 1
+    if len(result["errors"]) < bulk_import.BULK_IMPORT_MAX_ERRORS:
+        result["errors"].append({"row": number, "errors": errors})
+    else:
+        result["errors_truncated"] = True
+
+@router.post("/bulk", response_model=BulkImportResult)
+async def bulk_create_products(
+    request: Request,
+    current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Product).filter(Product.is_available == True)
+    """
+    Create many products from an NDJSON (``application/x-ndjson``) or CSV
+    (``text/csv``, with a header row) body. Rows take the ``ProductCreate``
+    fields; ``category`` (a name) may stand in for ``category_id``. Valid
+    rows are saved in batches as they stream in; invalid ones are listed by
+    row number in the response.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = bulk_import.FORMATS.get(content_type)
+    if fmt is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Send application/x-ndjson or text/csv"
+        )
+    
+    rows = bulk_import.ndjson_rows if fmt == "ndjson" else bulk_import.csv_rows
+    category_ids, category_names = await run_in_threadpool(_category_map, db)
+    result = {"received": 0, "created": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    # Products saved so far, per (category_id, price band)
+    added = {}
+    batch = []
+    try:
+        async for number, row in rows(request.stream()):
+            result["received"] += 1
+            batch.append((number, row))
+            if len(batch) >= bulk_import.BULK_IMPORT_BATCH_SIZE:
+                await run_in_threadpool(
+                    _import_batch, db, batch, current_user.id, category_ids, category_names, result, added
+                )
+                batch = []
+        if batch:
+            await run_in_threadpool(
+                _import_batch, db, batch, current_user.id, category_ids, category_names, result, added
+            )
+    except bulk_import.RowError as error:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid CSV header: {error}"
+        )
+    finally:
+        # Batches are committed as they go, even if the upload is cut short
+        if added:
+            facet_deltas = [[category_id, band, count] for (category_id, band), count in added.items()]
+            products_changed([], {category_id for category_id, _ in added}, facet_deltas)
+            counts_changed(current_user.id, "listings")
+    
+    return result
+
+# Characters of description shown on a listing card
+CARD_DESCRIPTION_CHARS = 160
+
+def _card_query(db):
+    # Only the columns a listing card shows, no ORM objects or nested models
+    return db.query(
+        Product.id, Product.title, func.substr(Product.description, 1, CARD_DESCRIPTION_CHARS).label("description"),
+        Product.price, Product.image_url, Product.created_at, Product.updated_at,
+        Category.id.label("category_id"), Category.name.label("category_name"),
+        User.id.label("seller_id"), User.username.label("seller_username"),
+    ).select_from(Product).join(Category, Category.id == Product.category_id).join(User, User.id == Product.seller_id)
+
+def product_card(row):
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "price": row.price,
+        "image_url": row.image_url,
+        "created_at": row.created_at,
+        "category": {"id": row.category_id, "name": row.category_name},
+        "seller": {"id": row.seller_id, "username": row.seller_username},
+    }
+
+SORT_PATTERN = "^(newest|price_asc|price_desc)$"
+
+# Listing orders: the key columns (matching an index), their cursor types, and whether descending
+SORTS = {
+    "newest": ((Product.created_at, Product.id), (datetime, int), True),
+    "price_asc": ((Product.price, Product.id), (float, int), False),
+    "price_desc": ((Product.price, Product.id), (float, int), True),
+}
+
+def _check_price_range(min_price, max_price):
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(
+            status_code=400,
+            detail="min_price cannot be greater than max_price"
+        )
+
+def _price_range(query, min_price, max_price):
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    return query
+
+def _filtered_products(db, category_id, search, search_mode, ranked=True, view="full", min_price=None, max_price=None):
+    """Available products matching the listing filters, and whether they are already ordered by relevance."""
+    if view == "card":
+        query = _card_query(db)
+    else:
+        query = db.query(Product).options(*product_options())
+    query = query.filter(Product.is_available == True)
     
     if category_id:
         query = query.filter(Product.category_id == category_id)
+    query = _price_range(query, min_price, max_price)
     
+    return _searched(query, search, search_mode, ranked)
+
+def _searched(query, search, search_mode, ranked=True):
+    """Apply a listing search to ``query``; also says whether it is now ordered by relevance."""
     if search:
+        matched = None
+        if search_mode == "fulltext":
+            # Indexed search with prefix matching
+            matched = product_search.apply_search(query, search, ranked=ranked)
+        if matched is not None:
+            return matched, ranked
         query = query.filter(
             or_(
                 Product.title.ilike(f"%{search}%"),
@@ -50,17 +241,155 @@ def get_products(
             )
         )
     
+    return query, False
+
+def list_products(db, skip=0, limit=100, category_id=None, search=None, search_mode="fulltext", view="full",
+                  min_price=None, max_price=None, sort=None):
+    # Searches are ranked by relevance unless an explicit sort is asked for
+    query, ranked = _filtered_products(
+        db, category_id, search, search_mode, ranked=sort is None, view=view, min_price=min_price, max_price=max_price
+    )
+    if not ranked:
+        # Stable order so offset pages don't overlap or skip rows
+        columns, _, descending = SORTS[sort or "newest"]
+        query = query.order_by(*(column.desc() if descending else column.asc() for column in columns))
+    
     return query.offset(skip).limit(limit).all()
 
-@router.get("/{product_id}", response_model=ProductSchema)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
+def _listing_key(skip, limit, category_id, search, search_mode, view, min_price, max_price, sort):
+    return ("list", skip, limit, category_id, search, search_mode, view, min_price, max_price, sort)
+
+def _listing(db, skip, limit, category_id, search, search_mode, view, min_price, max_price, sort):
+    products = list_products(db, skip, limit, category_id, search, search_mode, view, min_price, max_price, sort)
+    if view == "card":
+        return orjson.dumps([product_card(row) for row in products])
+    return [ProductSchema.model_validate(product) for product in products]
+
+@router.get("/", response_model=Union[List[ProductSchema], List[ProductCard]])
+def get_products(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = Query(None),
+    search: Optional[str] = Query(None),
+    search_mode: str = Query("fulltext", pattern="^(fulltext|substring)$"),
+    view: str = Query("full", pattern="^(full|card)$"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: Optional[str] = Query(None, pattern=SORT_PATTERN),
+    db: Session = Depends(get_read_db)
+):
+    search = normalize_search(search)
+    _check_price_range(min_price, max_price)
+    
+    args = (skip, limit, category_id, search, search_mode, view, min_price, max_price, sort)
+    return serve(request, _listing_key(*args), listing_tags(category_id), lambda: _listing(db, *args), db)
+
+@router.get("/page", response_model=Union[ProductPageSchema, ProductCardPage])
+def get_products_page(
+    request: Request,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    category_id: Optional[int] = Query(None),
+    search: Optional[str] = Query(None),
+    search_mode: str = Query("fulltext", pattern="^(fulltext|substring)$"),
+    view: str = Query("full", pattern="^(full|card)$"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: str = Query("newest", pattern=SORT_PATTERN),
+    db: Session = Depends(get_read_db)
+):
+    search = normalize_search(search)
+    _check_price_range(min_price, max_price)
+    
+    def load():
+        # Cursor pages follow an indexed sort key (never relevance) so each page is an index range scan
+        query, _ = _filtered_products(
+            db, category_id, search, search_mode, ranked=False, view=view, min_price=min_price, max_price=max_price
+        )
+        columns, types, descending = SORTS[sort]
+        query = keyset(query, columns, types, descending, cursor)
+        products = query.limit(limit + 1).all()
+        page = page_of(products, limit, lambda product: encode_cursor(*(getattr(product, column.key) for column in columns)))
+        if view == "card":
+            items = [product_card(row) for row in page["items"]]
+            return orjson.dumps({"items": items, "next_cursor": page["next_cursor"]})
+        return ProductPageSchema.model_validate(page)
+    
+    key = ("page", cursor, limit, category_id, search, search_mode, view, min_price, max_price, sort)
+    return serve(request, key, listing_tags(category_id), load, db)
+
+@router.get("/facets", response_model=ProductFacets)
+def get_product_facets(
+    category_id: Optional[int] = Query(None),
+    search: Optional[str] = Query(None),
+    search_mode: str = Query("fulltext", pattern="^(fulltext|substring)$"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Available products per category and per price band for a listing's
+    filters. Category counts ignore ``category_id`` so every option shows what
+    selecting it would give; the total and histogram respect it.
+    """
+    search = normalize_search(search)
+    _check_price_range(min_price, max_price)
+    key = facets.facet_key(search, search_mode, min_price, max_price)
+    grid = facets.facet_grid(
+        db, key, lambda query: _searched(_price_range(query, min_price, max_price), search, search_mode, ranked=False)[0]
+    )
+    return grid.render(category_id)
+
+def _load_product(db, product_id):
+    return db.query(Product).options(*product_options()).filter(Product.id == product_id).first()
+
+def _detail(db, product_id):
+    product = _load_product(db, product_id)
     if not product:
         raise HTTPException(
             status_code=404,
             detail="Product not found"
         )
-    return product
+    return ProductSchema.model_validate(product)
+
+@router.get("/{product_id}", response_model=ProductSchema)
+def get_product(product_id: int, request: Request, db: Session = Depends(get_read_db)):
+    return serve(request, ("product", product_id), detail_tags(product_id), lambda: _detail(db, product_id), db)
+
+# The browse page's request, GET /api/products/?view=card
+BROWSE_LISTING = (0, 100, None, None, "fulltext", "card", None, None, None)
+# Cart lines scanned, newest first, to find the products most in demand
+HOT_PRODUCT_CART_WINDOW = 5000
+
+def hot_product_ids(db, limit):
+    """
+    The available products in the most recent carts, topped up with the newest
+    listings. Sales are no signal here: checkout takes every product it sells
+    off the market.
+    """
+    recent = db.query(CartItem.product_id).order_by(CartItem.id.desc()).limit(HOT_PRODUCT_CART_WINDOW).subquery()
+    most_carted = db.query(recent.c.product_id).join(Product, Product.id == recent.c.product_id).filter(
+        Product.is_available == True
+    ).group_by(recent.c.product_id).order_by(func.count().desc(), recent.c.product_id).limit(limit)
+    product_ids = [product_id for product_id, in most_carted]
+    if len(product_ids) < limit:
+        newest = db.query(Product.id).filter(Product.is_available == True).order_by(
+            Product.created_at.desc(), Product.id.desc()
+        ).limit(limit)
+        product_ids += [product_id for product_id, in newest if product_id not in product_ids]
+    return product_ids[:limit]
+
+def warm_caches(db, hot_products):
+    """Fill the caches the first visitors would otherwise fill; returns the products warmed."""
+    if category_cache.get("all") is None:
+        _load_categories(db)
+    cached_response(_listing_key(*BROWSE_LISTING), listing_tags(None), lambda: _listing(db, *BROWSE_LISTING))
+    facets.facet_grid(db, facets.UNSEARCHED, lambda query: query)
+    product_ids = hot_product_ids(db, hot_products) if hot_products > 0 else []
+    for product_id in product_ids:
+        cached_response(("product", product_id), detail_tags(product_id), lambda: _detail(db, product_id))
+    return len(product_ids)
 
 @router.post("/", response_model=ProductSchema)
 def create_product(
@@ -86,8 +415,9 @@ def create_product(
     )
     db.add(db_product)
     db.commit()
-    db.refresh(db_product)
-    return db_product
+    products_changed([db_product.id], [db_product.category_id], facets.deltas(added=[(db_product.category_id, db_product.price)]))
+    counts_changed(current_user.id, "listings")
+    return _load_product(db, db_product.id)
 
 @router.put("/{product_id}", response_model=ProductSchema)
 def update_product(
@@ -110,6 +440,9 @@ def update_product(
             detail="Not authorized to update this product"
         )
     
+    previous_category_id = product.category_id
+    previous = [(product.category_id, product.price)] if product.is_available else []
+    
     # Update fields
     if product_update.title is not None:
         product.title = product_update.title
@@ -132,8 +465,9 @@ def update_product(
         product.is_available = product_update.is_available
     
     db.commit()
-    db.refresh(product)
-    return product
+    current = [(product.category_id, product.price)] if product.is_available else []
+    products_changed([product_id], [previous_category_id, product.category_id], facets.deltas(previous, current))
+    return _load_product(db, product_id)
 
 @router.delete("/{product_id}")
 def delete_product(
@@ -155,8 +489,12 @@ def delete_product(
             detail="Not authorized to delete this product"
         )
     
+    category_id = product.category_id
+    removed = [(product.category_id, product.price)] if product.is_available else []
     db.delete(product)
     db.commit()
+    products_changed([product_id], [category_id], facets.deltas(removed=removed))
+    counts_changed(current_user.id, "listings")
     return {"message": "Product deleted successfully"}
 
 @router.get("/my/listings", response_model=List[ProductSchema])
@@ -164,4 +502,44 @@ def get_my_products(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    return db.query(Product).filter(Product.seller_id == current_user.id).all()
+    return db.query(Product).options(*product_options()).filter(Product.seller_id == current_user.id).all()
+
+@router.get("/my/listings/page", response_model=ListingPage)
+def get_my_products_page(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    include_total: bool = Query(False),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    query = db.query(Product).filter(Product.seller_id == current_user.id)
+    products = newest_first(query.options(*product_options()), Product.created_at, Product.id, cursor).limit(limit + 1).all()
+    page = page_of(products, limit, lambda product: encode_cursor(product.created_at, product.id))
+    if include_total:
+        page["total"] = cached_count("listings", current_user.id, query)
+    return page
+
+LISTING_EXPORT_COLUMNS = (
+    "id", "title", "description", "price", "image_url", "category_id", "category",
+    "is_available", "created_at", "updated_at",
+)
+
+@router.get("/my/listings/export")
+def export_my_products(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream all of the seller's listings as NDJSON or CSV."""
+    seller_id = current_user.id
+    
+    def listings(db):
+        rows = db.query(
+            Product.id, Product.title, Product.description, Product.price, Product.image_url,
+            Product.category_id, Category.name.label("category"),
+            Product.is_available, Product.created_at, Product.updated_at,
+        ).join(Category, Category.id == Product.category_id).filter(
+            Product.seller_id == seller_id
+        ).order_by(Product.id).execution_options(yield_per=EXPORT_BATCH_ROWS)
+        return (dict(row._mapping) for row in rows)
+    
+    return stream_export(fmt, "listings", listings, columns=LISTING_EXPORT_COLUMNS)
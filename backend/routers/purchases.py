@@ -1,10 +1,18 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
 from database import get_db
-from models import Purchase, PurchaseItem, CartItem, Product, User
-from schemas import Purchase as PurchaseSchema, PurchaseCreate
+from models import Purchase, PurchaseItem, Product, User
+from schemas import Purchase as PurchaseSchema, PurchaseCreate, PurchasePage
 from auth import get_current_user
+from loaders import purchase_options
+from product_cache import products_changed
+import facets
+from exports import EXPORT_BATCH_ROWS, grouped, stream_export
+from pagination import encode_cursor, newest_first, page_of
+from counts import cached_count, counts_changed
+import cart_store
 
 router = APIRouter()
 
@@ -13,7 +21,22 @@ def get_purchase_history(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    return db.query(Purchase).filter(Purchase.buyer_id == current_user.id).all()
+    return db.query(Purchase).options(*purchase_options()).filter(Purchase.buyer_id == current_user.id).all()
+
+@router.get("/page", response_model=PurchasePage)
+def get_purchase_page(
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    include_total: bool = Query(False),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    query = db.query(Purchase).filter(Purchase.buyer_id == current_user.id)
+    purchases = newest_first(query.options(*purchase_options()), Purchase.created_at, Purchase.id, cursor).limit(limit + 1).all()
+    page = page_of(purchases, limit, lambda purchase: encode_cursor(purchase.created_at, purchase.id))
+    if include_total:
+        page["total"] = cached_count("purchases", current_user.id, query)
+    return page
 
 @router.post("/", response_model=PurchaseSchema)
 def create_purchase(
@@ -21,7 +44,7 @@ def create_purchase(
     db: Session = Depends(get_db)
 ):
     # Get all cart items for the user
-    cart_items = db.query(CartItem).filter(CartItem.user_id == current_user.id).all()
+    cart_items = cart_store.store.quantities(db, current_user.id)
     
     if not cart_items:
         raise HTTPException(
@@ -29,56 +52,100 @@ def create_purchase(
             detail="Cart is empty"
         )
     
-    # Calculate total amount
-    total_amount = 0
-    purchase_items = []
+    # Claim every product in one conditional UPDATE. It only matches rows
+    # that are still available, and concurrent checkouts of the same product
+    # serialize on the row lock, so exactly one buyer gets each item.
+    product_ids = {product_id for product_id, _ in cart_items}
+    claimed = db.execute(
+        update(Product)
+        .where(Product.id.in_(product_ids), Product.is_available == True)
+        .values(is_available=False)
+        .returning(Product.id, Product.price, Product.category_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+    prices = {row.id: row.price for row in claimed}
     
-    for cart_item in cart_items:
-        product = db.query(Product).filter(Product.id == cart_item.product_id).first()
-        if not product or not product.is_available:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Product {cart_item.product_id} is not available"
-            )
-        
-        item_total = product.price * cart_item.quantity
-        total_amount += item_total
-        
-        purchase_items.append({
-            "product_id": cart_item.product_id,
-            "quantity": cart_item.quantity,
-            "price_at_purchase": product.price
-        })
+    unavailable = sorted(product_ids - prices.keys())
+    if unavailable:
+        db.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Product {unavailable[0]} is not available"
+        )
     
     # Create purchase
     purchase = Purchase(
         buyer_id=current_user.id,
-        total_amount=total_amount,
+        total_amount=sum(prices[product_id] * quantity for product_id, quantity in cart_items),
         status="completed"
     )
     db.add(purchase)
     db.flush()  # Get the purchase ID
     
-    # Create purchase items
-    for item_data in purchase_items:
-        purchase_item = PurchaseItem(
-            purchase_id=purchase.id,
-            product_id=item_data["product_id"],
-            quantity=item_data["quantity"],
-            price_at_purchase=item_data["price_at_purchase"]
+    # Create purchase items and clear the checked-out cart lines
+    db.execute(insert(PurchaseItem), [
+        {
+            "purchase_id": purchase.id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "price_at_purchase": prices[product_id],
+        }
+        for product_id, quantity in cart_items
+    ])
+    cart_store.store.remove_products(db, current_user.id, product_ids)
+    
+    db.commit()
+    cart_store.store.products_removed(current_user.id, product_ids)
+    products_changed(
+        prices.keys(),
+        [row.category_id for row in claimed],
+        facets.deltas(removed=[(row.category_id, row.price) for row in claimed]),
+    )
+    counts_changed(current_user.id, "cart", "purchases")
+    return db.query(Purchase).options(*purchase_options()).filter(Purchase.id == purchase.id).first()
+
+EXPORT_COLUMNS = (
+    "purchase_id", "created_at", "status", "total_amount",
+    "product_id", "title", "quantity", "price_at_purchase",
+)
+
+def _purchase_item_rows(db, buyer_id):
+    # One flat row per purchased item, purchases in order, straight off the cursor
+    return db.query(
+        Purchase.id.label("purchase_id"), Purchase.created_at, Purchase.status, Purchase.total_amount,
+        PurchaseItem.product_id, Product.title, PurchaseItem.quantity, PurchaseItem.price_at_purchase,
+    ).join(PurchaseItem, PurchaseItem.purchase_id == Purchase.id).join(
+        Product, Product.id == PurchaseItem.product_id
+    ).filter(Purchase.buyer_id == buyer_id).order_by(
+        Purchase.id, PurchaseItem.id
+    ).execution_options(yield_per=EXPORT_BATCH_ROWS)
+
+@router.get("/export")
+def export_purchase_history(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the purchase history: one purchase per NDJSON line, or one item per CSV row."""
+    buyer_id = current_user.id
+    
+    def purchases(db):
+        return grouped(
+            _purchase_item_rows(db, buyer_id),
+            key=lambda row: row.purchase_id,
+            make_group=lambda row: {
+                "id": row.purchase_id, "created_at": row.created_at,
+                "status": row.status, "total_amount": row.total_amount,
+            },
+            make_child=lambda row: {
+                "product_id": row.product_id, "title": row.title,
+                "quantity": row.quantity, "price_at_purchase": row.price_at_purchase,
+            },
         )
-        db.add(purchase_item)
     
-    # Mark products as unavailable and clear cart
-    for cart_item in cart_items:
-        product = db.query(Product).filter(Product.id == cart_item.product_id).first()
-        if product:
-            product.is_available = False
-        db.delete(cart_item)
+    def items(db):
+        return (row._mapping for row in _purchase_item_rows(db, buyer_id))
     
-    db.commit()
-    db.refresh(purchase)
-    return purchase
+    return stream_export(fmt, "purchases", purchases, columns=EXPORT_COLUMNS, records_for_csv=items)
 
 @router.get("/{purchase_id}", response_model=PurchaseSchema)
 def get_purchase(
@@ -86,7 +153,7 @@ def get_purchase(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    purchase = db.query(Purchase).filter(
+    purchase = db.query(Purchase).options(*purchase_options()).filter(
         Purchase.id == purchase_id,
         Purchase.buyer_id == current_user.id
     ).first()
@@ -4,6 +4,7 @@ from database import get_db
 from models import User
 from schemas import User as UserSchema, UserUpdate
 from auth import get_current_user
+import invalidation
 
 router = APIRouter()
 
@@ -17,6 +18,8 @@ def update_current_user(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    previous_email = current_user.email
+    
     # Check if email is being changed and if it's already taken
     if user_update.email and user_update.email != current_user.email:
         existing_user = db.query(User).filter(User.email == user_update.email).first()
@@ -49,4 +52,5 @@ def update_current_user(
     
     db.commit()
     db.refresh(current_user)
+    invalidation.publish("users", {"id": current_user.id, "emails": [previous_email, current_user.email]})
     return current_user
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field
+from typing import Literal, Optional, List
 from datetime import datetime
 
 # User schemas
@@ -76,6 +76,64 @@ class Product(ProductBase):
     class Config:
         from_attributes = True
 
+# Compact product shape for listing cards
+class CategoryRef(BaseModel):
+    id: int
+    name: str
+
+class SellerRef(BaseModel):
+    id: int
+    username: str
+
+class ProductCard(BaseModel):
+    id: int
+    title: str
+    description: str  # truncated to a short preview
+    price: float
+    image_url: Optional[str] = None
+    created_at: datetime
+    category: CategoryRef
+    seller: SellerRef
+
+class ProductCardPage(BaseModel):
+    items: List[ProductCard]
+    next_cursor: Optional[str] = None
+
+class ProductPage(BaseModel):
+    items: List[Product]
+    next_cursor: Optional[str] = None
+
+class ListingPage(BaseModel):
+    items: List[Product]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+class CategoryFacet(BaseModel):
+    id: int
+    name: str
+    count: int
+
+class PriceBand(BaseModel):
+    min: float
+    max: Optional[float] = None  # None for the open-ended top band
+    count: int
+
+class ProductFacets(BaseModel):
+    total: int
+    categories: List[CategoryFacet]
+    price_histogram: List[PriceBand]
+
+class BulkImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+class BulkImportResult(BaseModel):
+    received: int
+    created: int
+    failed: int
+    errors: List[BulkImportError]
+    errors_truncated: bool = False
+
 # Cart schemas
 class CartItemBase(BaseModel):
     product_id: int
@@ -93,6 +151,27 @@ class CartItem(CartItemBase):
     class Config:
         from_attributes = True
 
+class CartItemPage(BaseModel):
+    items: List[CartItem]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+class CartOperation(BaseModel):
+    # add: increase the line (creating it); set: replace the quantity, 0 removes; remove: drop the line
+    op: Literal["add", "set", "remove"]
+    product_id: int
+    quantity: int = Field(1, ge=0)
+
+class CartBatch(BaseModel):
+    operations: List[CartOperation] = Field(..., min_length=1, max_length=100)
+
+class CartSummary(BaseModel):
+    items: int
+    quantity: int
+    # Current prices of the lines that can still be bought
+    total: float
+    unavailable: int
+
 # Purchase schemas
 class PurchaseItemBase(BaseModel):
     product_id: int
@@ -126,6 +205,11 @@ class Purchase(PurchaseBase):
     class Config:
         from_attributes = True
 
+class PurchasePage(BaseModel):
+    items: List[Purchase]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
 # Auth schemas
 class Token(BaseModel):
     access_token: str
@@ -133,3 +217,4 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
@@ -0,0 +1,132 @@
+"""
+Full-text search index for products.
+
+On PostgreSQL the index is a generated ``tsvector`` column with a GIN index.
+On SQLite (local and test runs) it is an FTS5 external-content table kept up
+to date by triggers. In both cases the database maintains the index itself on
+every insert, update and delete of a product row, so create_product,
+update_product, delete_product and checkout stay in sync without extra
+round trips.
+"""
+
+import re
+from sqlalchemy import event, func, literal_column, table, column, text
+from database import Base
+from models import Product
+
+TEXT_SEARCH_CONFIG = "english"
+
+_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+_POSTGRES_DDL = [
+    f"""
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector)",
+]
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        title, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, description ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO products_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+_products_fts = table("products_fts", column("rowid"))
+
+
+def is_supported(dialect_name: str) -> bool:
+    return dialect_name in ("postgresql", "sqlite")
+
+
+def create_search_index(connection):
+    """Create the search index (idempotent) and backfill existing products."""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for statement in _POSTGRES_DDL:
+            connection.execute(text(statement))
+    elif dialect == "sqlite":
+        existed = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+        ).first()
+        for statement in _SQLITE_DDL:
+            connection.execute(text(statement))
+        if not existed:
+            connection.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+
+
+def drop_search_index(connection):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS products_fts"))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _after_create(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _before_drop(target, connection, **kw):
+    drop_search_index(connection)
+
+
+def search_terms(search: str):
+    return [term.lower() for term in _TERM_PATTERN.findall(search)]
+
+
+def apply_search(query, search: str, ranked: bool = True):
+    """
+    Restrict a ``Product`` query to rows matching ``search`` and, if ``ranked``,
+    order them by relevance. Every term must match, and each term is treated
+    as a prefix so partial words ("lapt") still find "laptop".
+
+    Returns None when the bound database has no search index or ``search``
+    has no word characters, so the caller can fall back to substring matching.
+    """
+    dialect = query.session.get_bind().dialect.name
+    terms = search_terms(search)
+    if not is_supported(dialect) or not terms:
+        return None
+
+    if dialect == "postgresql":
+        ts_query = func.to_tsquery(TEXT_SEARCH_CONFIG, " & ".join(f"{term}:*" for term in terms))
+        vector = literal_column("products.search_vector")
+        query = query.filter(vector.op("@@")(ts_query))
+        if ranked:
+            query = query.order_by(func.ts_rank_cd(vector, ts_query).desc(), Product.id.desc())
+        return query
+
+    match = " ".join(f'"{term}"*' for term in terms)
+    fts = literal_column("products_fts")
+    query = query.join(_products_fts, _products_fts.c.rowid == Product.id).filter(fts.op("MATCH")(match))
+    if ranked:
+        # bm25 is lower-is-better; weight title matches over description
+        query = query.order_by(func.bm25(fts, 10.0, 1.0), Product.id.desc())
+    return query
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Production launcher: several uvicorn worker processes sharing one port.
+
+One process serves every request with one GIL; ``python serve.py`` runs
+WEB_CONCURRENCY workers instead (``python main.py`` stays the single-process
+development server). Before the workers start it:
+
+- sizes each worker's connection pool from DB_CONNECTION_BUDGET, the most
+  connections all workers together may hold, so adding workers never takes
+  the database past its max_connections;
+- switches cache invalidation to a cross-worker transport when more than
+  one worker runs and none is configured: postgres (LISTEN/NOTIFY) for a
+  PostgreSQL database, otherwise socket;
+- splits the password-hashing processes between workers;
+- refuses CART_STORE=memory, whose carts live inside one process.
+
+Settings already in the environment win over the derived ones.
+
+Usage (from the backend directory):
+    DB_CONNECTION_BUDGET=80 python serve.py --workers 4
+"""
+
+import argparse
+import logging
+import os
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# Connections all workers may hold together; 0 keeps DB_POOL_SIZE/DB_MAX_OVERFLOW per worker
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "0"))
+# Sync pool kept per worker in async mode, for background work next to the async pool
+ASYNC_MODE_SYNC_CONNECTIONS = 3
+
+
+def split_pool(connections):
+    """(pool_size, max_overflow) holding at most ``connections``; a quarter is overflow."""
+    max_overflow = connections // 4
+    return connections - max_overflow, max_overflow
+
+
+def pool_sizing(budget, workers, db_mode="sync", listener=False):
+    """
+    Pool settings per worker that keep ``workers`` processes within ``budget``
+    connections. With ``listener`` one sync connection per worker is held by
+    the LISTEN for cache invalidation, so at least one more is left for requests.
+    """
+    share = budget // workers
+    reserved = ASYNC_MODE_SYNC_CONNECTIONS if db_mode == "async" else int(listener)
+    if share - reserved < 1:
+        raise ValueError(
+            f"DB_CONNECTION_BUDGET={budget} leaves {share} connections for each of {workers} workers; "
+            f"at least {reserved + 1} are needed"
+        )
+    if db_mode == "async":
+        pool_size, max_overflow = split_pool(share - reserved)
+        return {
+            "DB_POOL_SIZE": reserved, "DB_MAX_OVERFLOW": 0,
+            "DB_ASYNC_POOL_SIZE": pool_size, "DB_ASYNC_MAX_OVERFLOW": max_overflow,
+        }
+    pool_size, max_overflow = split_pool(share)
+    return {"DB_POOL_SIZE": pool_size, "DB_MAX_OVERFLOW": max_overflow}
+
+
+def worker_environment(workers, budget=DB_CONNECTION_BUDGET, environ=os.environ):
+    """Settings to export to the workers, leaving alone any already set in ``environ``."""
+    from database import DATABASE_URL, DB_MODE
+
+    if workers > 1 and environ.get("CART_STORE", "sql") == "memory":
+        # Each worker would hold its own carts, so a cart would change from one request to the next
+        raise ValueError(
+            f"CART_STORE=memory keeps carts inside one process and can't serve {workers} workers; "
+            "use sql or a redis:// URL"
+        )
+    settings = {}
+    if workers > 1 and environ.get("CACHE_INVALIDATION", "local") == "local":
+        settings["CACHE_INVALIDATION"] = "postgres" if DATABASE_URL.startswith("postgresql") else "socket"
+    if budget:
+        listener = environ.get("CACHE_INVALIDATION", settings.get("CACHE_INVALIDATION")) == "postgres"
+        settings.update(pool_sizing(budget, workers, DB_MODE, listener))
+    settings["PASSWORD_HASH_WORKERS"] = max(1, min(4, (os.cpu_count() or 1) // workers))
+    return {name: str(value) for name, value in settings.items() if name not in environ}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level.upper())
+    try:
+        settings = worker_environment(args.workers)
+    except ValueError as exc:
+        parser.error(str(exc))
+    for name, value in sorted(settings.items()):
+        logger.info("%s=%s", name, value)
+    # Inherited by the worker processes, which import the app afresh
+    os.environ.update(settings)
+    if args.workers > 1 and os.environ["CACHE_INVALIDATION"] == "local":
+        logger.warning("CACHE_INVALIDATION=local with %d workers: other workers' caches only expire", args.workers)
+    uvicorn.run(
+        "main:create_app", factory=True, host=args.host, port=args.port,
+        workers=args.workers, log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
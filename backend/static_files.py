@@ -0,0 +1,149 @@
+"""
+Responses for immutable files: content-addressed images whose bytes never
+change under a URL.
+
+Starlette's FileResponse reads the whole file through a thread in 64 KiB
+chunks and ignores Range. ``immutable_file_response`` adds:
+
+- Cache-Control: public, max-age=1 year, immutable, with the content hash as
+  ETag, so browsers and CDNs never revalidate; If-None-Match gets a 304.
+- Single byte ranges: 206 with Content-Range, or 416 when unsatisfiable.
+  Multi-range requests get the whole file (RFC 9110 allows ignoring Range).
+- Zero-copy sends: with ``accel_redirect`` the response is only an
+  X-Accel-Redirect header and nginx sends the file with sendfile(). Without
+  it, servers offering the ASGI ``http.response.zerocopysend`` or
+  ``http.response.pathsend`` extension are handed the file, and others get it
+  in 256 KiB chunks read with os.pread() in a thread.
+"""
+
+import os
+import stat
+from email.utils import formatdate
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+from http_cache import etag_matches
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def byte_range(header, size):
+    """
+    The inclusive (start, end) of a single-range ``Range`` header, or None to
+    send the whole file. Raises RangeNotSatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0 or size == 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if end < start and last:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+class ImmutableFileResponse(Response):
+    chunk_size = 256 * 1024
+
+    def __init__(self, path, size, status_code, headers, media_type, span=None, send_body=True):
+        self.path = path
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.span = span if span is not None else (0, size - 1)
+        self.send_body = send_body and size > 0
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        start, end = self.span
+        count = end - start + 1
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend", "file": file,
+                    "offset": start, "count": count, "more_body": False,
+                })
+            return
+        if "http.response.pathsend" in extensions and count == os.path.getsize(self.path):
+            await send({"type": "http.response.pathsend", "path": os.fspath(self.path)})
+            return
+        descriptor = os.open(self.path, os.O_RDONLY)
+        try:
+            offset = start
+            while offset <= end:
+                chunk = await run_in_threadpool(os.pread, descriptor, min(self.chunk_size, end - offset + 1), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": offset <= end})
+            if offset <= end:
+                # File shrank under us; close the response rather than hang
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(descriptor)
+
+
+def immutable_file_response(request: Request, path, media_type, etag, accel_redirect=None):
+    """
+    Serve the file at ``path`` for ``request``, honouring If-None-Match and
+    Range; ``accel_redirect`` is the internal nginx location of the file.
+    Raises FileNotFoundError.
+    """
+    stat_result = os.stat(path)
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise FileNotFoundError(path)
+    size = stat_result.st_size
+    headers = {
+        "cache-control": IMMUTABLE_CACHE_CONTROL,
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if accel_redirect is not None:
+        # nginx handles ranges and conditionals itself, from the headers above
+        headers["x-accel-redirect"] = accel_redirect
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    span = None
+    status_code = 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            span = byte_range(range_header, size)
+        except RangeNotSatisfiable:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+    if span is not None:
+        status_code = 206
+        headers["content-range"] = f"bytes {span[0]}-{span[1]}/{size}"
+        headers["content-length"] = str(span[1] - span[0] + 1)
+    else:
+        headers["content-length"] = str(size)
+    return ImmutableFileResponse(
+        path, size, status_code, headers, media_type, span=span, send_body=request.method != "HEAD"
+    )
@@ -0,0 +1,94 @@
+from sqlalchemy import text
+
+from counts import count_cache
+from models import CartItem, Purchase, User
+from conftest import register_and_login
+
+
+def collect(client, path, headers, limit, **params):
+    ids, cursor = [], None
+    while True:
+        query = {"limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get(path, headers=headers, params=query)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        ids.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, body
+
+
+def user_id(db, email):
+    return db.query(User.id).filter(User.email == email).scalar()
+
+
+def test_listing_pages_cover_every_product_newest_first(client, db, auth_headers, make_products):
+    product_ids = make_products(count=7, seller_id=user_id(db, "seller@example.com"))
+
+    ids, last = collect(client, "/api/products/my/listings/page", auth_headers, limit=3)
+
+    assert ids == sorted(product_ids, reverse=True)
+    assert last["total"] is None
+
+
+def test_cart_pages_with_total(client, db, make_products):
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    buyer_id = user_id(db, "buyer@example.com")
+    product_ids = make_products(count=5)
+    for product_id in product_ids:
+        client.post("/api/cart/", headers=headers, json={"product_id": product_id})
+    item_ids = [item.id for item in db.query(CartItem).order_by(CartItem.id)]
+
+    ids, last = collect(client, "/api/cart/page", headers, limit=2, include_total=True)
+
+    assert ids == sorted(item_ids, reverse=True)
+    assert last["total"] == 5
+    assert count_cache.get(("cart", buyer_id)) == 5
+
+
+def test_purchase_pages_and_totals_follow_checkout(client, db, make_products):
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    for product_id in make_products(count=3):
+        client.post("/api/cart/", headers=headers, json={"product_id": product_id})
+        assert client.post("/api/purchases/", headers=headers).status_code == 200
+    purchase_ids = [purchase.id for purchase in db.query(Purchase)]
+
+    ids, last = collect(client, "/api/purchases/page", headers, limit=2, include_total=True)
+    assert ids == sorted(purchase_ids, reverse=True)
+    assert last["total"] == 3
+
+    client.post("/api/cart/", headers=headers, json={"product_id": make_products()[0]})
+    assert client.get("/api/cart/page", headers=headers, params={"include_total": True}).json()["total"] == 1
+    client.post("/api/purchases/", headers=headers)
+
+    assert client.get("/api/purchases/page", headers=headers, params={"include_total": True}).json()["total"] == 4
+    assert client.get("/api/cart/page", headers=headers, params={"include_total": True}).json()["total"] == 0
+
+
+def test_cached_total_is_reused(client, db, auth_headers, category, make_products):
+    make_products(count=3, seller_id=user_id(db, "seller@example.com"))
+    path = "/api/products/my/listings/page"
+    assert client.get(path, headers=auth_headers, params={"include_total": True}).json()["total"] == 3
+
+    hits = count_cache.hits
+    assert client.get(path, headers=auth_headers, params={"include_total": True}).json()["total"] == 3
+    assert count_cache.hits == hits + 1
+
+    client.post("/api/products/", headers=auth_headers, json={
+        "title": "Lamp", "description": "Brass", "price": 12.0, "category_id": category.id,
+    })
+    assert client.get(path, headers=auth_headers, params={"include_total": True}).json()["total"] == 4
+
+
+def test_account_pages_use_the_per_user_indexes(db):
+    plans = {
+        "ix_cart_items_user_created": "SELECT id FROM cart_items WHERE user_id = 1 ORDER BY created_at DESC, id DESC LIMIT 20",
+        "ix_purchases_buyer_created": "SELECT id FROM purchases WHERE buyer_id = 1 ORDER BY created_at DESC, id DESC LIMIT 20",
+        "ix_products_seller_created": "SELECT id FROM products WHERE seller_id = 1 ORDER BY created_at DESC, id DESC LIMIT 20",
+    }
+    for index, query in plans.items():
+        plan = " ".join(row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {query}")))
+        assert index in plan
+        assert "TEMP B-TREE" not in plan
@@ -0,0 +1,57 @@
+import inspect
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import auth, cart, products, purchases, users
+from routers.aio import async_router
+from conftest import register_and_login
+
+
+@pytest.fixture
+def async_client():
+    app = FastAPI()
+    app.include_router(async_router(auth.router), prefix="/api/auth")
+    app.include_router(async_router(users.router), prefix="/api/users")
+    app.include_router(async_router(products.router), prefix="/api/products")
+    app.include_router(async_router(cart.router), prefix="/api/cart")
+    app.include_router(async_router(purchases.router), prefix="/api/purchases")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_async_routes_run_on_the_event_loop():
+    routes = async_router(products.router).routes
+    assert routes and all(inspect.iscoroutinefunction(route.endpoint) for route in routes)
+
+
+def test_shopping_flow_in_async_mode(async_client, category):
+    seller = register_and_login(async_client)
+    buyer = register_and_login(async_client, email="buyer@example.com", username="buyer")
+
+    response = async_client.post("/api/products/", headers=seller, json={
+        "title": "Camping tent", "description": "Sleeps two", "price": 40.0, "category_id": category.id,
+    })
+    assert response.status_code == 200, response.text
+    product = response.json()
+    assert product["category"]["name"] == "Electronics"
+    assert product["seller"]["username"] == "seller"
+
+    listing = async_client.get("/api/products/", params={"search": "tent"}).json()
+    assert [item["id"] for item in listing] == [product["id"]]
+
+    response = async_client.post("/api/cart/", headers=buyer, json={"product_id": product["id"]})
+    assert response.status_code == 200, response.text
+
+    response = async_client.post("/api/purchases/", headers=buyer)
+    assert response.status_code == 200, response.text
+    assert response.json()["items"][0]["product"]["title"] == "Camping tent"
+
+    assert async_client.get(f"/api/products/{product['id']}").json()["is_available"] is False
+    assert async_client.get("/api/users/me", headers=buyer).json()["username"] == "buyer"
+
+
+def test_errors_propagate_in_async_mode(async_client):
+    assert async_client.get("/api/products/999").status_code == 404
+    assert async_client.get("/api/cart/").status_code == 403
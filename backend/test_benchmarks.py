@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+from load_test import compare, percentile
+
+
+def endpoint(p50, rps, requests=100, errors=0):
+    return {"requests": requests, "rps": rps, "p50": p50, "p95": p50 * 2, "p99": p50 * 3, "rejected": 0, "errors": errors}
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7], 0.95) == 7
+    assert percentile([], 0.5) == 0.0
+
+
+def test_compare_flags_slowdowns_beyond_tolerance():
+    baseline = {"endpoints": {"list": endpoint(10, 100), "detail": endpoint(5, 200)}}
+    results = {"list": endpoint(11, 95), "detail": endpoint(8, 120)}
+
+    regressions = compare(results, baseline, tolerance=0.25)
+
+    assert not any(line.startswith("list") for line in regressions)
+    assert "detail: p50 5.0 ms -> 8.0 ms" in regressions
+    assert "detail: throughput 200.0/s -> 120.0/s" in regressions
+
+
+def test_compare_ignores_endpoints_without_enough_samples():
+    baseline = {"endpoints": {"checkout": endpoint(10, 1, requests=3)}}
+    results = {"checkout": endpoint(100, 1, requests=3, errors=2)}
+
+    assert compare(results, baseline, tolerance=0.25) == []
@@ -0,0 +1,94 @@
+import json
+
+import bulk_import
+
+
+def ndjson(rows):
+    return "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+
+def chunked(body, size=7):
+    # Small chunks so rows are split across reads
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def test_ndjson_import_reports_row_errors(client, auth_headers, category, monkeypatch):
+    monkeypatch.setattr(bulk_import, "BULK_IMPORT_BATCH_SIZE", 2)
+    body = ndjson([
+        {"title": "Desk", "description": "Oak", "price": 40, "category_id": category.id},
+        {"title": "Chair", "description": "Pine", "price": "not a price", "category_id": category.id},
+        {"title": "Lamp", "description": "Brass", "price": 15, "category": "electronics"},
+        {"title": "Rug", "description": "Wool", "price": 30, "category_id": 9999},
+    ]) + b"not json\n\n" + ndjson([{"title": "Vase", "description": "Glass", "price": 8, "category_id": category.id}])
+
+    response = client.post(
+        "/api/products/bulk", headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+        content=chunked(body),
+    )
+
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["received"], result["created"], result["failed"]) == (6, 3, 3)
+    errors = {error["row"]: error["errors"] for error in result["errors"]}
+    assert errors[2] == ["price: Input should be a valid number, unable to parse string as a number"]
+    assert errors[4] == ["category_id: Category not found"]
+    assert errors[5] == ["Row is not valid JSON"]
+
+    titles = sorted(product["title"] for product in client.get("/api/products/my/listings", headers=auth_headers).json())
+    assert titles == ["Desk", "Lamp", "Vase"]
+
+
+def test_csv_import_handles_quoted_newlines(client, auth_headers, category):
+    body = (
+        "title,description,price,category,image_url\r\n"
+        'Bookshelf,"Tall, five shelves\nsome scratches",25.5,Electronics,\r\n'
+        "Stool,Short,5,Garden,\r\n"
+        "Bench,Long,12\r\n"
+    ).encode()
+
+    response = client.post("/api/products/bulk", headers={**auth_headers, "Content-Type": "text/csv"}, content=body)
+
+    result = response.json()
+    assert (result["received"], result["created"], result["failed"]) == (3, 1, 2)
+    assert result["errors"] == [
+        {"row": 2, "errors": ["category: Unknown category 'Garden'"]},
+        {"row": 3, "errors": ["Expected 5 fields, got 3"]},
+    ]
+    product = client.get("/api/products/my/listings", headers=auth_headers).json()[0]
+    assert product["description"] == "Tall, five shelves\nsome scratches"
+    assert product["price"] == 25.5
+    assert product["image_url"] is None
+
+
+def test_import_invalidates_listings(client, auth_headers, category):
+    assert client.get("/api/products/").json() == []
+
+    client.post(
+        "/api/products/bulk", headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+        content=ndjson([{"title": "Kettle", "description": "Steel", "price": 9, "category_id": category.id}]),
+    )
+
+    assert [product["title"] for product in client.get("/api/products/").json()] == ["Kettle"]
+
+
+def test_overlong_rows_are_skipped(client, auth_headers, category, monkeypatch):
+    monkeypatch.setattr(bulk_import, "BULK_IMPORT_MAX_ROW_BYTES", 200)
+    body = ndjson([
+        {"title": "Big", "description": "x" * 500, "price": 1, "category_id": category.id},
+        {"title": "Small", "description": "y", "price": 1, "category_id": category.id},
+    ])
+
+    result = client.post(
+        "/api/products/bulk", headers={**auth_headers, "Content-Type": "application/x-ndjson"},
+        content=chunked(body, size=64),
+    ).json()
+
+    assert result["created"] == 1
+    assert result["errors"] == [{"row": 1, "errors": ["Row is longer than 200 bytes"]}]
+
+
+def test_import_requires_a_supported_format(client, auth_headers):
+    response = client.post("/api/products/bulk", headers={**auth_headers, "Content-Type": "application/json"}, content=b"[]")
+    assert response.status_code == 415
+    assert client.post("/api/products/bulk", headers={"Content-Type": "text/csv"}, content=b"").status_code == 403
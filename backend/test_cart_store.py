@@ -0,0 +1,259 @@
+import pytest
+
+import cart_store
+from cart_store import DIRTY, KVCartStore, MemoryKV, SQLCartStore
+from models import CartItem, Product, Purchase, User
+from conftest import register_and_login
+
+
+@pytest.fixture(params=["sql", "kv"])
+def store(request, monkeypatch):
+    store = SQLCartStore() if request.param == "sql" else KVCartStore(MemoryKV())
+    monkeypatch.setattr(cart_store, "store", store)
+    return store
+
+
+@pytest.fixture
+def kv_store(monkeypatch):
+    store = KVCartStore(MemoryKV())
+    monkeypatch.setattr(cart_store, "store", store)
+    return store
+
+
+@pytest.fixture
+def buyer(client):
+    return register_and_login(client, email="buyer@example.com", username="buyer")
+
+
+def test_cart_operations_behave_the_same_on_every_store(client, db, category, make_products, buyer, store):
+    lamp, chair, desk = make_products(12.5, 40.0, 99.0)
+
+    first = client.post("/api/cart/", headers=buyer, json={"product_id": lamp, "quantity": 1}).json()
+    again = client.post("/api/cart/", headers=buyer, json={"product_id": lamp, "quantity": 2}).json()
+    assert again["id"] == first["id"]
+    assert again["quantity"] == 3
+    assert again["product"]["category"]["name"] == "Electronics"
+    client.post("/api/cart/", headers=buyer, json={"product_id": chair})
+    client.post("/api/cart/", headers=buyer, json={"product_id": desk})
+
+    items = client.get("/api/cart/", headers=buyer).json()
+    assert sorted((item["product_id"], item["quantity"]) for item in items) == [(lamp, 3), (chair, 1), (desk, 1)]
+    by_product = {item["product_id"]: item["id"] for item in items}
+
+    page = client.get("/api/cart/page", headers=buyer, params={"limit": 2, "include_total": True}).json()
+    assert page["total"] == 3
+    rest = client.get("/api/cart/page", headers=buyer, params={"limit": 2, "cursor": page["next_cursor"]}).json()
+    assert [item["product_id"] for item in page["items"] + rest["items"]] == [desk, chair, lamp]
+
+    db.query(Product).filter(Product.id == desk).update({"is_available": False})
+    db.commit()
+    assert client.get("/api/cart/summary", headers=buyer).json() == {
+        "items": 3, "quantity": 5, "total": 77.5, "unavailable": 1,
+    }
+
+    updated = client.put(f"/api/cart/{by_product[chair]}", headers=buyer, params={"quantity": 4}).json()
+    assert updated["quantity"] == 4
+    assert client.delete(f"/api/cart/{by_product[desk]}", headers=buyer).status_code == 200
+    assert client.delete(f"/api/cart/{by_product[desk]}", headers=buyer).status_code == 404
+    assert client.put("/api/cart/999999", headers=buyer, params={"quantity": 2}).status_code == 404
+    assert client.get("/api/cart/summary", headers=buyer).json() == {
+        "items": 2, "quantity": 7, "total": 197.5, "unavailable": 0,
+    }
+
+    client.delete("/api/cart/", headers=buyer)
+    assert client.get("/api/cart/", headers=buyer).json() == []
+    assert client.get("/api/cart/summary", headers=buyer).json()["items"] == 0
+
+
+def test_checkout_empties_the_cart_on_every_store(client, db, make_products, buyer, store):
+    product_ids = make_products(10.0, 15.0)
+    for product_id in product_ids:
+        client.post("/api/cart/", headers=buyer, json={"product_id": product_id})
+
+    response = client.post("/api/purchases/", headers=buyer)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["total_amount"] == 25.0
+    assert client.get("/api/cart/", headers=buyer).json() == []
+    if isinstance(store, KVCartStore):
+        store.flush()
+    assert db.query(CartItem).count() == 0
+
+
+def test_kv_writes_go_behind_to_cart_items(client, db, make_products, buyer, kv_store, monkeypatch):
+    lamp, chair = make_products(10.0, 20.0)
+    client.post("/api/cart/", headers=buyer, json={"product_id": lamp, "quantity": 2})
+    client.post("/api/cart/", headers=buyer, json={"product_id": chair})
+
+    assert db.query(CartItem).count() == 0
+    assert kv_store.flush() == 1
+    assert kv_store.flush() == 0
+    rows = db.query(CartItem.product_id, CartItem.quantity).order_by(CartItem.product_id).all()
+    assert [tuple(row) for row in rows] == [(lamp, 2), (chair, 1)]
+
+    # A store that lost its data reloads the cart from the table
+    monkeypatch.setattr(cart_store, "store", KVCartStore(MemoryKV()))
+    items = client.get("/api/cart/", headers=buyer).json()
+    assert sorted((item["product_id"], item["quantity"]) for item in items) == [(lamp, 2), (chair, 1)]
+
+
+def test_kv_pages_skip_products_deleted_since_they_were_carted(client, db, make_products, buyer, kv_store):
+    product_ids = make_products(count=5)
+    for product_id in product_ids:
+        client.post("/api/cart/", headers=buyer, json={"product_id": product_id})
+    deleted = product_ids[3]
+    db.query(Product).filter(Product.id == deleted).delete()
+    db.commit()
+
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2, "include_total": True, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/cart/page", headers=buyer, params=params).json()
+        ids.extend(item["product_id"] for item in body["items"])
+        assert body["total"] == 4
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == [product_id for product_id in reversed(product_ids) if product_id != deleted]
+
+    # The dead line is dropped from the store too, and the flush takes it out of the table
+    buyer_id = db.query(User.id).filter(User.email == "buyer@example.com").scalar()
+    assert f"q:{deleted}" not in kv_store.kv.hgetall(f"cart:{buyer_id}")
+    kv_store.flush()
+    assert sorted(product_id for (product_id,) in db.query(CartItem.product_id)) == sorted(set(product_ids) - {deleted})
+
+
+def test_kv_flush_never_wipes_a_cart_the_store_lost(client, db, make_products, buyer, kv_store):
+    buyer_id = db.query(User.id).filter(User.email == "buyer@example.com").scalar()
+    (lamp,) = make_products(10.0)
+    db.add(CartItem(user_id=buyer_id, product_id=lamp, quantity=1))
+    db.commit()
+
+    kv_store.kv.sadd(DIRTY, buyer_id)
+    kv_store.flush()
+
+    assert db.query(CartItem).count() == 1
+
+
+def test_kv_add_to_cart_only_looks_up_the_product(client, make_products, buyer, kv_store, count_queries):
+    (lamp,) = make_products(10.0)
+    client.get("/api/users/me", headers=buyer)
+    client.post("/api/cart/", headers=buyer, json={"product_id": lamp})
+
+    with count_queries:
+        response = client.post("/api/cart/", headers=buyer, json={"product_id": lamp})
+
+    assert response.json()["quantity"] == 2
+    assert count_queries.count <= 1
+
+
+class RoundTrips:
+    """Wraps a KV and counts the commands and pipelines sent to it."""
+
+    def __init__(self, kv):
+        self.kv = kv
+        self.count = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self.kv, name)
+
+        def call(*args, **kwargs):
+            if name != "pipeline":
+                self.count += 1
+                return attribute(*args, **kwargs)
+            pipe = attribute(*args, **kwargs)
+            execute = pipe.execute
+
+            def counted():
+                self.count += 1
+                return execute()
+            pipe.execute = counted
+            return pipe
+        return call
+
+
+def test_kv_add_to_a_loaded_cart_is_two_round_trips(db, seller, make_products):
+    lamp = db.get(Product, make_products(10.0)[0])
+    store = KVCartStore(RoundTrips(MemoryKV()))
+    store.add(db, seller.id, lamp, 1)
+
+    store.kv.count = 0
+    line, is_new = store.add(db, seller.id, lamp, 2)
+    assert (line.quantity, is_new) == (3, False)
+    assert store.kv.count == 2
+
+
+def test_failed_kv_checkout_keeps_the_cart(client, db, make_products, buyer, kv_store):
+    available, sold = make_products(10.0, 20.0)
+    for product_id in (available, sold):
+        client.post("/api/cart/", headers=buyer, json={"product_id": product_id})
+    db.query(Product).filter(Product.id == sold).update({"is_available": False})
+    db.commit()
+
+    assert client.post("/api/purchases/", headers=buyer).status_code == 400
+    assert len(client.get("/api/cart/", headers=buyer).json()) == 2
+    assert db.query(Purchase).count() == 0
+
+
+def cart(response):
+    assert response.status_code == 200, response.text
+    return sorted((item["product_id"], item["quantity"]) for item in response.json())
+
+
+def test_batch_applies_operations_in_order(client, make_products, buyer, store):
+    lamp, chair, desk, vase = make_products(10.0, 20.0, 30.0, 40.0)
+    client.post("/api/cart/", headers=buyer, json={"product_id": lamp, "quantity": 2})
+    client.post("/api/cart/", headers=buyer, json={"product_id": chair})
+
+    response = client.patch("/api/cart/", headers=buyer, json={"operations": [
+        {"op": "add", "product_id": lamp, "quantity": 1},
+        {"op": "set", "product_id": chair, "quantity": 5},
+        {"op": "add", "product_id": desk},
+        {"op": "add", "product_id": vase},
+        {"op": "remove", "product_id": vase},
+        {"op": "set", "product_id": desk, "quantity": 0},
+        {"op": "remove", "product_id": 999999},
+    ]})
+
+    assert cart(response) == [(lamp, 3), (chair, 5)]
+    assert cart(client.get("/api/cart/", headers=buyer)) == [(lamp, 3), (chair, 5)]
+
+
+def test_batch_is_all_or_nothing(client, db, make_products, buyer, store):
+    lamp, sold = make_products(10.0, 20.0)
+    db.query(Product).filter(Product.id == sold).update({"is_available": False})
+    db.commit()
+    client.post("/api/cart/", headers=buyer, json={"product_id": lamp})
+
+    response = client.patch("/api/cart/", headers=buyer, json={"operations": [
+        {"op": "set", "product_id": lamp, "quantity": 4},
+        {"op": "add", "product_id": sold},
+    ]})
+    assert response.status_code == 404
+    assert response.json()["detail"] == f"Product {sold} not found or not available"
+
+    response = client.patch("/api/cart/", headers=buyer, json={"operations": [
+        {"op": "add", "product_id": lamp, "quantity": 0},
+    ]})
+    assert response.status_code == 400
+    assert client.patch("/api/cart/", headers=buyer, json={"operations": []}).status_code == 422
+    assert client.patch("/api/cart/", headers=buyer, json={"operations": [
+        {"op": "move", "product_id": lamp},
+    ]}).status_code == 422
+
+    assert cart(client.get("/api/cart/", headers=buyer)) == [(lamp, 1)]
+
+
+def test_batch_query_count_is_independent_of_its_size(client, make_products, buyer, count_queries):
+    product_ids = make_products(count=12)
+    client.get("/api/users/me", headers=buyer)
+    counts = []
+    for batch in (product_ids[:2], product_ids[2:12]):
+        with count_queries:
+            response = client.patch("/api/cart/", headers=buyer, json={"operations": [
+                {"op": "add", "product_id": product_id} for product_id in batch
+            ]})
+        assert response.status_code == 200, response.text
+        counts.append(count_queries.count)
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,41 @@
+import json
+
+import invalidation
+
+
+def test_categories_are_served_from_cache_with_etag(client, category, count_queries):
+    first = client.get("/api/products/categories")
+    assert first.status_code == 200
+    assert [item["name"] for item in first.json()] == ["Electronics"]
+    etag = first.headers["ETag"]
+
+    with count_queries:
+        again = client.get("/api/products/categories")
+        revalidated = client.get("/api/products/categories", headers={"If-None-Match": etag})
+
+    assert count_queries.count == 0
+    assert again.json() == first.json()
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+
+
+def test_create_category_invalidates(client, category):
+    etag = client.get("/api/products/categories").headers["ETag"]
+
+    assert client.post("/api/products/categories", params={"name": "Books"}).status_code == 200
+
+    response = client.get("/api/products/categories", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [item["name"] for item in response.json()] == ["Electronics", "Books"]
+
+
+def test_invalidation_from_another_worker(client, db, category):
+    client.get("/api/products/categories")
+    category.name = "Gadgets"
+    db.commit()
+
+    # Still cached until another worker says otherwise
+    assert client.get("/api/products/categories").json()[0]["name"] == "Electronics"
+    invalidation.receive(json.dumps({"origin": "other-worker", "topic": "categories", "payload": None}))
+    assert client.get("/api/products/categories").json()[0]["name"] == "Gadgets"
@@ -0,0 +1,95 @@
+import threading
+
+from fastapi import HTTPException
+
+from database import SessionLocal
+from models import CartItem, Product, Purchase, PurchaseItem, User
+from routers.purchases import create_purchase
+from conftest import register_and_login
+
+
+def fill_cart(db, user_id, product_ids):
+    db.add_all(CartItem(user_id=user_id, product_id=product_id, quantity=1) for product_id in product_ids)
+    db.commit()
+
+
+def test_checkout_totals_and_clears_cart(client, db, make_products):
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    buyer_id = db.query(User.id).filter(User.email == "buyer@example.com").scalar()
+    product_ids = make_products(12.5, count=3)
+    fill_cart(db, buyer_id, product_ids)
+
+    response = client.post("/api/purchases/", headers=headers)
+
+    assert response.status_code == 200, response.text
+    purchase = response.json()
+    assert purchase["total_amount"] == 37.5
+    assert sorted(item["product_id"] for item in purchase["items"]) == product_ids
+    assert db.query(CartItem).count() == 0
+    assert db.query(Product).filter(Product.is_available == True).count() == 0
+
+
+def test_unavailable_product_aborts_the_whole_checkout(client, db, make_products):
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    buyer_id = db.query(User.id).filter(User.email == "buyer@example.com").scalar()
+    available, sold = make_products(count=2)
+    db.query(Product).filter(Product.id == sold).update({"is_available": False})
+    fill_cart(db, buyer_id, [available, sold])
+
+    response = client.post("/api/purchases/", headers=headers)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"Product {sold} is not available"
+    assert db.query(Product.is_available).filter(Product.id == available).scalar() is True
+    assert db.query(CartItem).count() == 2
+    assert db.query(Purchase).count() == 0
+
+
+def test_checkout_query_count_is_independent_of_cart_size(client, db, make_products, count_queries):
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    buyer_id = db.query(User.id).filter(User.email == "buyer@example.com").scalar()
+    client.get("/api/users/me", headers=headers)
+
+    counts = []
+    for size in (1, 15):
+        fill_cart(db, buyer_id, make_products(count=size))
+        with count_queries:
+            assert client.post("/api/purchases/", headers=headers).status_code == 200
+        counts.append(count_queries.count)
+
+    assert counts[0] == counts[1]
+
+
+def test_concurrent_checkouts_never_double_sell(db, make_products, buyers=8):
+    contested = make_products()
+    users = [User(email=f"buyer{i}@example.com", username=f"buyer{i}", hashed_password="x") for i in range(buyers)]
+    db.add_all(users)
+    db.commit()
+    for user in users:
+        fill_cart(db, user.id, contested)
+    user_ids = [user.id for user in users]
+
+    barrier = threading.Barrier(buyers)
+    outcomes = []
+
+    def checkout(user_id):
+        session = SessionLocal()
+        try:
+            user = session.get(User, user_id)
+            barrier.wait()
+            create_purchase(current_user=user, db=session)
+            outcomes.append("sold")
+        except HTTPException as exc:
+            outcomes.append(exc.status_code)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=checkout, args=(user_id,)) for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count("sold") == 1
+    assert outcomes.count(400) == buyers - 1
+    assert db.query(PurchaseItem).filter(PurchaseItem.product_id == contested[0]).count() == 1
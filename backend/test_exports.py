@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+
+import exports
+from models import CartItem, User
+from conftest import register_and_login
+
+
+def buy(client, db, headers, buyer_id, make_products, titles):
+    product_ids = [product_id for title in titles for product_id in make_products(title=title)]
+    db.add_all(CartItem(user_id=buyer_id, product_id=product_id, quantity=1) for product_id in product_ids)
+    db.commit()
+    assert client.post("/api/purchases/", headers=headers).status_code == 200
+
+
+def test_purchase_history_export_ndjson_nests_items(client, db, make_products):
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    buyer_id = db.query(User.id).filter(User.email == "buyer@example.com").scalar()
+    buy(client, db, headers, buyer_id, make_products, ["Lamp", "Rug"])
+    buy(client, db, headers, buyer_id, make_products, ["Desk"])
+
+    response = client.get("/api/purchases/export", headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="purchases.ndjson"'
+    purchases = [json.loads(line) for line in response.text.splitlines()]
+    assert [[item["title"] for item in purchase["items"]] for purchase in purchases] == [["Lamp", "Rug"], ["Desk"]]
+    assert purchases[0]["total_amount"] == 20.0
+    assert purchases[0]["status"] == "completed"
+
+
+def test_purchase_history_export_csv_has_a_row_per_item(client, db, make_products):
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    buyer_id = db.query(User.id).filter(User.email == "buyer@example.com").scalar()
+    buy(client, db, headers, buyer_id, make_products, ["Lamp", "Rug"])
+
+    response = client.get("/api/purchases/export?format=csv", headers=headers)
+
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["title"] for row in rows] == ["Lamp", "Rug"]
+    assert rows[0]["purchase_id"] == rows[1]["purchase_id"]
+    assert rows[0]["price_at_purchase"] == "10.0"
+
+
+def test_listing_export_runs_one_query(client, auth_headers, category, count_queries):
+    for i in range(30):
+        client.post("/api/products/", headers=auth_headers, json={
+            "title": f"Book {i}", "description": "Paperback, \"good\" condition", "price": 3.0, "category_id": category.id,
+        })
+    client.get("/api/users/me", headers=auth_headers)
+
+    with count_queries:
+        with client.stream("GET", "/api/products/my/listings/export?format=csv", headers=auth_headers) as response:
+            chunks = list(response.iter_raw())
+    assert count_queries.count == 1
+
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert [row["title"] for row in rows] == [f"Book {i}" for i in range(30)]
+    assert rows[0]["category"] == "Electronics"
+    assert rows[0]["description"] == 'Paperback, "good" condition'
+
+
+def test_first_row_is_sent_immediately_then_chunks_fill_up(monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_CHUNK_BYTES", 10)
+    lines = (f"row {i}\n" for i in range(5))
+
+    assert list(exports._chunks(lines)) == [b"row 0\n", b"row 1\nrow 2\n", b"row 3\nrow 4\n"]
+
+
+def test_exports_require_auth_and_a_known_format(client, auth_headers):
+    assert client.get("/api/purchases/export").status_code == 403
+    assert client.get("/api/products/my/listings/export?format=xml", headers=auth_headers).status_code == 422
+    assert client.get("/api/purchases/export", headers=auth_headers).text == ""
@@ -0,0 +1,249 @@
+import asyncio
+import io
+import os
+import pytest
+from PIL import Image
+from conftest import register_and_login
+import images
+from images import ImageStore
+from static_files import ImmutableFileResponse, RangeNotSatisfiable, byte_range
+
+
+def image_bytes(fmt="JPEG", size=(1600, 1200), mode="RGB", color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ImageStore(root=str(tmp_path), workers=0)
+    monkeypatch.setattr(images, "image_store", store)
+    return store
+
+
+@pytest.fixture
+def headers(client):
+    return register_and_login(client, email="photos@example.com", username="photos")
+
+
+def upload(client, headers, body, filename="photo.jpg", content_type="image/jpeg"):
+    return client.post("/api/images/", headers=headers, files={"file": (filename, body, content_type)})
+
+
+def test_upload_stores_content_addressed_original_and_thumbnails(client, headers, store):
+    body = image_bytes()
+    response = upload(client, headers, body)
+    assert response.status_code == 201
+    data = response.json()
+    assert (data["width"], data["height"], data["deduplicated"]) == (1600, 1200, False)
+    assert data["url"] == f"/api/images/{data['id']}.jpg"
+    assert data["thumbnails"]["listing"]["webp"] == f"/api/images/{data['id']}/listing.webp"
+
+    with open(store.original_path(data["id"], "jpg"), "rb") as file:
+        assert file.read() == body
+    for size, side in images.THUMBNAIL_SIZES.items():
+        for ext, fmt in (("webp", "WEBP"), ("jpg", "JPEG")):
+            with Image.open(store.thumbnail_path(data["id"], size, ext)) as thumbnail:
+                assert thumbnail.format == fmt
+                assert max(thumbnail.size) == min(side, 1600)
+
+
+def test_identical_uploads_are_stored_once(client, headers, store):
+    body = image_bytes()
+    first = upload(client, headers, body).json()
+    second = upload(client, headers, body, filename="copy.jpg")
+    assert second.status_code == 200
+    assert second.json()["id"] == first["id"]
+    assert second.json()["deduplicated"] is True
+    originals = [name for _, _, names in os.walk(os.path.join(store.root, "originals")) for name in names]
+    assert originals == [f"{first['id']}.jpg"]
+    assert store.stats()["stored"] == 1
+    assert store.stats()["deduplicated"] == 1
+
+
+def test_upload_rejections(client, headers, store, monkeypatch):
+    assert upload(client, {}, image_bytes()).status_code in (401, 403)
+    assert upload(client, headers, b"not an image", content_type="image/png").status_code == 415
+    tiff = image_bytes("TIFF", size=(10, 10))
+    assert upload(client, headers, tiff, content_type="image/tiff").status_code == 415
+
+    store.max_bytes = 1000
+    assert upload(client, headers, image_bytes(size=(400, 400), mode="L", color=128) + b"\0" * 2000).status_code == 413
+    # Refused from Content-Length alone, before the body is parsed
+    assert upload(client, headers, b"\0" * (store.max_bytes + 20000)).status_code == 413
+
+    monkeypatch.setattr(images, "IMAGE_MAX_PIXELS", 1000)
+    store.max_bytes = images.IMAGE_MAX_BYTES
+    assert upload(client, headers, image_bytes(size=(100, 100))).status_code == 413
+    assert not os.listdir(os.path.join(store.root, "incoming"))
+
+
+def test_uploads_are_parsed_as_they_arrive(client, headers, store, monkeypatch):
+    body = image_bytes(size=(64, 64))
+    boundary = "ecofinds-test-boundary"
+    form = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhello\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.jpg\"\r\n"
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + body + f"\r\n--{boundary}--\r\n".encode()
+    content_type = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+
+    def chunked(data, size=1000):
+        # No Content-Length: the limit has to hold while reading
+        for offset in range(0, len(data), size):
+            yield data[offset:offset + size]
+
+    response = client.post("/api/images/", headers={**headers, **content_type}, content=chunked(form))
+    assert response.status_code == 201, response.text
+    with open(store.original_path(response.json()["id"], "jpg"), "rb") as file:
+        assert file.read() == body
+
+    store.max_bytes = 5000
+    written = []
+    original_write = images.IncomingImage.write
+
+    def write(incoming, chunk):
+        written.append(len(chunk))
+        original_write(incoming, chunk)
+
+    monkeypatch.setattr(images.IncomingImage, "write", write)
+    endless = form.replace(body, b"\0" * 10 ** 6)
+    response = client.post("/api/images/", headers={**headers, **content_type}, content=chunked(endless))
+    assert response.status_code == 413
+    # Stopped at the limit rather than after taking the whole body
+    assert sum(written) <= store.max_bytes + 1000
+    assert not os.listdir(os.path.join(store.root, "incoming"))
+
+    no_file = f"--{boundary}\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhi\r\n--{boundary}--\r\n"
+    assert client.post("/api/images/", headers={**headers, **content_type}, content=no_file).status_code == 400
+    assert client.post("/api/images/", headers={**headers, "Content-Type": "image/jpeg"}, content=body).status_code == 400
+
+
+def test_original_is_served_immutable_with_ranges(client, headers, store):
+    body = image_bytes(size=(300, 200))
+    data = upload(client, headers, body).json()
+
+    response = client.get(data["url"])
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert response.headers["accept-ranges"] == "bytes"
+    etag = response.headers["etag"]
+    assert etag == f'"{data["id"]}"'
+
+    assert client.get(data["url"], headers={"If-None-Match": etag}).status_code == 304
+
+    partial = client.get(data["url"], headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == body[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(body)}"
+
+    suffix = client.get(data["url"], headers={"Range": "bytes=-5"})
+    assert suffix.status_code == 206
+    assert suffix.content == body[-5:]
+
+    unsatisfiable = client.get(data["url"], headers={"Range": f"bytes={len(body)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(body)}"
+
+    # A stale If-Range gets the whole file
+    stale = client.get(data["url"], headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert stale.status_code == 200
+    assert stale.content == body
+
+    head = client.head(data["url"])
+    assert head.status_code == 200
+    assert head.headers["content-length"] == str(len(body))
+    assert head.content == b""
+
+    assert client.get(f"/api/images/{'0' * 64}.jpg").status_code == 404
+    assert client.get("/api/images/..%2Fsecret.jpg").status_code == 404
+    assert client.get(f"/api/images/{data['id']}/huge.webp").status_code == 404
+
+
+def test_missing_thumbnail_is_rendered_on_request(client, headers, store):
+    data = upload(client, headers, image_bytes("PNG", mode="RGBA", color=(0, 0, 255, 0))).json()
+    path = store.thumbnail_path(data["id"], "listing", "jpg")
+    os.unlink(path)
+
+    response = client.get(data["thumbnails"]["listing"]["jpg"])
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{data["id"]}-listing-jpg"'
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    with Image.open(io.BytesIO(response.content)) as thumbnail:
+        # Transparency flattened onto white for JPEG
+        assert thumbnail.mode == "RGB"
+        assert thumbnail.getpixel((0, 0)) == (255, 255, 255)
+    with Image.open(store.thumbnail_path(data["id"], "listing", "webp")) as thumbnail:
+        assert thumbnail.mode == "RGBA"
+
+
+def test_thumbnail_of_an_undecodable_original_is_not_found(client, headers, store):
+    data = upload(client, headers, image_bytes(size=(50, 50))).json()
+    with open(store.original_path(data["id"], "jpg"), "r+b") as file:
+        file.truncate(20)
+    os.unlink(store.thumbnail_path(data["id"], "detail", "webp"))
+    assert client.get(data["thumbnails"]["detail"]["webp"]).status_code == 404
+    assert store.stats()["failed"] == 1
+
+
+def test_accel_redirect_hands_the_file_to_the_proxy(client, headers, store, monkeypatch):
+    from routers import images as images_router
+
+    data = upload(client, headers, image_bytes(size=(50, 50))).json()
+    monkeypatch.setattr(images_router, "IMAGE_ACCEL_REDIRECT", "/_media/")
+    response = client.get(data["url"])
+    assert response.status_code == 200
+    assert response.headers["x-accel-redirect"] == f"/_media/originals/{data['id'][:2]}/{data['id']}.jpg"
+    assert response.content == b""
+
+
+def test_thumbnails_render_in_worker_processes(tmp_path):
+    store = ImageStore(root=str(tmp_path), workers=1)
+    try:
+        stored = store.put(io.BytesIO(image_bytes()))
+        store.render(stored.digest, stored.ext).result(timeout=60)
+        assert os.path.exists(store.thumbnail_path(stored.digest, "detail", "webp"))
+    finally:
+        store.shutdown()
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-5", None),
+    ("bytes=9-3", None),
+    ("bytes=abc", None),
+])
+def test_byte_range(header, expected):
+    assert byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=-0"])
+def test_byte_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        byte_range(header, 1000)
+
+
+def test_zero_copy_send_when_the_server_offers_it(tmp_path):
+    path = tmp_path / "image.bin"
+    path.write_bytes(b"0123456789")
+    response = ImmutableFileResponse(str(path), 10, 206, {"content-length": "4"}, "image/jpeg", span=(3, 6))
+    messages = []
+
+    async def send(message):
+        if message["type"] == "http.response.zerocopysend":
+            file = message["file"]
+            message = dict(message, body=os.pread(file.fileno(), message["count"], message["offset"]))
+        messages.append(message)
+
+    scope = {"type": "http", "extensions": {"http.response.zerocopysend": {}}}
+    asyncio.run(response(scope, None, send))
+    assert messages[0]["status"] == 206
+    assert messages[1]["body"] == b"3456"
@@ -0,0 +1,154 @@
+import threading
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+import pytest
+
+import migrate
+from cart_store import SQLCartStore
+from database import Base, SessionLocal
+from models import CartItem, Product
+
+
+@pytest.fixture
+def scratch(tmp_path):
+    scratch = create_engine(f"sqlite:///{tmp_path / 'scratch.db'}")
+    yield scratch
+    scratch.dispose()
+
+
+def schema_drift(bind):
+    with bind.connect() as connection:
+        diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+    # The full-text index lives outside the models
+    return [change for change in diff if not (change[0] == "remove_table" and change[1].name.startswith("products_fts"))]
+
+
+def indexes(bind, table):
+    return {index["name"]: index["unique"] for index in inspect(bind).get_indexes(table)}
+
+
+def test_migrations_build_the_models_schema(scratch):
+    migrate.upgrade(scratch)
+    assert schema_drift(scratch) == []
+    assert indexes(scratch, "cart_items")["uq_cart_items_user_product"]
+
+    migrate.downgrade("0001", scratch)
+    assert "uq_cart_items_user_product" not in indexes(scratch, "cart_items")
+    migrate.upgrade(scratch)
+    assert schema_drift(scratch) == []
+
+
+def test_databases_from_create_all_are_brought_under_migrations(scratch):
+    import search  # noqa: F401
+    Base.metadata.create_all(bind=scratch)
+    with scratch.begin() as connection:
+        connection.execute(text("DROP INDEX uq_cart_items_user_product"))
+
+    migrate.upgrade(scratch)
+
+    with scratch.connect() as connection:
+        assert connection.scalar(text("SELECT version_num FROM alembic_version")) == "0003"
+    assert schema_drift(scratch) == []
+
+
+def test_search_index_is_backfilled_and_kept_up_to_date(scratch):
+    migrate.upgrade(scratch, "0001")
+    with scratch.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, email, username, hashed_password) VALUES (1, 'a@x', 'a', 'x')"))
+        connection.execute(text("INSERT INTO categories (id, name) VALUES (1, 'Books')"))
+        connection.execute(text(
+            "INSERT INTO products (id, title, description, price, category_id, seller_id) "
+            "VALUES (1, 'Lamp', 'Pre-loved', 10, 1, 1)"
+        ))
+
+    migrate.upgrade(scratch)
+
+    with scratch.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO products (id, title, description, price, category_id, seller_id) "
+            "VALUES (2, 'Desk lamp', 'Pre-loved', 30, 1, 1)"
+        ))
+        matches = connection.scalars(text("SELECT rowid FROM products_fts WHERE products_fts MATCH 'lamp' ORDER BY rowid")).all()
+    assert matches == [1, 2]
+
+
+def test_duplicate_cart_lines_are_merged(scratch):
+    migrate.upgrade(scratch, "0002")
+    with scratch.begin() as connection:
+        connection.execute(text("INSERT INTO users (id, email, username, hashed_password) VALUES (1, 'a@x', 'a', 'x')"))
+        connection.execute(text("INSERT INTO categories (id, name) VALUES (1, 'Books')"))
+        connection.execute(text(
+            "INSERT INTO products (id, title, description, price, category_id, seller_id) "
+            "VALUES (1, 'Lamp', 'Pre-loved', 10, 1, 1), (2, 'Desk', 'Pre-loved', 90, 1, 1)"
+        ))
+        connection.execute(text(
+            "INSERT INTO cart_items (id, user_id, product_id, quantity) "
+            "VALUES (1, 1, 1, 2), (2, 1, 2, 1), (3, 1, 1, 3), (4, 1, 1, 1)"
+        ))
+
+    migrate.upgrade(scratch)
+
+    with scratch.connect() as connection:
+        rows = connection.execute(text("SELECT id, product_id, quantity FROM cart_items ORDER BY id")).all()
+    assert [tuple(row) for row in rows] == [(1, 1, 6), (2, 2, 1)]
+
+
+def test_concurrent_adds_land_on_one_line(db, seller, make_products):
+    product = db.get(Product, make_products(title="Lamp")[0])
+    db.expunge(product)
+    store, results = SQLCartStore(), []
+
+    def add():
+        session = SessionLocal()
+        try:
+            results.append(store.add(session, seller.id, product, 1)[1])
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [tuple(row) for row in db.query(CartItem.user_id, CartItem.quantity)] == [(seller.id, 8)]
+    assert sorted(results) == [False] * 7 + [True]
+
+
+def test_foreign_key_lookups_use_an_index(db):
+    for table, column in (("cart_items", "product_id"), ("products", "category_id"),
+                          ("purchase_items", "purchase_id"), ("purchase_items", "product_id"),
+                          ("cart_items", "user_id"), ("products", "seller_id"), ("purchases", "buyer_id")):
+        plan = " ".join(row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN SELECT id FROM {table} WHERE {column} = 1")))
+        assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, (table, column, plan)
+
+
+def test_batch_adds_and_plain_adds_do_not_lose_updates(db, seller, make_products):
+    from schemas import CartOperation
+
+    product = db.get(Product, make_products(title="Lamp")[0])
+    db.expunge(product)
+    store, errors = SQLCartStore(), []
+    store.add(db, seller.id, product, 1)
+
+    def run(action):
+        session = SessionLocal()
+        try:
+            action(session)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            session.close()
+
+    batch = [CartOperation(op="add", product_id=product.id, quantity=2)]
+    threads = [threading.Thread(target=run, args=(lambda session: store.apply(session, seller.id, batch),)) for _ in range(8)]
+    threads += [threading.Thread(target=run, args=(lambda session: store.add(session, seller.id, product, 1),)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    db.expire_all()
+    assert [tuple(row) for row in db.query(CartItem.user_id, CartItem.quantity)] == [(seller.id, 1 + 8 * 2 + 8)]
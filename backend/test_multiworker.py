@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+import pytest
+
+import invalidation
+from database import DB_MODE
+from invalidation import SocketTransport
+from serve import pool_sizing, worker_environment
+
+
+def test_pool_sizing_stays_within_the_budget():
+    assert pool_sizing(80, 4) == {"DB_POOL_SIZE": 15, "DB_MAX_OVERFLOW": 5}
+    assert pool_sizing(80, 4, listener=True) == {"DB_POOL_SIZE": 15, "DB_MAX_OVERFLOW": 5}
+    assert pool_sizing(80, 4, "async") == {
+        "DB_POOL_SIZE": 3, "DB_MAX_OVERFLOW": 0, "DB_ASYNC_POOL_SIZE": 13, "DB_ASYNC_MAX_OVERFLOW": 4,
+    }
+    assert pool_sizing(3, 3) == {"DB_POOL_SIZE": 1, "DB_MAX_OVERFLOW": 0}
+    for workers in (1, 3, 7, 16):
+        sizes = pool_sizing(100, workers, "async")
+        assert workers * sum(sizes.values()) <= 100
+    with pytest.raises(ValueError):
+        pool_sizing(4, 4, listener=True)
+    with pytest.raises(ValueError):
+        pool_sizing(12, 4, "async")
+
+
+def test_worker_environment_keeps_explicit_settings():
+    settings = worker_environment(4, budget=40, environ={})
+    assert settings["CACHE_INVALIDATION"] == "socket"  # the tests run on SQLite
+    sizes = pool_sizing(40, 4, DB_MODE)
+    assert {name: settings[name] for name in sizes} == {name: str(size) for name, size in sizes.items()}
+    assert int(settings["PASSWORD_HASH_WORKERS"]) >= 1
+
+    settings = worker_environment(4, budget=40, environ={"CACHE_INVALIDATION": "local", "DB_POOL_SIZE": "2"})
+    assert "CACHE_INVALIDATION" not in settings and "DB_POOL_SIZE" not in settings
+    assert "CACHE_INVALIDATION" not in worker_environment(1, budget=0, environ={})
+
+
+def test_worker_environment_refuses_per_process_carts():
+    with pytest.raises(ValueError):
+        worker_environment(2, budget=0, environ={"CART_STORE": "memory"})
+    worker_environment(1, budget=0, environ={"CART_STORE": "memory"})
+    worker_environment(2, budget=0, environ={"CART_STORE": "redis://localhost:6379/0"})
+
+
+@pytest.fixture
+def socket_dir():
+    # Unix socket paths are short; pytest's tmp_path can be too long
+    directory = tempfile.mkdtemp(prefix="inv-")
+    yield directory
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_socket_transport_reaches_every_other_worker(socket_dir):
+    received = {name: [] for name in "abc"}
+    transports = {
+        name: SocketTransport(socket_dir, name=name, deliver=received[name].append, poll_interval=0.05)
+        for name in "abc"
+    }
+    for transport in transports.values():
+        transport.start()
+    try:
+        transports["a"].send("hello")
+        wait_for(lambda: received["b"] and received["c"])
+        assert received == {"a": [], "b": ["hello"], "c": ["hello"]}
+    finally:
+        for transport in transports.values():
+            transport.stop()
+    assert os.listdir(socket_dir) == []
+
+
+def test_socket_transport_removes_sockets_of_dead_workers(socket_dir):
+    # A worker killed without cleaning up leaves its socket file behind
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    dead.bind(os.path.join(socket_dir, "dead.sock"))
+    dead.close()
+    transport = SocketTransport(socket_dir, name="alive")
+    transport.start()
+    try:
+        transport.send("hello")
+        assert os.listdir(socket_dir) == ["alive.sock"]
+    finally:
+        transport.stop()
+
+
+def test_oversized_messages_drop_the_whole_topic(monkeypatch):
+    sent = []
+
+    class Transport:
+        max_message = 200
+
+        def send(self, message):
+            sent.append(json.loads(message))
+
+    monkeypatch.setattr(invalidation, "_transport", Transport())
+    invalidation.publish("products", {"ids": [1, 2], "categories": [1]})
+    invalidation.publish("products", {"ids": list(range(1000)), "categories": [1]})
+
+    assert [message["payload"] for message in sent] == [{"ids": [1, 2], "categories": [1]}, None]
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def ready(url):
+    try:
+        return httpx.get(f"{url}/readyz").status_code == 200
+    except httpx.ConnectError:
+        return False
+
+
+def test_writes_in_one_worker_invalidate_the_others(category, socket_dir):
+    port = free_port()
+    env = dict(
+        os.environ, WEB_CONCURRENCY="2", CACHE_INVALIDATION_SOCKET_DIR=socket_dir, WARMUP_ENABLED="true",
+        PASSWORD_HASH_WORKERS="0",
+    )
+    env.pop("CACHE_INVALIDATION", None)
+    server = subprocess.Popen(
+        [sys.executable, "serve.py", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        # Both workers bind a socket once their lifespan has started them
+        wait_for(lambda: len(os.listdir(socket_dir)) == 2, timeout=30)
+        wait_for(lambda: all(ready(url) for _ in range(10)), timeout=30)
+
+        # Every worker cached the categories while warming up
+        response = httpx.post(f"{url}/api/products/categories", params={"name": "Garden"})
+        assert response.status_code == 200, response.text
+
+        # New connections spread over both workers; none may serve the stale list
+        time.sleep(0.2)
+        for _ in range(20):
+            names = [category["name"] for category in httpx.get(f"{url}/api/products/categories").json()]
+            assert names == ["Electronics", "Garden"]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
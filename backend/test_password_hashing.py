@@ -0,0 +1,25 @@
+from hashing import PasswordHasher, password_hasher
+from conftest import register_and_login
+
+
+def test_process_pool_hashes_and_verifies():
+    hasher = PasswordHasher(workers=1, max_pending=2)
+    try:
+        hashed = hasher.hash("correct horse")
+        assert hasher.verify("correct horse", hashed)
+        assert not hasher.verify("battery staple", hashed)
+        assert hasher.pending == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_login_returns_503_when_hashing_is_saturated(client, monkeypatch):
+    register_and_login(client)
+    saturated = PasswordHasher(workers=1, max_pending=0)
+    monkeypatch.setattr(password_hasher, "_run", saturated._run)
+
+    response = client.post("/api/auth/login", data={"username": "seller@example.com", "password": "password123"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert saturated.rejected == 1
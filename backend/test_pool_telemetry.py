@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+import auth
+from pool_telemetry import PoolTelemetry
+
+
+def test_pool_records_waits_and_timeouts(tmp_path):
+    telemetry = PoolTelemetry("test")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=telemetry.pool_class(QueuePool), pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    telemetry.instrument(engine)
+
+    held = engine.connect()
+    held.execute(text("SELECT 1"))
+    stats = telemetry.stats()
+    assert stats["checked_out"] == 1
+    assert stats["connects"] == 1
+
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    held.close()
+
+    stats = telemetry.stats()
+    assert stats["timeouts"] == 1
+    assert stats["checked_out"] == 0
+    assert stats["wait_seconds"]["count"] == 2
+    assert stats["wait_seconds"]["buckets"]["0.1"] == 2
+    engine.dispose()
+
+
+def test_waiting_request_is_timed_until_a_connection_frees_up(tmp_path):
+    telemetry = PoolTelemetry("test")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=telemetry.pool_class(QueuePool), pool_size=1, max_overflow=0, pool_timeout=5,
+    )
+    telemetry.instrument(engine)
+
+    held = engine.connect()
+    threading.Timer(0.2, held.close).start()
+    with engine.connect():
+        pass
+
+    wait = telemetry.stats()["wait_seconds"]
+    assert wait["count"] == 2
+    assert wait["buckets"]["0.1"] == 1
+    assert telemetry.timeouts == 0
+    engine.dispose()
+
+
+def test_pool_stats_endpoint(client, monkeypatch):
+    assert client.get("/api/admin/pool").status_code == 403
+
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "s3cret")
+    response = client.get("/api/admin/pool", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    primary = response.json()["pools"][0]
+    assert primary["name"] == "primary"
+    assert set(primary) >= {"size", "checked_out", "overflow", "timeouts", "wait_seconds"}
@@ -0,0 +1,46 @@
+import auth
+from conftest import register_and_login
+
+
+def test_repeat_requests_skip_the_user_lookup(client, count_queries):
+    headers = register_and_login(client)
+    client.get("/api/users/me", headers=headers)
+
+    with count_queries:
+        response = client.get("/api/users/me", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["email"] == "seller@example.com"
+    assert count_queries.count == 0
+    assert auth.principal_cache.hits >= 1
+
+
+def test_cached_user_can_still_be_updated(client):
+    headers = register_and_login(client)
+    client.get("/api/users/me", headers=headers)
+
+    response = client.put("/api/users/me", headers=headers, json={"first_name": "Ada"})
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Ada"
+
+    # The update invalidated the cached principal
+    assert client.get("/api/users/me", headers=headers).json()["first_name"] == "Ada"
+
+
+def test_email_change_revokes_old_tokens(client):
+    headers = register_and_login(client)
+    client.get("/api/users/me", headers=headers)
+
+    response = client.put("/api/users/me", headers=headers, json={"email": "new@example.com"})
+    assert response.status_code == 200
+
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+
+
+def test_cache_stats_require_admin_token(client, monkeypatch):
+    assert client.get("/api/admin/cache").status_code == 403
+
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "s3cret")
+    response = client.get("/api/admin/cache", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert set(response.json()["principals"]) >= {"hits", "misses", "size"}
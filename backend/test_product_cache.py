@@ -0,0 +1,120 @@
+from cache import TTLCache
+from models import Category
+from conftest import register_and_login
+
+
+def create_product(client, headers, category_id, title="Road bike"):
+    response = client.post("/api/products/", headers=headers, json={
+        "title": title, "description": "Pre-loved", "price": 90.0, "category_id": category_id,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_detail_is_cached_and_conditional_get_skips_the_database(client, auth_headers, category, count_queries):
+    product = create_product(client, auth_headers, category.id)
+    path = f"/api/products/{product['id']}"
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    with count_queries:
+        assert client.get(path).json() == first.json()
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+    assert count_queries.count == 0
+
+    # A stale validator gets the full body
+    assert client.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_detail_follows_its_seller_without_last_modified(client, auth_headers, category):
+    product = create_product(client, auth_headers, category.id)
+    path = f"/api/products/{product['id']}"
+    first = client.get(path)
+    assert "Last-Modified" not in first.headers
+
+    # The seller's profile is in the body, but editing it doesn't touch the product
+    assert client.put("/api/users/me", headers=auth_headers, json={"first_name": "Ada"}).status_code == 200
+    for headers in ({"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}, {"If-None-Match": first.headers["ETag"]}):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["seller"]["first_name"] == "Ada"
+
+
+def test_listings_follow_products_leaving_them(client, auth_headers, category):
+    create_product(client, auth_headers, category.id, title="Lamp")
+    sold = create_product(client, auth_headers, category.id, title="Desk")
+    for path in ("/api/products/", "/api/products/page"):
+        assert "Last-Modified" not in client.get(path).headers
+
+    # The listing's remaining rows are no newer than before, yet it changed
+    first = client.get("/api/products/")
+    client.delete(f"/api/products/{sold['id']}", headers=auth_headers)
+    response = client.get("/api/products/", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert response.status_code == 200
+    assert [item["title"] for item in response.json()] == ["Lamp"]
+    assert client.get("/api/products/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+
+def test_writes_invalidate_detail_and_listings(client, auth_headers, category):
+    product = create_product(client, auth_headers, category.id)
+    path = f"/api/products/{product['id']}"
+    etag = client.get(path).headers["ETag"]
+    assert [item["title"] for item in client.get("/api/products/").json()] == ["Road bike"]
+
+    client.put(path, headers=auth_headers, json={"title": "Gravel bike"})
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Gravel bike"
+    assert [item["title"] for item in client.get("/api/products/").json()] == ["Gravel bike"]
+
+    client.delete(path, headers=auth_headers)
+    assert client.get(path).status_code == 404
+    assert client.get("/api/products/").json() == []
+
+
+def test_invalidation_is_targeted_by_category(client, db, auth_headers, category, count_queries):
+    books = Category(name="Books")
+    db.add(books)
+    db.commit()
+    create_product(client, auth_headers, books.id, title="Atlas")
+    client.get("/api/products/", params={"category_id": books.id})
+
+    create_product(client, auth_headers, category.id, title="Tripod")
+
+    with count_queries:
+        response = client.get("/api/products/", params={"category_id": books.id})
+    assert count_queries.count == 0
+    assert [item["title"] for item in response.json()] == ["Atlas"]
+    assert [item["title"] for item in client.get("/api/products/").json()] == ["Tripod", "Atlas"]
+
+
+def test_checkout_and_seller_updates_invalidate(client, auth_headers, category):
+    product = create_product(client, auth_headers, category.id)
+    path = f"/api/products/{product['id']}"
+    client.get(path)
+
+    client.put("/api/users/me", headers=auth_headers, json={"username": "bike-shop"})
+    assert client.get(path).json()["seller"]["username"] == "bike-shop"
+
+    buyer = register_and_login(client, email="buyer@example.com", username="buyer")
+    client.post("/api/cart/", headers=buyer, json={"product_id": product["id"]})
+    assert client.post("/api/purchases/", headers=buyer).status_code == 200
+    assert client.get(path).json()["is_available"] is False
+
+
+def test_cache_evicts_to_stay_within_its_byte_budget():
+    cache = TTLCache(maxsize=100, ttl=None, max_bytes=10)
+    cache.set("a", b"12345", tags=("x",))
+    cache.set("b", b"12345")
+    cache.get("a")
+    cache.set("c", b"123")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345"
+    assert cache.bytes == 8
+
+    cache.invalidate_tags("x")
+    assert cache.get("a") is None
+    assert cache.bytes == 3
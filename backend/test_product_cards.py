@@ -0,0 +1,41 @@
+def test_card_view_has_only_what_a_listing_card_needs(client, seller, category, make_products):
+    make_products(count=3, title="Oak table {i}", description="x" * 1000)
+
+    full = client.get("/api/products/").json()
+    cards = client.get("/api/products/", params={"view": "card"}).json()
+
+    assert [card["id"] for card in cards] == [product["id"] for product in full]
+    card = cards[0]
+    assert set(card) == {"id", "title", "description", "price", "image_url", "created_at", "category", "seller"}
+    assert card["category"] == {"id": category.id, "name": "Electronics"}
+    assert card["seller"] == {"id": seller.id, "username": "owner"}
+    assert card["description"] == "x" * 160
+    assert card["created_at"] == full[0]["created_at"]
+    assert "owner@example.com" not in client.get("/api/products/", params={"view": "card"}).text
+
+
+def test_card_view_applies_filters_and_search(client, make_products):
+    make_products(count=2, title="Oak table {i}")
+    make_products(5.0, title="Desk lamp", description="Brass")
+
+    cards = client.get("/api/products/", params={"view": "card", "search": "lamp"}).json()
+    assert [card["title"] for card in cards] == ["Desk lamp"]
+    cards = client.get("/api/products/", params={"view": "card", "search": "lamp", "search_mode": "substring"}).json()
+    assert [card["title"] for card in cards] == ["Desk lamp"]
+
+
+def test_card_pages_and_cache_entries_are_separate_from_full_view(client, seller, make_products):
+    product_ids = make_products(count=5, title="Oak table {i}")
+
+    ids, cursor = [], None
+    while True:
+        params = {"view": "card", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/products/page", params=params).json()
+        ids.extend(card["id"] for card in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert ids == sorted(product_ids, reverse=True)
+
+    full = client.get("/api/products/page", params={"limit": 2}).json()
+    assert "email" in full["items"][0]["seller"]
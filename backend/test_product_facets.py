@@ -0,0 +1,92 @@
+from facets import UNSEARCHED, facet_cache, facet_key
+from models import Category
+from conftest import register_and_login
+
+
+def histogram(body):
+    return [band["count"] for band in body["price_histogram"]]
+
+
+def test_counts_per_category_and_price_band(client, db, category, make_products):
+    books = Category(name="Books")
+    db.add(books)
+    db.commit()
+    make_products(300.0, title="Laptop")
+    make_products(99.0, title="Phone")
+    make_products(5.0, title="Novel", category_id=books.id)
+    make_products(12.0, title="Atlas", category_id=books.id)
+    make_products(8.0, title="Sold book", category_id=books.id, is_available=False)
+
+    body = client.get("/api/products/facets").json()
+    assert body["total"] == 4
+    assert body["categories"] == [
+        {"id": books.id, "name": "Books", "count": 2},
+        {"id": category.id, "name": "Electronics", "count": 2},
+    ]
+    assert [(band["min"], band["max"]) for band in body["price_histogram"]][:2] == [(0.0, 10.0), (10.0, 25.0)]
+    assert body["price_histogram"][-1]["max"] is None
+    assert histogram(body) == [1, 1, 0, 1, 0, 1, 0]
+
+    # Category counts stay disjunctive; total and histogram follow the filter
+    body = client.get("/api/products/facets", params={"category_id": books.id}).json()
+    assert body["total"] == 2
+    assert len(body["categories"]) == 2
+    assert histogram(body) == [1, 1, 0, 0, 0, 0, 0]
+
+    body = client.get("/api/products/facets", params={"search": "lap"}).json()
+    assert body["total"] == 1
+    assert body["categories"] == [{"id": category.id, "name": "Electronics", "count": 1}]
+
+
+def test_writes_update_the_cached_grid_in_place(client, category, make_products, auth_headers):
+    make_products(20.0, title="Lamp")
+    assert client.get("/api/products/facets").json()["total"] == 1
+    client.get("/api/products/facets", params={"search": "lamp"})
+
+    created = client.post("/api/products/", headers=auth_headers, json={
+        "title": "Lamp shade", "description": "Linen", "price": 600.0, "category_id": category.id,
+    }).json()
+
+    # Searched grids are dropped; the browse grid is adjusted, not reloaded
+    assert facet_cache.get(facet_key("lamp", "fulltext")) is None
+    hits = facet_cache.hits
+    body = client.get("/api/products/facets").json()
+    assert facet_cache.hits == hits + 1
+    assert body["total"] == 2
+    assert histogram(body) == [0, 1, 0, 0, 0, 0, 1]
+
+    client.put(f"/api/products/{created['id']}", headers=auth_headers, json={"price": 5.0})
+    assert histogram(client.get("/api/products/facets").json()) == [1, 1, 0, 0, 0, 0, 0]
+
+    client.put(f"/api/products/{created['id']}", headers=auth_headers, json={"is_available": False})
+    assert histogram(client.get("/api/products/facets").json()) == [0, 1, 0, 0, 0, 0, 0]
+
+    client.delete(f"/api/products/{created['id']}", headers=auth_headers)
+    assert client.get("/api/products/facets").json()["total"] == 1
+
+    # Still matches a fresh computation
+    cached = client.get("/api/products/facets").json()
+    facet_cache.clear()
+    assert client.get("/api/products/facets").json() == cached
+
+
+def test_checkout_and_new_categories(client, db, category, make_products):
+    (kettle,) = make_products(30.0, title="Kettle")
+    assert client.get("/api/products/facets").json()["total"] == 1
+
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    client.post("/api/cart/", headers=headers, json={"product_id": kettle})
+    client.post("/api/purchases/", headers=headers)
+    assert client.get("/api/products/facets").json()["total"] == 0
+
+    # A category the grid has never seen forces a reload
+    garden = Category(name="Garden")
+    db.add(garden)
+    db.commit()
+    seller_headers = register_and_login(client)
+    client.post("/api/products/", headers=seller_headers, json={
+        "title": "Rake", "description": "Steel", "price": 15.0, "category_id": garden.id,
+    })
+    assert facet_cache.get(UNSEARCHED) is None
+    body = client.get("/api/products/facets").json()
+    assert body["categories"] == [{"id": garden.id, "name": "Garden", "count": 1}]
@@ -0,0 +1,53 @@
+from models import Category
+
+
+def collect_pages(client, limit, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = {"limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/api/products/page", params=query)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        ids.extend(item["id"] for item in body["items"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+def test_cursor_pages_are_newest_first_without_gaps(client, make_products):
+    product_ids = make_products(count=7)
+
+    ids, pages = collect_pages(client, limit=3)
+
+    assert ids == sorted(product_ids, reverse=True)
+    assert pages == 3
+
+
+def test_cursor_pages_apply_filters(client, db, category, make_products):
+    other = Category(name="Books")
+    db.add(other)
+    db.commit()
+    make_products(count=2, category_id=other.id)
+    expected = make_products(count=4)
+    make_products(count=2, is_available=False)
+
+    ids, _ = collect_pages(client, limit=2, category_id=category.id)
+
+    assert ids == sorted(expected, reverse=True)
+
+
+def test_invalid_cursor_is_rejected(client):
+    response = client.get("/api/products/page", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_offset_listing_is_stable(client, make_products):
+    product_ids = make_products(count=5)
+
+    first = client.get("/api/products/", params={"skip": 0, "limit": 2}).json()
+    rest = client.get("/api/products/", params={"skip": 2, "limit": 10}).json()
+
+    assert [item["id"] for item in first + rest] == sorted(product_ids, reverse=True)
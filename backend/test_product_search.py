@@ -0,0 +1,56 @@
+from conftest import register_and_login
+
+
+def create_product(client, headers, category_id, title, description="Gently used"):
+    response = client.post("/api/products/", headers=headers, json={
+        "title": title,
+        "description": description,
+        "price": 10.0,
+        "category_id": category_id,
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def search(client, term, **params):
+    response = client.get("/api/products/", params={"search": term, **params})
+    assert response.status_code == 200, response.text
+    return [product["title"] for product in response.json()]
+
+
+def test_prefix_match_and_relevance_order(client, auth_headers, category):
+    create_product(client, auth_headers, category.id, "Desk lamp", "Works with any laptop stand")
+    create_product(client, auth_headers, category.id, "Gaming laptop", "Barely used")
+    create_product(client, auth_headers, category.id, "Bookshelf")
+
+    # Title matches outrank description matches
+    assert search(client, "lapt") == ["Gaming laptop", "Desk lamp"]
+    assert search(client, "gaming lap") == ["Gaming laptop"]
+    assert search(client, "bicycle") == []
+
+
+def test_index_follows_updates_and_deletes(client, auth_headers, category):
+    product = create_product(client, auth_headers, category.id, "Vintage camera")
+    assert search(client, "camera") == ["Vintage camera"]
+
+    response = client.put(f"/api/products/{product['id']}", headers=auth_headers, json={"title": "Vintage radio"})
+    assert response.status_code == 200
+    assert search(client, "camera") == []
+    assert search(client, "radio") == ["Vintage radio"]
+
+    response = client.delete(f"/api/products/{product['id']}", headers=auth_headers)
+    assert response.status_code == 200
+    assert search(client, "radio") == []
+
+
+def test_substring_mode_still_available(client, auth_headers, category):
+    create_product(client, auth_headers, category.id, "Snowboard")
+    assert search(client, "owboa", search_mode="substring") == ["Snowboard"]
+    assert search(client, "owboa") == []
+
+
+def test_search_respects_other_filters(client, category, db):
+    headers = register_and_login(client)
+    create_product(client, headers, category.id, "Red bicycle")
+    response = client.get("/api/products/", params={"search": "bicycle", "category_id": category.id + 1})
+    assert response.json() == []
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta
+from itertools import product as combinations
+from sqlalchemy import text
+from database import engine
+from pagination import encode_cursor, keyset
+from routers.products import SORTS, _filtered_products
+
+NOW = datetime(2024, 1, 31)
+
+
+def titles(response):
+    return [item["title"] for item in response.json()]
+
+
+def catalogue(make_products):
+    make_products(20.0, title="Lamp", created_at=NOW - timedelta(days=3))
+    make_products(45.0, title="Chair", created_at=NOW - timedelta(days=1))
+    make_products(120.0, title="Desk", created_at=NOW - timedelta(days=2))
+    make_products(4.5, title="Mug", created_at=NOW - timedelta(days=4))
+    make_products(20.0, title="Vase", created_at=NOW - timedelta(days=5))
+
+
+def test_sorts_and_price_range(client, make_products):
+    catalogue(make_products)
+
+    assert titles(client.get("/api/products/")) == ["Chair", "Desk", "Lamp", "Mug", "Vase"]
+    assert titles(client.get("/api/products/", params={"sort": "price_asc"})) == ["Mug", "Lamp", "Vase", "Chair", "Desk"]
+    assert titles(client.get("/api/products/", params={"sort": "price_desc"})) == ["Desk", "Chair", "Vase", "Lamp", "Mug"]
+
+    # Bounds are inclusive; equal prices fall back to id order
+    params = {"sort": "price_asc", "min_price": 20, "max_price": 45}
+    assert titles(client.get("/api/products/", params=params)) == ["Lamp", "Vase", "Chair"]
+    params = {"sort": "price_asc", "min_price": 20, "max_price": 45, "view": "card"}
+    assert titles(client.get("/api/products/", params=params)) == ["Lamp", "Vase", "Chair"]
+    assert titles(client.get("/api/products/", params={"max_price": 20})) == ["Lamp", "Mug", "Vase"]
+
+    # An explicit sort overrides relevance ranking for searches
+    assert titles(client.get("/api/products/", params={"search": "a", "search_mode": "substring",
+                                                        "sort": "price_desc"})) == ["Chair", "Vase", "Lamp"]
+
+
+def test_bad_filters_are_rejected(client):
+    assert client.get("/api/products/", params={"sort": "cheapest"}).status_code == 422
+    assert client.get("/api/products/", params={"min_price": -1}).status_code == 422
+    assert client.get("/api/products/", params={"min_price": 50, "max_price": 10}).status_code == 400
+    assert client.get("/api/products/page", params={"min_price": 50, "max_price": 10}).status_code == 400
+
+
+def test_cursor_pages_follow_the_sort(client, make_products):
+    catalogue(make_products)
+
+    for sort, expected in (
+        ("price_asc", ["Mug", "Lamp", "Vase", "Chair", "Desk"]),
+        ("price_desc", ["Desk", "Chair", "Vase", "Lamp", "Mug"]),
+        ("newest", ["Chair", "Desk", "Lamp", "Mug", "Vase"]),
+    ):
+        for view in ("full", "card"):
+            seen, cursor = [], None
+            while True:
+                params = {"sort": sort, "limit": 2, "view": view}
+                if cursor:
+                    params["cursor"] = cursor
+                body = client.get("/api/products/page", params=params).json()
+                seen += [item["title"] for item in body["items"]]
+                cursor = body["next_cursor"]
+                if not cursor:
+                    break
+            assert seen == expected, (sort, view)
+
+    params = {"sort": "price_asc", "limit": 2, "min_price": 10}
+    body = client.get("/api/products/page", params=params).json()
+    assert [item["title"] for item in body["items"]] == ["Lamp", "Vase"]
+    body = client.get("/api/products/page", params=dict(params, cursor=body["next_cursor"])).json()
+    assert [item["title"] for item in body["items"]] == ["Chair", "Desk"]
+    assert body["next_cursor"] is None
+
+    # A cursor from one sort doesn't decode under another
+    newest = client.get("/api/products/page", params={"limit": 2}).json()["next_cursor"]
+    assert client.get("/api/products/page", params={"sort": "price_asc", "cursor": newest}).status_code == 400
+
+
+def test_every_sort_and_filter_is_an_index_range_scan(db):
+    cursors = {
+        "newest": encode_cursor(datetime(2024, 1, 1), 5),
+        "price_asc": encode_cursor(20.0, 5),
+        "price_desc": encode_cursor(20.0, 5),
+    }
+    prices = [(None, None), (10.0, None), (None, 50.0), (10.0, 50.0)]
+    for sort, category_id, (min_price, max_price), view, paged in combinations(
+        SORTS, (None, 1), prices, ("full", "card"), (False, True)
+    ):
+        query, _ = _filtered_products(db, category_id, None, "fulltext", ranked=False, view=view,
+                                      min_price=min_price, max_price=max_price)
+        columns, types, descending = SORTS[sort]
+        query = keyset(query, columns, types, descending, cursors[sort] if paged else None).limit(21)
+        sql = query.statement.compile(engine, compile_kwargs={"literal_binds": True})
+        plan = [row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+        prefixes = ["ix_products_available_category_"] if category_id else ["ix_products_available_"]
+        if category_id and sort != "newest" and (min_price is not None or max_price is not None):
+            # The planner costs (category, price) and (price) range scans the
+            # same here and takes whichever index was created first; with
+            # either one the rows come out in price order
+            prefixes.append("ix_products_available_")
+        scans = [step for step in plan if "products" in step]
+        combo = (sort, category_id, min_price, max_price, view, paged)
+        assert len(scans) == 1, (combo, plan)
+        used = next((prefix for prefix in prefixes if scans[0].startswith(f"SEARCH products USING INDEX {prefix}")), None)
+        assert used, (combo, plan)
+        if sort == "newest" and (min_price is not None or max_price is not None):
+            # No one index covers both a price range and date order: the planner
+            # may walk the date index filtering on price, or range-scan the
+            # price index and sort only the matches
+            continue
+        assert f"{used}{'created' if sort == 'newest' else 'price'} " in scans[0], (combo, plan)
+        assert not any("TEMP B-TREE" in step for step in plan), (combo, plan)
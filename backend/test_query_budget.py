@@ -0,0 +1,69 @@
+"""
+Each endpoint that serializes nested models must issue a fixed number of
+queries no matter how many rows it returns.
+"""
+
+import pytest
+from models import CartItem, Purchase, PurchaseItem, User
+from product_cache import product_cache
+from conftest import register_and_login
+
+
+def seed(db, make_products, buyer_email, count):
+    buyer = db.query(User).filter(User.email == buyer_email).one()
+    start = db.query(User).count()
+    for i in range(start, start + count):
+        # A separate seller per product so lazy loads would hit distinct rows
+        seller = User(email=f"seller{i}@example.com", username=f"seller{i}", hashed_password="x")
+        db.add(seller)
+        db.flush()
+        (product,) = make_products(10.0, title=f"Item {i}", seller_id=seller.id)
+        (sold,) = make_products(12.0, title=f"Sold {i}", seller_id=seller.id, is_available=False)
+        make_products(8.0, title=f"Listing {i}", seller_id=buyer.id)
+        db.add(CartItem(user_id=buyer.id, product_id=product, quantity=1))
+        purchase = Purchase(buyer_id=buyer.id, total_amount=12.0)
+        db.add(purchase)
+        db.flush()
+        db.add(PurchaseItem(purchase_id=purchase.id, product_id=sold, price_at_purchase=12.0))
+    db.commit()
+    # Rows were written behind the API's back
+    product_cache.clear()
+
+
+# With the authenticated user already cached
+BUDGETS = {
+    "/api/products/": 1,
+    "/api/products/page": 1,
+    "/api/products/my/listings": 1,
+    "/api/cart/": 1,
+    "/api/purchases/": 2,
+}
+
+
+@pytest.mark.parametrize("path", sorted(BUDGETS))
+def test_query_budget_is_independent_of_result_size(client, db, make_products, count_queries, path):
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    client.get("/api/users/me", headers=headers)
+    counts = []
+    for batch in (2, 20):
+        seed(db, make_products, "buyer@example.com", batch)
+        with count_queries:
+            response = client.get(path, headers=headers)
+        assert response.status_code == 200, response.text
+        counts.append(count_queries.count)
+
+    assert counts[0] == counts[1]
+    assert counts[1] <= BUDGETS[path]
+
+
+def test_single_purchase_query_budget(client, db, make_products, count_queries):
+    headers = register_and_login(client, email="buyer@example.com", username="buyer")
+    seed(db, make_products, "buyer@example.com", 1)
+    purchase_id = db.query(Purchase.id).scalar()
+    client.get("/api/users/me", headers=headers)
+
+    with count_queries:
+        response = client.get(f"/api/purchases/{purchase_id}", headers=headers)
+
+    assert response.status_code == 200
+    assert count_queries.count <= 2
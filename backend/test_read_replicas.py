@@ -0,0 +1,141 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import replicas
+from cache import TTLCache
+from database import Base
+from models import Category, Product, User
+from product_cache import product_cache
+from conftest import register_and_login
+
+
+def make_replica(path, product_title):
+    """A replica file holding the primary's fixtures, but its own product title and nothing newer."""
+    import search  # noqa: F401  the listing's full-text index
+    url = f"sqlite:///{path}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(User(id=1, email="owner@example.com", username="owner", hashed_password="not-a-real-hash"))
+        db.add(Category(id=1, name="Electronics"))
+        db.add(Product(id=1, title=product_title, description="Pre-loved", price=10.0, category_id=1, seller_id=1))
+        db.commit()
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def lamp(make_products):
+    return make_products(title="Lamp")[0]
+
+
+@pytest.fixture
+def replica_urls(tmp_path):
+    yield [make_replica(tmp_path / "replica-a.db", "Lamp on replica A"),
+           make_replica(tmp_path / "replica-b.db", "Lamp on replica B")]
+    replicas.configure([])
+
+
+def titles(client, **params):
+    return [product["title"] for product in client.get("/api/products/", params=params).json()]
+
+
+def test_reads_are_spread_over_the_replicas(client, lamp, replica_urls):
+    replicas.configure(replica_urls)
+
+    seen = set()
+    for _ in range(4):
+        product_cache.clear()
+        seen.add(client.get(f"/api/products/{lamp}").json()["title"])
+    assert seen == {"Lamp on replica A", "Lamp on replica B"}
+
+    replicas.configure([])
+    product_cache.clear()
+    assert titles(client) == ["Lamp"]
+
+
+def test_writes_go_to_the_primary_and_the_writer_reads_them_back(client, db, category, lamp, replica_urls):
+    replicas.configure(replica_urls[:1])
+    headers = register_and_login(client)
+    response = client.post("/api/products/", headers=headers, json={
+        "title": "Desk", "description": "Solid oak", "price": 90.0, "category_id": category.id,
+    })
+    assert response.status_code == 200, response.text
+    assert "ecofinds_primary_until" in response.headers["set-cookie"]
+    assert db.query(Product).filter(Product.title == "Desk").count() == 1
+
+    # The writer sees its own write while the replica catches up
+    assert sorted(titles(client)) == ["Desk", "Lamp"]
+    # Everyone else reads the replica, which hasn't got it yet
+    client.cookies.clear()
+    product_cache.clear()
+    assert titles(client) == ["Lamp on replica A"]
+
+
+def test_an_expired_or_garbled_cookie_reads_from_a_replica(client, lamp, replica_urls):
+    replicas.configure(replica_urls[:1])
+    for value in ("1", "soon"):
+        product_cache.clear()
+        client.cookies.set("ecofinds_primary_until", value)
+        assert titles(client) == ["Lamp on replica A"]
+
+
+def test_no_cookie_without_replicas_or_on_failed_writes(client, replica_urls):
+    response = client.post("/api/auth/login", data={"username": "nobody@example.com", "password": "x"})
+    assert "set-cookie" not in response.headers
+    replicas.configure(replica_urls[:1])
+    response = client.post("/api/auth/login", data={"username": "nobody@example.com", "password": "x"})
+    assert response.status_code == 401
+    assert "set-cookie" not in response.headers
+
+
+def test_replica_loads_after_an_invalidation_are_cached_briefly(monkeypatch):
+    monkeypatch.setattr(replicas, "REPLICA_MAX_LAG_SECONDS", 5.0)
+    now = [100.0]
+    cache = TTLCache(ttl=300, clock=lambda: now[0])
+    replica, primary = Session(info={"replica": True}), Session()
+
+    assert replicas.replica_cache_ttl(cache, replica) is None
+    cache.clear()
+    now[0] += 1
+    assert replicas.replica_cache_ttl(cache, replica) == 4.0
+    assert replicas.replica_cache_ttl(cache, primary) is None
+
+    cache.set("key", "value", ttl=replicas.replica_cache_ttl(cache, replica))
+    now[0] += 3
+    assert cache.get("key") == "value"
+    now[0] += 2
+    assert cache.get("key") is None
+    assert replicas.replica_cache_ttl(cache, replica) is None
+
+
+def test_the_writer_skips_entries_another_client_cached_from_a_replica(client, category, lamp, replica_urls):
+    replicas.configure(replica_urls[:1])
+    headers = register_and_login(client)
+    response = client.post("/api/products/", headers=headers, json={
+        "title": "Desk", "description": "Solid oak", "price": 90.0, "category_id": category.id,
+    })
+    assert response.status_code == 200, response.text
+    cookie = client.cookies.get("ecofinds_primary_until")
+
+    # Another client's misses fill the caches from the replica, which hasn't got the Desk
+    client.cookies.clear()
+    assert titles(client) == ["Lamp on replica A"]
+    assert client.get("/api/products/facets").json()["total"] == 1
+
+    # The writer, still inside its window, is served from the primary
+    client.cookies.set("ecofinds_primary_until", cookie)
+    assert sorted(titles(client)) == ["Desk", "Lamp"]
+    assert client.get("/api/products/facets").json()["total"] == 2
+
+
+def test_facet_deltas_keep_the_expiry_of_a_briefly_cached_grid(db, category, lamp):
+    import facets
+
+    grid = facets.facet_grid(db, facets.UNSEARCHED, lambda query: query)
+    facets.facet_cache.set(facets.UNSEARCHED, grid, ttl=2.0)
+    expires_at = facets.facet_cache._data[facets.UNSEARCHED][0]
+    facets._on_products_changed({"ids": [], "categories": [category.id], "facet_deltas": facets.deltas(added=[(category.id, 10.0)])})
+    assert facets.facet_cache._data[facets.UNSEARCHED][0] == expires_at
+    assert facets.facet_cache.get(facets.UNSEARCHED) is not grid
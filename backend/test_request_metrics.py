@@ -0,0 +1,59 @@
+import re
+
+from conftest import register_and_login
+
+
+def sample(text, name, **labels):
+    """Value of the sample ``name`` whose labels include ``labels``."""
+    for line in text.splitlines():
+        match = re.match(r"^(\w+)(?:\{(.*)\})? (\S+)$", line)
+        if not match or match.group(1) != name:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2) or ""))
+        if all(found.get(key) == str(value) for key, value in labels.items()):
+            return float(match.group(3))
+    return None
+
+
+def test_latency_and_sql_cost_are_recorded_per_route_template(client, make_products):
+    for product_id in make_products(5.0, count=3, title="Lamp {i}", description="Desk lamp"):
+        assert client.get(f"/api/products/{product_id}").status_code == 200
+    assert client.get("/api/products/999999").status_code == 404
+
+    text = client.get("/metrics").text
+    route = {"method": "GET", "route": "/api/products/{product_id}"}
+    assert sample(text, "http_requests_total", status=200, **route) == 3
+    assert sample(text, "http_requests_total", status=404, **route) == 1
+    assert sample(text, "http_request_duration_seconds_count", **route) == 4
+    assert sample(text, "http_request_duration_seconds_bucket", le="+Inf", **route) == 4
+    # Every miss costs at least one SELECT; nothing is attributed to other routes
+    assert sample(text, "http_request_db_queries_sum", **route) >= 4
+    assert sample(text, "http_request_db_seconds_total", **route) > 0
+
+
+def test_authenticated_requests_count_their_queries(client):
+    headers = register_and_login(client)
+    client.get("/api/cart/", headers=headers)
+
+    text = client.get("/metrics").text
+    route = {"method": "GET", "route": "/api/cart/"}
+    assert sample(text, "http_request_db_queries_count", **route) == 1
+    assert sample(text, "http_request_db_queries_sum", **route) >= 1
+
+
+def test_unmatched_paths_share_one_series(client):
+    client.get("/no-such-page")
+    client.get("/wp-admin.php")
+
+    text = client.get("/metrics").text
+    assert sample(text, "http_requests_total", method="GET", route="<unmatched>", status=404) == 2
+    assert "wp-admin" not in text
+
+
+def test_metrics_include_pool_and_cache_stats(client):
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert sample(response.text, "db_pool_checked_out", pool="primary") is not None
+    assert sample(response.text, "db_pool_wait_seconds_count", pool="primary") is not None
+    assert sample(response.text, "cache_hits_total", cache="products") is not None
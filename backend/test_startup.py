@@ -0,0 +1,98 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import warmup
+from main import create_app, prepare_schema
+from models import CartItem, Product, User
+from product_cache import product_cache
+from routers.products import category_cache, hot_product_ids
+
+
+def add_to_carts(db, product_id, carts):
+    for i in range(carts):
+        user = User(email=f"cart{product_id}-{i}@example.com", username=f"cart{product_id}-{i}", hashed_password="x")
+        db.add(user)
+        db.flush()
+        db.add(CartItem(user_id=user.id, product_id=product_id, quantity=1))
+    db.commit()
+
+
+def test_health_and_readiness_probes():
+    app = create_app(warm=False)
+    with TestClient(app) as client:
+        assert client.get("/healthz").json() == {"status": "ok"}
+        assert client.get("/readyz").json() == {"status": "ready"}
+
+    # Not started (or already shut down): alive but not ready
+    client = TestClient(create_app(warm=False))
+    assert client.get("/healthz").status_code == 200
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"status": "starting"}
+
+
+def test_readiness_fails_when_the_database_is_unreachable(monkeypatch):
+    from routers import health
+
+    def unreachable():
+        raise ConnectionError("database is down")
+
+    with TestClient(create_app(warm=False)) as client:
+        monkeypatch.setattr(health, "_ping", unreachable)
+        assert client.get("/readyz").status_code == 503
+        assert client.get("/healthz").status_code == 200
+
+
+def test_hot_products_are_the_most_carted_then_newest(db, make_products):
+    first, second, third, fourth = make_products(count=4)
+    add_to_carts(db, second, 2)
+    add_to_carts(db, third, 5)
+    add_to_carts(db, first, 1)
+    # Sold: checkout takes it off the market, however many carts hold it
+    db.query(Product).filter(Product.id == third).update({"is_available": False})
+    db.commit()
+
+    assert hot_product_ids(db, 3) == [second, first, fourth]
+    assert hot_product_ids(db, 1) == [second]
+
+
+def test_warm_app_serves_the_first_browse_request_from_cache(db, make_products, count_queries):
+    product_ids = make_products(count=3)
+    add_to_carts(db, product_ids[0], 2)
+
+    with TestClient(create_app(warm=True)) as client:
+        assert set(client.app.state.warmup) >= {"pool", "password_hashing", "caches"}
+        assert category_cache.get("all") is not None
+        assert product_cache.get(("product", product_ids[0])) is not None
+
+        with count_queries:
+            browse = client.get("/api/products/", params={"view": "card"})
+            categories = client.get("/api/products/categories")
+            detail = client.get(f"/api/products/{product_ids[0]}")
+            facets = client.get("/api/products/facets")
+
+    assert [response.status_code for response in (browse, categories, detail, facets)] == [200] * 4
+    assert len(browse.json()) == 3
+    assert facets.json()["total"] == 3
+    assert count_queries.count == 0
+
+
+def test_warmup_steps_are_best_effort(monkeypatch):
+    def broken():
+        raise RuntimeError("cache backend down")
+
+    monkeypatch.setattr(warmup, "warm_caches", broken)
+    with TestClient(create_app(warm=True)) as client:
+        assert "caches" in client.app.state.warmup
+        assert client.get("/readyz").status_code == 200
+
+
+def test_pool_warmup_is_capped_at_the_pool_size():
+    assert warmup.open_connections(count=2) == 2
+    assert warmup.open_connections(count=1000) == warmup.engine.pool.size()
+
+
+def test_unknown_schema_setting_is_rejected():
+    prepare_schema("none")
+    with pytest.raises(ValueError):
+        prepare_schema("rebuild")
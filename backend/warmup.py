@@ -0,0 +1,104 @@
+"""
+Startup work that would otherwise land on a worker's first requests.
+
+A fresh worker has an empty connection pool, no password-hashing processes
+and cold caches, so its first visitors wait for connections to be opened,
+processes to be spawned and the browse page, categories and popular products
+to be queried and serialized. ``warm`` does all of that from the lifespan
+hook, before the worker reports ready on ``/readyz``.
+
+Each step is best-effort: a failure is logged and startup carries on, since
+the worker can still serve (just slower) and ``/readyz`` checks the database
+on its own.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from database import DB_MODE, SessionLocal, engine, get_async_engine
+from hashing import password_hasher
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+# Connections opened up front, per worker; unset fills the pool
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS")) if os.getenv("WARMUP_POOL_CONNECTIONS") else None
+# Product detail responses cached up front
+WARMUP_HOT_PRODUCTS = int(os.getenv("WARMUP_HOT_PRODUCTS", "50"))
+
+
+def _pool_capacity(bind, count):
+    # Connections beyond the pool size would be closed again on return
+    size = getattr(bind.pool, "size", None)
+    if not callable(size):
+        return 0
+    return size() if count is None else min(count, size())
+
+
+def open_connections(bind=engine, count=WARMUP_POOL_CONNECTIONS):
+    """Open up to ``count`` connections at once and return them to the pool; returns how many."""
+    count = _pool_capacity(bind, count)
+    if count <= 0:
+        return 0
+
+    def connect(_):
+        connection = bind.connect()
+        connection.execute(text("SELECT 1"))
+        return connection
+
+    # Concurrently, so the connection handshakes overlap
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        connections = list(executor.map(connect, range(count)))
+    for connection in connections:
+        connection.close()
+    return count
+
+
+async def open_async_connections(count=WARMUP_POOL_CONNECTIONS):
+    """``open_connections`` for the async engine."""
+    async_engine = get_async_engine()
+    count = _pool_capacity(async_engine.sync_engine, count)
+    if count <= 0:
+        return 0
+    connections = [async_engine.connect() for _ in range(count)]
+    await asyncio.gather(*(connection.start() for connection in connections))
+    for connection in connections:
+        await connection.execute(text("SELECT 1"))
+        await connection.close()
+    return count
+
+
+def warm_caches(hot_products=WARMUP_HOT_PRODUCTS):
+    """Fill the category, browse-page, facet and product detail caches; returns the products warmed."""
+    from routers.products import warm_caches as warm_product_caches
+
+    db = SessionLocal()
+    try:
+        return warm_product_caches(db, hot_products)
+    finally:
+        db.close()
+
+
+async def warm(db_mode=DB_MODE):
+    """Run every warmup step; returns the seconds each took."""
+    timings = {}
+
+    async def step(name, run):
+        started = time.perf_counter()
+        try:
+            await run()
+        except Exception:
+            logger.exception("Warmup step %r failed", name)
+        timings[name] = round(time.perf_counter() - started, 4)
+
+    await step("pool", lambda: run_in_threadpool(open_connections))
+    if db_mode == "async":
+        await step("async_pool", open_async_connections)
+    await step("password_hashing", lambda: run_in_threadpool(password_hasher.start))
+    await step("caches", lambda: run_in_threadpool(warm_caches))
+    logger.info("Warmed up in %.3fs: %s", sum(timings.values()), timings)
+    return timings
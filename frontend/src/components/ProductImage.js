@@ -0,0 +1,23 @@
+import React from 'react';
+
+// Uploaded images are /api/images/<sha256>.<ext>; their thumbnails live at
+// /api/images/<sha256>/<size>.webp and .jpg
+const UPLOADED_IMAGE = /^\/api\/images\/([0-9a-f]{64})\.[a-z]+$/;
+
+function ProductImage({ src, alt, size = 'listing', style }) {
+  const match = src && src.match(UPLOADED_IMAGE);
+  if (!match) {
+    // External image URL entered by hand
+    return <img src={src} alt={alt} style={style} loading="lazy" />;
+  }
+
+  const base = `/api/images/${match[1]}/${size}`;
+  return (
+    <picture style={{ display: 'contents' }}>
+      <source srcSet={`${base}.webp`} type="image/webp" />
+      <img src={`${base}.jpg`} alt={alt} style={style} loading="lazy" decoding="async" />
+    </picture>
+  );
+}
+
+export default ProductImage;
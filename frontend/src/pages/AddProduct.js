@@ -12,6 +12,7 @@ function AddProduct() {
   });
   const [categories, setCategories] = useState([]);
   const [loading, setLoading] = useState(false);
+  const [uploading, setUploading] = useState(false);
   const [error, setError] = useState('');
   const navigate = useNavigate();
 
@@ -35,6 +36,28 @@ function AddProduct() {
     });
   };
 
+  const handleImageUpload = async (e) => {
+    const file = e.target.files[0];
+    if (!file) {
+      return;
+    }
+    setError('');
+    setUploading(true);
+
+    try {
+      const upload = new FormData();
+      upload.append('file', file);
+      const response = await api.post('/images/', upload, {
+        headers: { 'Content-Type': 'multipart/form-data' }
+      });
+      setFormData((current) => ({ ...current, image_url: response.data.url }));
+    } catch (error) {
+      setError(error.response?.data?.detail || 'Failed to upload image');
+    } finally {
+      setUploading(false);
+    }
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     setError('');
@@ -134,10 +157,24 @@ function AddProduct() {
             />
           </div>
 
+          <div className="form-group">
+            <label className="form-label">Photo (Optional)</label>
+            <input
+              type="file"
+              accept="image/jpeg,image/png,image/webp,image/gif"
+              onChange={handleImageUpload}
+              className="form-input"
+              disabled={uploading}
+            />
+            <small style={{ color: '#666', marginTop: '5px', display: 'block' }}>
+              {uploading ? 'Uploading...' : 'JPEG, PNG, WebP or GIF, up to 10 MB.'}
+            </small>
+          </div>
+
           <div className="form-group">
             <label className="form-label">Image URL (Optional)</label>
             <input
-              type="url"
+              type="text"
               name="image_url"
               value={formData.image_url}
               onChange={handleChange}
@@ -145,7 +182,7 @@ function AddProduct() {
               placeholder="https://example.com/image.jpg"
             />
             <small style={{ color: '#666', marginTop: '5px', display: 'block' }}>
-              You can add an image URL for your product. For now, we'll use a placeholder if no URL is provided.
+              Filled in when you upload a photo, or paste a link to one. We'll use a placeholder if neither is provided.
             </small>
           </div>
 
@@ -153,7 +190,7 @@ function AddProduct() {
             type="submit"
             className="btn btn-primary"
             style={{ width: '100%', marginBottom: '20px' }}
-            disabled={loading}
+            disabled={loading || uploading}
           >
             {loading ? 'Creating Listing...' : 'Create Listing'}
           </button>
@@ -1,15 +1,23 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Link } from 'react-router-dom';
 import api from '../services/api';
+import ProductImage from '../components/ProductImage';
 
 function Cart() {
   const [cartItems, setCartItems] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [purchasing, setPurchasing] = useState(false);
+  // Quantity changes per product id, sent together shortly after the last click
+  const pendingChanges = useRef({});
+  const flushTimer = useRef(null);
 
   useEffect(() => {
     fetchCartItems();
+    return () => {
+      clearTimeout(flushTimer.current);
+      sendChanges().catch(() => {});
+    };
   }, []);
 
   const fetchCartItems = async () => {
@@ -23,31 +31,57 @@ function Cart() {
     }
   };
 
-  const updateQuantity = async (itemId, newQuantity) => {
-    if (newQuantity <= 0) {
-      removeFromCart(itemId);
-      return;
+  const sendChanges = async () => {
+    const operations = Object.entries(pendingChanges.current).map(([productId, quantity]) => (
+      quantity > 0
+        ? { op: 'set', product_id: Number(productId), quantity }
+        : { op: 'remove', product_id: Number(productId) }
+    ));
+    pendingChanges.current = {};
+    if (operations.length === 0) {
+      return null;
     }
+    const response = await api.patch('/cart/', { operations });
+    return response.data;
+  };
 
+  // Resolves to whether the server now holds the quantities on screen
+  const flushChanges = async () => {
+    clearTimeout(flushTimer.current);
     try {
-      await api.put(`/cart/${itemId}`, null, {
-        params: { quantity: newQuantity }
-      });
-      setCartItems(cartItems.map(item => 
-        item.id === itemId ? { ...item, quantity: newQuantity } : item
-      ));
+      const items = await sendChanges();
+      if (items) {
+        setCartItems(items);
+      }
+      return true;
     } catch (error) {
-      alert('Failed to update quantity');
+      alert('Failed to update cart');
+      fetchCartItems();
+      return false;
     }
   };
 
-  const removeFromCart = async (itemId) => {
-    try {
-      await api.delete(`/cart/${itemId}`);
-      setCartItems(cartItems.filter(item => item.id !== itemId));
-    } catch (error) {
-      alert('Failed to remove item from cart');
+  const queueChange = (productId, quantity) => {
+    pendingChanges.current[productId] = quantity;
+    clearTimeout(flushTimer.current);
+    flushTimer.current = setTimeout(flushChanges, 400);
+  };
+
+  const updateQuantity = (changed, newQuantity) => {
+    if (newQuantity <= 0) {
+      removeFromCart(changed);
+      return;
     }
+
+    setCartItems(items => items.map(item =>
+      item.id === changed.id ? { ...item, quantity: newQuantity } : item
+    ));
+    queueChange(changed.product_id, newQuantity);
+  };
+
+  const removeFromCart = (removed) => {
+    setCartItems(items => items.filter(item => item.id !== removed.id));
+    queueChange(removed.product_id, 0);
   };
 
   const clearCart = async () => {
@@ -56,6 +90,8 @@ function Cart() {
     }
 
     try {
+      clearTimeout(flushTimer.current);
+      pendingChanges.current = {};
       await api.delete('/cart/');
       setCartItems([]);
     } catch (error) {
@@ -75,6 +111,10 @@ function Cart() {
 
     setPurchasing(true);
     try {
+      // Never check out a cart other than the one the user was shown
+      if (!(await flushChanges())) {
+        return;
+      }
       await api.post('/purchases/');
       setCartItems([]);
       alert('Purchase completed successfully!');
@@ -124,7 +164,7 @@ function Cart() {
               <div key={item.id} className="cart-item">
                 <div className="cart-item-image">
                   {item.product.image_url ? (
-                    <img
+                    <ProductImage
                       src={item.product.image_url}
                       alt={item.product.title}
                       style={{ width: '100%', height: '100%', objectFit: 'cover', borderRadius: '10px' }}
@@ -145,7 +185,7 @@ function Cart() {
                 <div className="cart-item-actions">
                   <div className="quantity-controls">
                     <button
-                      onClick={() => updateQuantity(item.id, item.quantity - 1)}
+                      onClick={() => updateQuantity(item, item.quantity - 1)}
                       className="quantity-btn"
                     >
                       -
@@ -154,7 +194,7 @@ function Cart() {
                       {item.quantity}
                     </span>
                     <button
-                      onClick={() => updateQuantity(item.id, item.quantity + 1)}
+                      onClick={() => updateQuantity(item, item.quantity + 1)}
                       className="quantity-btn"
                     >
                       +
@@ -166,7 +206,7 @@ function Cart() {
                       ₹{(item.product.price * item.quantity).toFixed(2)}
                     </div>
                     <button
-                      onClick={() => removeFromCart(item.id)}
+                      onClick={() => removeFromCart(item)}
                       className="btn btn-danger"
                       style={{ fontSize: '0.8rem', padding: '5px 10px', marginTop: '5px' }}
                     >
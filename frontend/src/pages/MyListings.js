@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import api from '../services/api';
+import ProductImage from '../components/ProductImage';
 
 function MyListings() {
   const [products, setProducts] = useState([]);
@@ -73,7 +74,7 @@ function MyListings() {
             <div key={product.id} className="product-card">
               <div className="product-image">
                 {product.image_url ? (
-                  <img
+                  <ProductImage
                     src={product.image_url}
                     alt={product.title}
                     style={{ width: '100%', height: '100%', objectFit: 'cover' }}
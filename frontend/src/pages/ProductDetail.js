@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
 import api from '../services/api';
+import ProductImage from '../components/ProductImage';
 
 function ProductDetail() {
   const { id } = useParams();
@@ -73,8 +74,9 @@ function ProductDetail() {
         <div>
           <div className="product-image" style={{ height: '400px', borderRadius: '15px' }}>
             {product.image_url ? (
-              <img
+              <ProductImage
                 src={product.image_url}
+                size="detail"
                 alt={product.title}
                 style={{ width: '100%', height: '100%', objectFit: 'cover', borderRadius: '15px' }}
               />
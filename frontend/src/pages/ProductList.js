@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import api from '../services/api';
+import ProductImage from '../components/ProductImage';
 
 function ProductList() {
   const [products, setProducts] = useState([]);
@@ -16,7 +17,7 @@ function ProductList() {
 
   const fetchProducts = async () => {
     try {
-      const params = new URLSearchParams();
+      const params = new URLSearchParams({ view: 'card' });
       if (selectedCategory) params.append('category_id', selectedCategory);
       if (searchTerm) params.append('search', searchTerm);
       
@@ -107,7 +108,7 @@ function ProductList() {
             >
               <div className="product-image">
                 {product.image_url ? (
-                  <img
+                  <ProductImage
                     src={product.image_url}
                     alt={product.title}
                     style={{ width: '100%', height: '100%', objectFit: 'cover' }}